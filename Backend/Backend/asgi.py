@@ -2,6 +2,8 @@
 ASGI config for Backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Only this entry point serves the /api/events/ stream; with several worker
+processes, set EVENTS_BACKEND to ``api.events.SocketBackend``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
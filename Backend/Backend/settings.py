@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    "api.metrics.measure_requests",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -88,6 +90,76 @@ DATABASES = {
     }
 }
 
+# Connection setup for serving with several workers. WAL lets readers run
+# alongside the single writer, IMMEDIATE transactions take the write lock up
+# front so writers queue on the busy timeout (seconds) instead of failing
+# with "database is locked", and NORMAL sync is safe under WAL.
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+]
+SQLITE_PRODUCTION_OPTIONS = {
+    "init_command": ";".join(SQLITE_PRAGMAS),
+    "transaction_mode": "IMMEDIATE",
+    "timeout": 20,
+}
+
+# DJANGO_DB_PROFILE=production also keeps connections open between requests
+# and sends safe-method requests to a query-only "replica" connection.
+if os.environ.get("DJANGO_DB_PROFILE") == "production":
+    DATABASES = {
+        "default": {
+            **DATABASES["default"],
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": SQLITE_PRODUCTION_OPTIONS,
+        },
+        "replica": {
+            **DATABASES["default"],
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "init_command": ";".join([*SQLITE_PRAGMAS, "PRAGMA query_only=ON"]),
+                "timeout": 20,
+            },
+            "TEST": {"MIRROR": "default"},
+        },
+    }
+    DATABASE_ROUTERS = ["api.db_router.ReadReplicaRouter"]
+    MIDDLEWARE.insert(0, "api.db_router.route_reads")
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory is per process, so a write is only seen by the worker that made
+# it. Run more than one worker with a shared backend: the production profile
+# uses FileBasedCache in DJANGO_CACHE_DIR, which every worker on the host sees.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+if os.environ.get("DJANGO_DB_PROFILE") == "production":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("DJANGO_CACHE_DIR", "/var/tmp/network-cache"),
+        }
+    }
+
+# Seconds a cached public response (home, tweet detail) is kept at most;
+# writes invalidate entries sooner through api.signals.
+RESPONSE_CACHE_TIMEOUT = 60
+# Home and profile ETags hash the cache's generation counters, and also change
+# every ETAG_MAX_AGE seconds. That bounds how long a 304 can be stale. A 304 can
+# be stale when a worker misses a bump (a per-process cache) or on a change no
+# counter tracks. None: only the counters.
+ETAG_MAX_AGE = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -135,7 +207,11 @@ AUTH_USER_MODEL = "api.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.metrics.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ),
 }
 
@@ -145,10 +221,112 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
-    "UPDATE_LAST_LOGIN": True,
+    # Logins set last_login through api.authentication.record_login instead.
+    "UPDATE_LAST_LOGIN": False,
     "AUTH_HEADER_TYPES": ("Bearer",),
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
     "BLACKLIST_TOKEN_CHECKS": ["rest_framework_simplejwt.token_blacklist.check_blacklist"],
+    "TOKEN_REFRESH_SERIALIZER": "api.authentication.RefreshSerializer",
+}
+
+# Authentication hot path: the token's user is cached this many seconds;
+# refresh tokens are checked against an in-process Bloom filter of the
+# blacklist (synced at most every BLACKLIST_SYNC_INTERVAL seconds) before the
+# table; last_login is written at most once per LAST_LOGIN_INTERVAL; expired
+# tokens are pruned at most once per TOKEN_PRUNE_INTERVAL seconds, on login.
+AUTH_USER_CACHE_TIMEOUT = 30
+BLACKLIST_SYNC_INTERVAL = 1
+BLACKLIST_FILTER_CAPACITY = 100000
+BLACKLIST_FILTER_ERROR = 0.01
+LAST_LOGIN_INTERVAL = timedelta(hours=1)
+TOKEN_PRUNE_INTERVAL = 3600
+
+# Following feed: posts are copied into each follower's timeline on write,
+# except for accounts with more followers than this, whose posts are merged
+# in at read time instead.
+TIMELINE_FANOUT_LIMIT = 10000
+# How many recent posts are copied into a timeline when following someone.
+TIMELINE_BACKFILL = 200
+
+# Home page leaderboards: selectable with ?window=, cached for this many seconds.
+LEADERBOARD_WINDOWS = {
+    "all": None,
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
 }
+LEADERBOARD_TIMEOUT = 300
+
+# Feeds embed only this many of each post's latest comments; the rest are
+# paged through /api/tweet/<id>/comments/.
+COMMENT_PREVIEW_SIZE = 3
+COMMENT_PAGE_SIZE = 20
+# Page size of each profile section (tweets, comments, liked tweets).
+PROFILE_PAGE_SIZE = 10
+
+# Most posts /api/tweets/?ids= will hydrate in one request.
+BULK_TWEETS_LIMIT = 100
+
+# Serve feeds through api.fast_serializers (same bytes as the DRF
+# serializers, built without them); False goes back to the serializers.
+# Rendering is only faster with orjson installed (see requiremtnts.txt):
+# without it FastJSONRenderer falls back to DRF's JSONRenderer.
+FAST_SERIALIZERS = True
+
+# Rows read per query while streaming /api/profile/<username>/export/.
+EXPORT_CHUNK_SIZE = 2000
+
+# Trending tags: uses are counted per TRENDING_BUCKET and summed over the
+# buckets inside TRENDING_WINDOW; the top TRENDING_SIZE are cached this long.
+TRENDING_BUCKET = timedelta(hours=1)
+TRENDING_WINDOW = timedelta(hours=24)
+TRENDING_SIZE = 10
+TRENDING_TIMEOUT = 60
+
+# Write-behind likes: queue like/unlike intents in process and persist them in
+# batches every LIKE_FLUSH_INTERVAL seconds (None: only on explicit flush). An
+# intent that fails LIKE_FLUSH_MAX_ATTEMPTS flushes in a row is dropped.
+LIKE_WRITE_BEHIND = False
+LIKE_FLUSH_INTERVAL = 0.5
+LIKE_FLUSH_MAX_ATTEMPTS = 5
+
+# Live events at /api/events/ (ASGI only). LocalBackend reaches the streams of
+# the publishing process; SocketBackend also those of other workers on this
+# host, through Unix sockets in EVENTS_SOCKET_DIR.
+EVENTS_BACKEND = "api.events.LocalBackend"
+EVENTS_SOCKET_DIR = "/tmp/network-events"
+# Streams send a comment this often so proxies keep idle connections open,
+# and are closed when a client falls this many events behind.
+EVENTS_HEARTBEAT = 15
+EVENTS_QUEUE_SIZE = 100
+EVENTS_RETRY_MS = 3000
+
+# Request metrics: each process writes its aggregates to METRICS_DIR at most
+# every METRICS_WRITE_INTERVAL seconds, and /metrics sums them. Queries slower
+# than SLOW_QUERY_THRESHOLD seconds are logged to "api.slow_queries" with
+# their SQL and stack (None: off). The tests use a temporary METRICS_DIR.
+METRICS_DIR = "/tmp/network-metrics"
+METRICS_WRITE_INTERVAL = 1
+SLOW_QUERY_THRESHOLD = 0.1
+# /metrics wants "Authorization: Bearer <METRICS_TOKEN>" when it is set, and is
+# otherwise served to INTERNAL_IPS only. Behind a reverse proxy on the same
+# host every client connects from 127.0.0.1, so set a token there.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+INTERNAL_IPS = ["127.0.0.1", "::1"]
+
+TEST_RUNNER = "api.test_runner.TestRunner"
+
+# Background jobs (api.jobs), worked by `manage.py run_jobs`. Workers lease up
+# to JOB_BATCH_SIZE due jobs of one kind for JOB_LEASE seconds and poll every
+# JOB_POLL_INTERVAL seconds when idle. A failed job is retried after
+# JOB_RETRY_DELAY * 2**(attempt - 1) seconds, JOB_MAX_ATTEMPTS times in all;
+# finished jobs are pruned after JOB_RETENTION.
+JOB_BATCH_SIZE = 50
+JOB_LEASE = 300
+JOB_POLL_INTERVAL = 1
+JOB_RETRY_DELAY = 5
+JOB_MAX_ATTEMPTS = 5
+JOB_RETENTION = timedelta(days=7)
+# Rows deleted per transaction when posts and accounts are deleted.
+DELETION_CHUNK_SIZE = 1000
 
 CORS_ALLOWED_ORIGINS = ["http://localhost:5173"]
@@ -0,0 +1,129 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+from . import events, leaderboards, like_buffer, response_cache
+from .models import User, Post
+from .timeline import backfill_timeline, trim_timeline
+
+
+Like = Post.likers.through
+Follow = User.following.through
+
+
+def _insert(model, **fields):
+    """Insert one through-table row; False if it already existed."""
+    try:
+        with transaction.atomic():
+            model.objects.create(**fields)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _delete(model, **fields):
+    """Delete one through-table row by its unique key; False if it was absent."""
+    deleted, _ = model.objects.filter(**fields).delete()
+    return deleted > 0
+
+
+def _apply(model, state, **fields):
+    """
+    Set (True/False) or toggle (None) membership with a single indexed insert
+    or delete, never scanning the relation. Returns `(state, changed)`.
+    """
+    if state is None:
+        if _delete(model, **fields):
+            return False, True
+        # Lost a race to a concurrent insert: the row exists either way, but
+        # the other request counted it.
+        return True, _insert(model, **fields)
+    if state:
+        return True, _insert(model, **fields)
+    return False, _delete(model, **fields)
+
+
+def set_like(user, post, liked=None):
+    """
+    Like (`liked=True`), unlike (False) or toggle (None) `post` for `user`.
+
+    Repeating a like or an unlike is a no-op, so concurrent double clicks
+    leave the counter right. Refreshes `post.likes_count` and returns
+    `(liked, changed)`. With LIKE_WRITE_BEHIND the intent is queued instead
+    and the count includes likes that are not persisted yet.
+    """
+    if like_buffer.enabled():
+        liked, changed = like_buffer.buffer.enqueue(user.id, post.id, liked)
+        post.likes_count = like_buffer.buffer.delta(post.id) + Post.objects.values_list(
+            "likes_count", flat=True
+        ).get(id=post.id)
+        if changed:
+            response_cache.invalidate(response_cache.post_generation(post.id))
+            events.likes_changed(post)
+        return liked, changed
+
+    with transaction.atomic():
+        liked, changed = _apply(Like, liked, post_id=post.id, user_id=user.id)
+        if changed:
+            now = timezone.now()
+            Post.objects.filter(id=post.id).update(
+                likes_count=F("likes_count") + (1 if liked else -1), updated_at=now
+            )
+            User.objects.filter(id=user.id).update(updated_at=now)
+            m2m_changed.send(
+                sender=Like,
+                instance=user,
+                action="post_add" if liked else "post_remove",
+                reverse=True,
+                model=Post,
+                pk_set={post.id},
+                using=Like.objects.db,
+            )
+
+    post.likes_count = Post.objects.values_list("likes_count", flat=True).get(
+        id=post.id
+    )
+    if changed:
+        leaderboards.record(post, "most_liked", post.likes_count)
+        events.likes_changed(post)
+    return liked, changed
+
+
+def set_follow(follower, followee, following=None):
+    """
+    Follow (`following=True`), unfollow (False) or toggle (None) `followee`.
+
+    Idempotent like `set_like`. Refreshes `followee.followers_count` and
+    returns `(following, changed)`.
+    """
+    with transaction.atomic():
+        following, changed = _apply(
+            Follow, following, from_user_id=follower.id, to_user_id=followee.id
+        )
+        if changed:
+            if following:
+                backfill_timeline(follower, followee)
+            else:
+                trim_timeline(follower, followee)
+            delta = 1 if following else -1
+            now = timezone.now()
+            User.objects.filter(id=followee.id).update(
+                followers_count=F("followers_count") + delta, updated_at=now
+            )
+            User.objects.filter(id=follower.id).update(
+                following_count=F("following_count") + delta, updated_at=now
+            )
+            m2m_changed.send(
+                sender=Follow,
+                instance=follower,
+                action="post_add" if following else "post_remove",
+                reverse=False,
+                model=User,
+                pk_set={followee.id},
+                using=Follow.objects.db,
+            )
+
+    followee.followers_count = User.objects.values_list(
+        "followers_count", flat=True
+    ).get(id=followee.id)
+    return following, changed
@@ -1,6 +1,34 @@
 from django.contrib import admin
-from .models import User, Post, Comment
+from django.utils import timezone
+from .jobs import depth
+from .models import User, Post, Comment, Job
 
 admin.site.register(User)
 admin.site.register(Post)
 admin.site.register(Comment)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["id", "kind", "key", "status", "attempts", "run_at", "finished_at"]
+    list_filter = ["status", "kind"]
+    search_fields = ["key"]
+    readonly_fields = ["created_at", "finished_at", "locked_by", "locked_until"]
+    actions = ["retry"]
+
+    @admin.action(description="Retry selected failed jobs now")
+    def retry(self, request, queryset):
+        retried = queryset.filter(status=Job.FAILED).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None
+        )
+        self.message_user(request, f"{retried} job(s) queued again.")
+
+    def changelist_view(self, request, extra_context=None):
+        # Queue depth per kind in the title, as /api/jobs/ reports it.
+        depths = ", ".join(
+            f"{kind}: {queue['queued']} queued, {queue['running']} running, "
+            f"{queue['failed']} failed"
+            for kind, queue in depth().items()
+        )
+        extra_context = {**(extra_context or {}), "title": f"Jobs ({depths or 'idle'})"}
+        return super().changelist_view(request, extra_context)
@@ -0,0 +1,286 @@
+"""
+NDJSON archives: one JSON record per line, each with a "type" of "user",
+"post", "follow", "like" or "comment". Users are referenced by username and
+posts by their id in the source database.
+"""
+
+import json
+from datetime import datetime
+from collections import Counter
+from django.contrib.auth.hashers import make_password
+from django.utils.dateparse import parse_datetime
+from .counters import repair_post_counters, repair_user_counters
+from .models import User, Post, Comment
+from .seeding import historical_dates
+from .tags import index_new_posts
+
+# Records are imported in this order so every reference can be resolved.
+ORDER = ("user", "post", "follow", "like", "comment")
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def _line(record):
+    # Full isoformat: DjangoJSONEncoder would drop the microseconds.
+    return json.dumps(record, default=datetime.isoformat) + "\n"
+
+
+def export_user(user, chunk_size):
+    """
+    Yield the NDJSON lines of `user`'s archive: the account, its posts,
+    follows, likes and comments. Rows are read `chunk_size` at a time and
+    never as model instances, so memory stays flat for any account size.
+    """
+    yield _line(
+        {
+            "type": "user",
+            "username": user.username,
+            "date_joined": user.date_joined,
+        }
+    )
+
+    posts = (
+        Post.objects.filter(poster=user)
+        .order_by("date_posted", "id")
+        .values_list("id", "tweet", "date_posted", "edited")
+    )
+    for post_id, tweet, date_posted, edited in posts.iterator(chunk_size):
+        yield _line(
+            {
+                "type": "post",
+                "id": post_id,
+                "poster": user.username,
+                "tweet": tweet,
+                "date_posted": date_posted,
+                "edited": edited,
+            }
+        )
+
+    followees = (
+        User.following.through.objects.filter(from_user=user)
+        .order_by("id")
+        .values_list("to_user__username", flat=True)
+    )
+    for username in followees.iterator(chunk_size):
+        yield _line({"type": "follow", "from": user.username, "to": username})
+
+    likes = (
+        Post.likers.through.objects.filter(user=user)
+        .order_by("id")
+        .values_list("post_id", flat=True)
+    )
+    for post_id in likes.iterator(chunk_size):
+        yield _line({"type": "like", "user": user.username, "post": post_id})
+
+    comments = (
+        Comment.objects.filter(commenter=user)
+        .order_by("commented", "id")
+        .values_list("main_post_id", "comment", "commented")
+    )
+    for post_id, comment, commented in comments.iterator(chunk_size):
+        yield _line(
+            {
+                "type": "comment",
+                "post": post_id,
+                "commenter": user.username,
+                "comment": comment,
+                "commented": commented,
+            }
+        )
+
+
+class Importer:
+    """
+    Load archive records with chunked `bulk_create`s. Records are buffered
+    per type; flushing a type first flushes the types it depends on.
+
+    A record pointing at a user or post not seen yet is held back and tried
+    once more by `finish()`, so archives may be loaded in any order; what is
+    still unresolved then is skipped. Existing usernames are reused rather
+    than duplicated. Imported posts are left for fan-out-on-read (or
+    `backfill_timelines`), and counters of every touched row are repaired.
+    """
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.pending = {kind: [] for kind in ORDER}
+        self.deferred = {kind: [] for kind in ORDER}
+        self.finishing = False
+        self.user_ids = {}  # username -> id
+        self.post_ids = {}  # archived post id -> new id
+        self.counts = Counter()
+
+    def add(self, record):
+        kind = record.get("type") if isinstance(record, dict) else None
+        if kind not in self.pending:
+            raise InvalidRecord(f"Unknown record type: {kind!r}.")
+        self.pending[kind].append(record)
+        if len(self.pending[kind]) >= self.chunk_size:
+            self.flush(kind)
+
+    def add_lines(self, lines):
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                raise InvalidRecord(f"Line {number}: {error}") from error
+            self.add(record)
+
+    def flush(self, upto=ORDER[-1]):
+        for kind in ORDER[: ORDER.index(upto) + 1]:
+            records, self.pending[kind] = self.pending[kind], []
+            if not records:
+                continue
+            try:
+                unresolved = getattr(self, f"_import_{kind}s")(records)
+            except InvalidRecord:
+                raise
+            except (KeyError, TypeError, ValueError) as error:
+                raise InvalidRecord(f"Invalid {kind} record: {error!r}") from error
+            if self.finishing:
+                self.counts["skipped"] += len(unresolved)
+            else:
+                self.deferred[kind].extend(unresolved)
+
+    def finish(self):
+        """Flush everything, retry held-back records and return the counts."""
+        self.flush()
+        self.finishing = True
+        for kind in ORDER:
+            records, self.deferred[kind] = self.deferred[kind], []
+            for record in records:
+                self.add(record)
+        self.flush()
+        return self.counts
+
+    def _resolve(self, usernames):
+        missing = set(usernames) - self.user_ids.keys()
+        if missing:
+            self.user_ids.update(
+                User.objects.filter(username__in=missing).values_list("username", "id")
+            )
+
+    def _date(self, value):
+        date = parse_datetime(value)
+        if date is None:
+            raise InvalidRecord(f"Invalid date: {value!r}.")
+        return date
+
+    def _import_users(self, records):
+        self._resolve(record["username"] for record in records)
+        new = {}
+        for record in records:
+            if record["username"] not in self.user_ids:
+                new[record["username"]] = User(
+                    username=record["username"],
+                    password=make_password(None),
+                    date_joined=self._date(record["date_joined"]),
+                )
+        with historical_dates(User._meta.get_field("date_joined")):
+            User.objects.bulk_create(new.values())
+        self._resolve(new)
+        self.counts["users"] += len(new)
+        self.counts["existing_users"] += len(records) - len(new)
+        return []
+
+    def _import_posts(self, records):
+        self._resolve(record["poster"] for record in records)
+        archived, posts, unresolved = [], [], []
+        for record in records:
+            poster_id = self.user_ids.get(record["poster"])
+            if poster_id is None:
+                unresolved.append(record)
+                continue
+            date = self._date(record["date_posted"])
+            archived.append(record["id"])
+            posts.append(
+                Post(
+                    tweet=record["tweet"],
+                    poster_id=poster_id,
+                    date_posted=date,
+                    updated_at=date,
+                    edited=record.get("edited", False),
+                )
+            )
+        with historical_dates(
+            Post._meta.get_field("date_posted"), Post._meta.get_field("updated_at")
+        ):
+            # Primary keys come back from the INSERT (SQLite 3.35+, PostgreSQL).
+            Post.objects.bulk_create(posts)
+        self.post_ids.update(zip(archived, (post.id for post in posts)))
+        index_new_posts(posts)
+        self.counts["posts"] += len(posts)
+        return unresolved
+
+    def _import_follows(self, records):
+        self._resolve(
+            username
+            for record in records
+            for username in (record["from"], record["to"])
+        )
+        Follow = User.following.through
+        rows, unresolved = set(), []
+        for record in records:
+            from_id = self.user_ids.get(record["from"])
+            to_id = self.user_ids.get(record["to"])
+            if from_id is None or to_id is None:
+                unresolved.append(record)
+            elif from_id != to_id:
+                rows.add((from_id, to_id))
+        Follow.objects.bulk_create(
+            [Follow(from_user_id=a, to_user_id=b) for a, b in rows],
+            ignore_conflicts=True,
+        )
+        repair_user_counters(
+            User.objects.filter(id__in={user_id for row in rows for user_id in row})
+        )
+        self.counts["follows"] += len(rows)
+        return unresolved
+
+    def _import_likes(self, records):
+        self._resolve(record["user"] for record in records)
+        Like = Post.likers.through
+        rows, unresolved = set(), []
+        for record in records:
+            post_id = self.post_ids.get(record["post"])
+            user_id = self.user_ids.get(record["user"])
+            if post_id is None or user_id is None:
+                unresolved.append(record)
+            else:
+                rows.add((post_id, user_id))
+        Like.objects.bulk_create(
+            [Like(post_id=post, user_id=user) for post, user in rows],
+            ignore_conflicts=True,
+        )
+        repair_post_counters(Post.objects.filter(id__in={post for post, _ in rows}))
+        self.counts["likes"] += len(rows)
+        return unresolved
+
+    def _import_comments(self, records):
+        self._resolve(record["commenter"] for record in records)
+        comments, unresolved = [], []
+        for record in records:
+            post_id = self.post_ids.get(record["post"])
+            commenter_id = self.user_ids.get(record["commenter"])
+            if post_id is None or commenter_id is None:
+                unresolved.append(record)
+                continue
+            comments.append(
+                Comment(
+                    main_post_id=post_id,
+                    commenter_id=commenter_id,
+                    comment=record["comment"],
+                    commented=self._date(record["commented"]),
+                )
+            )
+        with historical_dates(Comment._meta.get_field("commented")):
+            Comment.objects.bulk_create(comments)
+        repair_post_counters(
+            Post.objects.filter(id__in={comment.main_post_id for comment in comments})
+        )
+        self.counts["comments"] += len(comments)
+        return unresolved
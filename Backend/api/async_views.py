@@ -0,0 +1,203 @@
+"""
+Async versions of the read endpoints, for serving under `Backend.asgi`.
+
+They reuse the sync views' building blocks so both paths return the same
+bodies, but run independent queries concurrently, each on its own worker
+thread and database connection. ETags and the response cache stay on the
+sync views.
+"""
+
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from django.contrib.auth import get_user_model
+from . import events, fast_serializers, leaderboards
+from .fast_serializers import FastJSONRenderer
+from .models import Post
+from .pagination import InvalidCursor
+from .views import (
+    PROFILE_SECTIONS,
+    following_feed,
+    home_leaderboard,
+    home_recent,
+    post_listing,
+    profile_header,
+    profile_section_names,
+)
+
+
+User = get_user_model()
+
+
+def render(data, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        content_type="application/json",
+        status=status,
+        headers=headers,
+    )
+
+
+def concurrently(func):
+    """Run `func` on a pooled thread with its own database connection."""
+
+    def run(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def _error_body(error):
+    if isinstance(error.detail, (list, dict)):
+        return error.detail
+    return {"detail": error.detail}
+
+
+def async_api_view(login_required=False):
+    """
+    Authenticate an async view the way `APIView` would and hand it a DRF
+    `Request`, turning API exceptions into the same error responses.
+    """
+
+    def decorator(view):
+        async def wrapper(request, *args, **kwargs):
+            request = Request(
+                request,
+                authenticators=[
+                    auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+                ],
+            )
+            try:
+                user = await sync_to_async(lambda: request.user)()
+                if login_required and not user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                return await view(request, *args, **kwargs)
+            except Http404 as error:
+                return render({"detail": str(error)}, status.HTTP_404_NOT_FOUND)
+            except exceptions.APIException as error:
+                headers = None
+                if isinstance(
+                    error,
+                    (exceptions.NotAuthenticated, exceptions.AuthenticationFailed),
+                ):
+                    header = request.authenticators[0].authenticate_header(request)
+                    headers = {"WWW-Authenticate": header}
+                return render(_error_body(error), error.status_code, headers)
+
+        return wrapper
+
+    return decorator
+
+
+@async_api_view()
+async def home(request):
+    try:
+        most_liked, most_commented, recent = await asyncio.gather(
+            concurrently(home_leaderboard)(request, "most_liked"),
+            concurrently(home_leaderboard)(request, "most_commented"),
+            concurrently(home_recent)(request),
+        )
+    except leaderboards.UnknownWindow as error:
+        return render({"error": str(error)}, status.HTTP_400_BAD_REQUEST)
+    except InvalidCursor:
+        return render({"error": "Invalid cursor."}, status.HTTP_400_BAD_REQUEST)
+
+    return render(
+        {
+            **recent,
+            "most_liked_tweets": most_liked,
+            "most_commented_tweets": most_commented,
+        }
+    )
+
+
+@async_api_view(login_required=True)
+async def following(request):
+    try:
+        return render(await concurrently(following_feed)(request))
+    except InvalidCursor:
+        return render({"error": "Invalid cursor."}, status.HTTP_400_BAD_REQUEST)
+
+
+@async_api_view()
+async def tweet(request, post_id):
+    try:
+        post = await post_listing(request, all_comments=True).aget(id=post_id)
+    except Post.DoesNotExist:
+        return render({"error": "Post not found."}, status.HTTP_404_NOT_FOUND)
+
+    return render(await sync_to_async(fast_serializers.post)(post, request))
+
+
+@async_api_view(login_required=True)
+async def profile(request, username):
+    user = await aget_object_or_404(User, username=username)
+    names = profile_section_names(request)
+    is_following, *sections = await asyncio.gather(
+        user.followers.filter(pk=request.user.pk).aexists(),
+        *(concurrently(PROFILE_SECTIONS[name])(request, user, None) for name in names),
+    )
+
+    response_data = {
+        "user": profile_header(request, user, is_following),
+        "next_cursors": {},
+    }
+    for name, (data, next_cursor) in zip(names, sections):
+        response_data[name] = data
+        response_data["next_cursors"][name] = next_cursor
+
+    return render(response_data)
+
+
+async def event_stream(subscription):
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n".encode()
+        while (event := await subscription.get()) is not None:
+            yield event.frame
+    finally:
+        events.hub.unsubscribe(subscription)
+
+
+@async_api_view()
+async def stream(request):
+    """
+    Server-Sent Events: `post` for new posts and `likes`/`comments` for
+    changed counts. `?feed=following` limits new posts to followed accounts
+    (as of connecting) and the user's own.
+    """
+    if not isinstance(request._request, ASGIRequest):
+        return render(
+            {"error": "Event streams are only served by the ASGI application."},
+            status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    posters = None
+    if request.query_params.get("feed") == "following":
+        if not request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        followees = User.following.through.objects.filter(from_user=request.user)
+        posters = {request.user.id}
+        posters.update(
+            [
+                user_id
+                async for user_id in followees.values_list("to_user_id", flat=True)
+            ]
+        )
+
+    events.backend().listen()
+    subscription = events.hub.subscribe(posters)
+    return StreamingHttpResponse(
+        event_stream(subscription),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
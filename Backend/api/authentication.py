@@ -0,0 +1,154 @@
+import hashlib
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt import tokens
+from .models import User
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that keeps the token's user in the cache for
+    AUTH_USER_CACHE_TIMEOUT seconds instead of loading it on every request.
+    Saving or deleting a user drops its entry (see api.signals).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # Raises for missing and inactive users, which are never cached.
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(math.ceil(self.size / 8))
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position // 8] |= 1 << (position % 8)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position // 8] & (1 << (position % 8))
+            for position in self._positions(item)
+        )
+
+
+class BlacklistFilter:
+    """
+    In-process Bloom filter of blacklisted refresh token ids. A miss means
+    the token is certainly not blacklisted, so only hits (and the odd false
+    positive) reach the blacklist table. Blacklistings made by this process
+    are added at once; those made elsewhere are pulled in incrementally at
+    most every BLACKLIST_SYNC_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._bloom = None
+        self._last_id = 0
+        self._synced = 0.0
+
+    def _sync(self):
+        if time.monotonic() - self._synced < settings.BLACKLIST_SYNC_INTERVAL:
+            return
+        with self._lock:
+            capacity = settings.BLACKLIST_FILTER_CAPACITY
+            if self._bloom is None or self._bloom.count > capacity:
+                self._bloom = BloomFilter(capacity, settings.BLACKLIST_FILTER_ERROR)
+                self._last_id = 0
+            rows = (
+                BlacklistedToken.objects.filter(
+                    id__gt=self._last_id, token__expires_at__gt=timezone.now()
+                )
+                .order_by("id")
+                .values_list("id", "token__jti")
+            )
+            for row_id, jti in rows.iterator():
+                self._bloom.add(jti)
+                self._last_id = row_id
+            self._synced = time.monotonic()
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def might_contain(self, jti):
+        self._sync()
+        return jti in self._bloom
+
+
+blacklist = BlacklistFilter()
+
+
+class RefreshToken(tokens.RefreshToken):
+    def check_blacklist(self):
+        if blacklist.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+
+class RefreshSerializer(TokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+def record_login(user):
+    """Set `last_login`, writing at most once per LAST_LOGIN_INTERVAL."""
+    now = timezone.now()
+    if user.last_login and now - user.last_login < settings.LAST_LOGIN_INTERVAL:
+        return False
+    User.objects.filter(pk=user.pk).update(last_login=now)
+    user.last_login = now
+    return True
+
+
+def prune_expired_tokens():
+    """Delete expired outstanding tokens along with their blacklist rows."""
+    deleted, _ = OutstandingToken.objects.filter(
+        expires_at__lte=timezone.now()
+    ).delete()
+    return deleted
+
+
+def schedule_token_prune():
+    # cache.add lets one caller per TOKEN_PRUNE_INTERVAL do the pruning.
+    if cache.add("auth:token-prune", True, settings.TOKEN_PRUNE_INTERVAL):
+        return prune_expired_tokens()
+    return None
@@ -0,0 +1,52 @@
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from contextlib import contextmanager
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def scratch_database(on_disk=False):
+    """
+    Run inside a throwaway test database so benchmarks never touch real data.
+    `on_disk` puts it in a temporary file, so several threads or processes
+    contend on it the way they would in production.
+    """
+    old_name = connection.settings_dict["NAME"]
+    if on_disk:
+        path = Path(tempfile.mkdtemp()) / "benchmark.sqlite3"
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = str(path)
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(samples):
+    """Latency summary of `samples` (seconds) in milliseconds."""
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+    }
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
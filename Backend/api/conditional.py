@@ -0,0 +1,96 @@
+import hashlib
+import time
+from datetime import datetime
+from functools import wraps
+from django.conf import settings
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+from .models import User, Post
+from .response_cache import ALL, HOME, current, profile_generation
+
+
+def conditional(version):
+    """
+    Answer conditional GETs on an `APIView` handler without running it.
+
+    `version(request, *args, **kwargs)` returns a list of cheap stamps (update
+    times, generation counters) that change whenever the response would, or
+    None to skip the check (e.g. for a 404). The ETag hashes those stamps with
+    the full path and the viewer, so per-viewer fields such as `is_liked`
+    never leak between users; Last-Modified is the newest datetime stamp.
+    """
+
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            stamps = version(request, *args, **kwargs)
+            if stamps is None:
+                return handler(self, request, *args, **kwargs)
+
+            viewer = request.user.pk if request.user.is_authenticated else None
+            key = repr([request.get_full_path(), viewer, *stamps]).encode()
+            etag = quote_etag(hashlib.sha1(key).hexdigest())
+            times = [stamp for stamp in stamps if isinstance(stamp, datetime)]
+            last_modified = int(max(times).timestamp()) if times else None
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = handler(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response["ETag"] = etag
+                if last_modified is not None:
+                    response["Last-Modified"] = http_date(last_modified)
+
+            patch_cache_control(
+                response, no_cache=True, private=request.user.is_authenticated
+            )
+            patch_vary_headers(response, ["Authorization"])
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _age_bucket():
+    if not settings.ETAG_MAX_AGE:
+        return None
+    return int(time.time() // settings.ETAG_MAX_AGE)
+
+
+def home_version(request):
+    # Posts age out of the 24h/7d leaderboards with no write to bump a
+    # counter: only the age bucket rolls those, so without one they are not
+    # answered conditionally.
+    window = request.query_params.get("window")
+    if settings.LEADERBOARD_WINDOWS.get(window) and not settings.ETAG_MAX_AGE:
+        return None
+    return [*current([ALL, HOME]), _age_bucket()]
+
+
+def tweet_version(request, post_id):
+    updated_at = Post.objects.filter(id=post_id).values_list("updated_at", flat=True)
+    return list(updated_at) or None
+
+
+def profile_version(request, username):
+    """
+    The user's profile generation, bumped (see api.signals) by their posts,
+    likes, comments and follows and by likes and comments on their posts.
+    Counters of posts by others in the liked section are only picked up with
+    the next ETAG_MAX_AGE bucket.
+    """
+    user_id = User.objects.filter(username=username).values_list("id", flat=True)
+    if not user_id:
+        return None
+    return [
+        user_id[0],
+        *current([ALL, profile_generation(user_id[0])]),
+        _age_bucket(),
+    ]
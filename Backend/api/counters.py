@@ -0,0 +1,71 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Now
+from .models import User, Post, Comment
+
+
+def _count_of(queryset, field):
+    """Correlated `COUNT(*)` of `queryset` rows whose `field` is the outer pk."""
+    counted = (
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def _real_post_counts():
+    return {
+        "real_likes": _count_of(Post.likers.through.objects.all(), "post_id"),
+        "real_comments": _count_of(Comment.objects.all(), "main_post_id"),
+    }
+
+
+def _real_user_counts():
+    follows = User.following.through.objects.all()
+    return {
+        "real_followers": _count_of(follows, "to_user_id"),
+        "real_following": _count_of(follows, "from_user_id"),
+    }
+
+
+def drifted_posts(queryset=None):
+    queryset = Post.objects.all() if queryset is None else queryset
+    return queryset.annotate(**_real_post_counts()).filter(
+        ~Q(likes_count=F("real_likes")) | ~Q(comments_count=F("real_comments"))
+    )
+
+
+def drifted_users(queryset=None):
+    queryset = User.objects.all() if queryset is None else queryset
+    return queryset.annotate(**_real_user_counts()).filter(
+        ~Q(followers_count=F("real_followers"))
+        | ~Q(following_count=F("real_following"))
+    )
+
+
+def repair_post_counters(queryset=None):
+    """Rewrite the stored counters of every drifted post in one UPDATE."""
+    ids = list(drifted_posts(queryset).values_list("id", flat=True))
+    if ids:
+        real = _real_post_counts()
+        Post.objects.filter(id__in=ids).update(
+            likes_count=real["real_likes"],
+            comments_count=real["real_comments"],
+            updated_at=Now(),
+        )
+    return len(ids)
+
+
+def repair_user_counters(queryset=None):
+    """Rewrite the stored counters of every drifted user in one UPDATE."""
+    ids = list(drifted_users(queryset).values_list("id", flat=True))
+    if ids:
+        real = _real_user_counts()
+        User.objects.filter(id__in=ids).update(
+            followers_count=real["real_followers"],
+            following_count=real["real_following"],
+            updated_at=Now(),
+        )
+    return len(ids)
@@ -0,0 +1,53 @@
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.decorators import sync_and_async_middleware
+
+READ_ALIAS = "replica"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Set for the duration of a safe-method request; copied into the worker
+# threads of the async views along with the rest of the context.
+reading = ContextVar("reading", default=False)
+
+
+class ReadReplicaRouter:
+    """Reads of read-only requests go to the read alias, everything else to default."""
+
+    def db_for_read(self, model, **hints):
+        return READ_ALIAS if reading.get() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are connections to the same database file.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+@sync_and_async_middleware
+def route_reads(get_response):
+    """Middleware marking GET/HEAD/OPTIONS requests as read-only."""
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            token = reading.set(request.method in SAFE_METHODS)
+            try:
+                return await get_response(request)
+            finally:
+                reading.reset(token)
+
+        return markcoroutinefunction(middleware)
+
+    def middleware(request):
+        token = reading.set(request.method in SAFE_METHODS)
+        try:
+            return get_response(request)
+        finally:
+            reading.reset(token)
+
+    return middleware
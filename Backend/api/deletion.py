@@ -0,0 +1,115 @@
+"""
+Post and account deletion, run by the job queue (see api.jobs).
+
+A popular post sits in every follower's timeline and a prolific user owns
+thousands of posts, comments, likes and follows, so the rows are deleted
+DELETION_CHUNK_SIZE at a time, one short transaction per chunk, and the
+counters of whatever survives are repaired as they go. Every step only
+deletes what is left, so a retried job picks up where it stopped.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from . import jobs, leaderboards
+from .counters import repair_post_counters, repair_user_counters
+from .models import User, Post, Comment, TimelineEntry
+from .response_cache import (
+    HOME,
+    invalidate,
+    post_generation,
+    profile_generation,
+    profile_generations,
+    user_generation,
+)
+
+Like = Post.likers.through
+Follow = User.following.through
+
+
+def _chunks(queryset, field="id"):
+    """Lists of `field` values of `queryset`, until none are left."""
+    while True:
+        values = list(
+            queryset.values_list(field, flat=True)[: settings.DELETION_CHUNK_SIZE]
+        )
+        if not values:
+            return
+        yield values
+
+
+def _delete_in_chunks(queryset):
+    model = queryset.model
+    for ids in _chunks(queryset):
+        with transaction.atomic():
+            model.objects.filter(id__in=ids).delete()
+
+
+def delete_posts(post_ids):
+    """Delete posts with their timeline entries, comments, likes and tags."""
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), settings.DELETION_CHUNK_SIZE):
+        ids = post_ids[start : start + settings.DELETION_CHUNK_SIZE]
+        # A post fanned out to a large audience has a row per follower.
+        _delete_in_chunks(TimelineEntry.objects.filter(post_id__in=ids))
+        _delete_in_chunks(Comment.objects.filter(main_post_id__in=ids))
+        with transaction.atomic():
+            # Likes, tags and what is left cascade with the posts.
+            Post.objects.filter(id__in=ids).delete()
+        leaderboards.remove(ids)
+
+
+def _remove_likes(user_id):
+    for post_ids in _chunks(Like.objects.filter(user_id=user_id), "post_id"):
+        with transaction.atomic():
+            Like.objects.filter(user_id=user_id, post_id__in=post_ids).delete()
+            repair_post_counters(Post.objects.filter(id__in=post_ids))
+        invalidate(
+            HOME,
+            *map(post_generation, post_ids),
+            *profile_generations(post_ids=post_ids),
+        )
+
+
+def _remove_comments(user_id):
+    for ids in _chunks(Comment.objects.filter(commenter_id=user_id)):
+        post_ids = set(
+            Comment.objects.filter(id__in=ids).values_list("main_post_id", flat=True)
+        )
+        with transaction.atomic():
+            Comment.objects.filter(id__in=ids).delete()
+            repair_post_counters(Post.objects.filter(id__in=post_ids))
+
+
+def _remove_follows(user_id):
+    for side, other in (("from_user_id", "to_user_id"), ("to_user_id", "from_user_id")):
+        follows = Follow.objects.filter(**{side: user_id})
+        for user_ids in _chunks(follows, other):
+            with transaction.atomic():
+                follows.filter(**{f"{other}__in": user_ids}).delete()
+                repair_user_counters(User.objects.filter(id__in=user_ids))
+            invalidate(
+                *map(user_generation, user_ids), *map(profile_generation, user_ids)
+            )
+
+
+def delete_users(user_ids):
+    """Delete accounts and everything they made, then repair counters."""
+    for user_id in user_ids:
+        for post_ids in _chunks(Post.objects.filter(poster_id=user_id)):
+            delete_posts(post_ids)
+        _remove_comments(user_id)
+        _remove_likes(user_id)
+        _remove_follows(user_id)
+        _delete_in_chunks(TimelineEntry.objects.filter(owner_id=user_id))
+        User.objects.filter(id=user_id).delete()
+    leaderboards.clear()
+
+
+@jobs.handler("delete_post")
+def run_delete_posts(payloads):
+    delete_posts(payload["post_id"] for payload in payloads)
+
+
+@jobs.handler("delete_user")
+def run_delete_users(payloads):
+    delete_users(payload["user_id"] for payload in payloads)
@@ -0,0 +1,254 @@
+"""
+Live events for the `/api/events/` stream: new posts and like/comment
+counts, published by the write paths and pushed to connected clients.
+
+Events go through a backend (EVENTS_BACKEND). `LocalBackend` delivers them
+to the streams of this process only; `SocketBackend` also forwards them to
+every other worker on the host over Unix datagram sockets.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Event:
+    kind: str
+    data: dict
+    poster_id: int = None
+
+    @cached_property
+    def frame(self):
+        # Encoded once per event, however many streams it is sent to.
+        if self.kind == "keepalive":
+            return b": keepalive\n\n"
+        return f"event: {self.kind}\ndata: {json.dumps(self.data)}\n\n".encode()
+
+    def to_bytes(self):
+        return json.dumps([self.kind, self.data, self.poster_id]).encode()
+
+    @classmethod
+    def from_bytes(cls, raw):
+        return cls(*json.loads(raw))
+
+
+# Queued for every stream each EVENTS_HEARTBEAT seconds.
+KEEPALIVE = Event("keepalive", {})
+
+
+class Subscription:
+    """One stream's queue. `posters`, if set, limits which new posts it gets."""
+
+    def __init__(self, posters=None):
+        self.queue = asyncio.Queue(settings.EVENTS_QUEUE_SIZE)
+        self.posters = posters
+
+    def wants(self, event):
+        return (
+            event.kind != "post"
+            or self.posters is None
+            or event.poster_id in self.posters
+        )
+
+    def put(self, event):
+        if not self.wants(event):
+            return
+        if event is KEEPALIVE and not self.queue.empty():
+            return
+        if self.queue.full():
+            # Too slow to keep up: end the stream so the client resyncs.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+        else:
+            self.queue.put_nowait(event)
+
+    async def get(self):
+        """The next event, or None once the stream should end."""
+        return await self.queue.get()
+
+
+class Hub:
+    """
+    In-process fan-out to the subscriptions of every event loop. Publishers
+    may be on any thread; each loop's subscriptions are only touched on that
+    loop, so a dispatch costs one thread-safe callback per loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loops = {}  # event loop -> set of subscriptions
+        self._beating = set()  # loops with a heartbeat timer
+
+    def subscribe(self, posters=None):
+        subscription = Subscription(posters)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._beating:
+                # One timer per loop rather than a timeout per stream.
+                self._beating.add(loop)
+                loop.call_later(settings.EVENTS_HEARTBEAT, self._beat, loop)
+            self._loops.setdefault(loop, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            subscriptions = self._loops.get(loop, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._loops.pop(loop, None)
+
+    def count(self):
+        return sum(len(subscriptions) for subscriptions in self._loops.values())
+
+    def dispatch(self, event):
+        with self._lock:
+            loops = list(self._loops)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._deliver, loop, event)
+            except RuntimeError:
+                # The loop was closed without unsubscribing.
+                with self._lock:
+                    self._loops.pop(loop, None)
+                    self._beating.discard(loop)
+
+    def _deliver(self, loop, event):
+        for subscription in list(self._loops.get(loop, ())):
+            subscription.put(event)
+
+    def _beat(self, loop):
+        with self._lock:
+            if loop not in self._loops:
+                self._beating.discard(loop)
+                return
+        self._deliver(loop, KEEPALIVE)
+        loop.call_later(settings.EVENTS_HEARTBEAT, self._beat, loop)
+
+
+hub = Hub()
+
+
+class LocalBackend:
+    """Events reach the streams of the publishing process only."""
+
+    def publish(self, event):
+        hub.dispatch(event)
+
+    def listen(self):
+        pass
+
+
+class SocketBackend:
+    """
+    Events are also sent to the other worker processes on this host. Each
+    process with open streams binds `<EVENTS_SOCKET_DIR>/<pid>.sock`, and
+    publishing sends one datagram to every socket in the directory. Sends
+    never block: a peer whose buffer is full misses the event, and the socket
+    of a dead peer is removed.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or settings.EVENTS_SOCKET_DIR)
+        self.path = self.directory / f"{os.getpid()}.sock"
+        self._lock = threading.Lock()
+        self._receiver = None
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+
+    def publish(self, event):
+        hub.dispatch(event)
+        raw = event.to_bytes()
+        for peer in self.directory.glob("*.sock"):
+            if peer == self.path:
+                continue
+            try:
+                self._sender.sendto(raw, str(peer))
+            except (ConnectionRefusedError, FileNotFoundError):
+                peer.unlink(missing_ok=True)
+            except BlockingIOError:
+                logger.warning("Event stream peer %s is not keeping up.", peer.name)
+
+    def listen(self):
+        """Start receiving other workers' events, once per process."""
+        with self._lock:
+            if self._receiver is not None:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.path.unlink(missing_ok=True)
+            self._receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._receiver.bind(str(self.path))
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def _receive(self):
+        while True:
+            try:
+                raw = self._receiver.recv(65536)
+            except OSError:
+                return  # closed
+            try:
+                event = Event.from_bytes(raw)
+            except (ValueError, TypeError):
+                logger.warning("Dropped a malformed event datagram.")
+                continue
+            hub.dispatch(event)
+
+    def close(self):
+        with self._lock:
+            if self._receiver is not None:
+                self._receiver.close()
+                self.path.unlink(missing_ok=True)
+        self._sender.close()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = import_string(settings.EVENTS_BACKEND)()
+        return _backend
+
+
+def publish(event):
+    """Send `event` once the current transaction (if any) commits."""
+    transaction.on_commit(lambda: backend().publish(event))
+
+
+def post_created(post):
+    publish(
+        Event(
+            "post",
+            {
+                "id": post.id,
+                "poster": post.poster.username,
+                "date_posted": post.date_posted.isoformat(),
+            },
+            post.poster_id,
+        )
+    )
+
+
+def likes_changed(post):
+    publish(Event("likes", {"id": post.id, "count": post.likes_count}))
+
+
+def comments_changed(post):
+    publish(Event("comments", {"id": post.id, "count": post.comments_count}))
@@ -0,0 +1,225 @@
+"""
+Read-only fast path for feeds.
+
+`posts()`, `post()` and `comments()` return exactly what `PostSerializer`
+and `CommentSerializer` would, built straight from the instances (and
+prefetched relations) `Post.objects.for_listing()` loads. DRF binds a copy
+of every field to every serializer instance and dispatches each value
+through `get_attribute`/`to_representation`; here each `?fields=`,
+`?omit=` and `?expand=` combination is compiled once into a tuple of plain
+accessors. `FastJSONRenderer` encodes the result with orjson when it is
+installed.
+
+Both produce the same bytes as the serializers and `JSONRenderer` (see
+FastSerializerTests); FAST_SERIALIZERS = False goes back to those.
+"""
+
+from functools import lru_cache
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601
+from rest_framework import serializers as drf_serializers
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from . import like_buffer, metrics
+from .metrics import TimedJSONRenderer
+from .models import Post
+from .serializers import CommentSerializer, PostSerializer, apply_buffered_likes
+
+try:
+    import orjson
+except ImportError:  # optional: JSONRenderer is used without it
+    orjson = None
+
+
+class Page:
+    """What the accessors need besides the instance, computed once per call."""
+
+    def __init__(self, request):
+        self.request = request
+        self.authenticated = bool(request and request.user.is_authenticated)
+        self.liked_ids = set()
+        self.datetime = _datetime_representation()
+
+
+def _datetime_representation():
+    field = drf_serializers.DateTimeField()
+    output_format = api_settings.DATETIME_FORMAT
+    if not settings.USE_TZ or not output_format or output_format.lower() != ISO_8601:
+        return field.to_representation
+    zone = timezone.get_current_timezone()
+
+    # `DateTimeField.to_representation` for aware datetimes, minus the
+    # per-call settings lookups.
+    def represent(value):
+        if value is None or value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(zone).isoformat()
+        if value.endswith("+00:00"):
+            return value[:-6] + "Z"
+        return value
+
+    return represent
+
+
+def user_row(user, page):
+    """`UserSerializer(user, omit=["following"]).data`"""
+    return {
+        "id": user.id,
+        "username": user.username,
+        "date_joined": page.datetime(user.date_joined),
+        "followers_count": user.followers_count,
+        "following_count": user.following_count,
+    }
+
+
+def _commenter(comment, page):
+    commenter = comment.commenter
+    return commenter.username if commenter else None
+
+
+def _expanded_commenter(comment, page):
+    commenter = comment.commenter
+    return user_row(commenter, page) if commenter else None
+
+
+COMMENT_ACCESSORS = {
+    "id": lambda comment, page: comment.id,
+    "main_post": lambda comment, page: comment.main_post_id,
+    "comment": lambda comment, page: comment.comment,
+    "commenter": _commenter,
+    "commented": lambda comment, page: page.datetime(comment.commented),
+}
+EXPANDED_COMMENT_ACCESSORS = {"commenter": _expanded_commenter}
+
+
+def _comments(post, page):
+    # `PostSerializer.get_comments` serializes these with no request, so
+    # every field and no expansion.
+    comments = getattr(post, "loaded_comments", None)
+    if comments is None:
+        comments = post.comments.all()
+    accessors = _compile(CommentSerializer, frozenset(COMMENT_ACCESSORS))
+    return [_row(comment, accessors, page) for comment in comments]
+
+
+POST_ACCESSORS = {
+    "id": lambda post, page: post.id,
+    "tweet": lambda post, page: post.tweet,
+    "poster": lambda post, page: post.poster.username,
+    "likers": lambda post, page: [user.username for user in post.likers.all()],
+    "is_liked": lambda post, page: post.id in page.liked_ids,
+    "date_posted": lambda post, page: page.datetime(post.date_posted),
+    "edited": lambda post, page: post.edited,
+    "comments": _comments,
+    "likes_count": lambda post, page: post.likes_count,
+    "comments_count": lambda post, page: post.comments_count,
+}
+EXPANDED_POST_ACCESSORS = {"poster": lambda post, page: user_row(post.poster, page)}
+
+ACCESSORS = {
+    PostSerializer: (POST_ACCESSORS, EXPANDED_POST_ACCESSORS),
+    CommentSerializer: (COMMENT_ACCESSORS, EXPANDED_COMMENT_ACCESSORS),
+}
+
+
+@lru_cache(maxsize=256)
+def _compile(serializer_class, names, expanded=frozenset()):
+    """(name, accessor) pairs for `names`, in the serializer's field order."""
+    accessors, expanded_accessors = ACCESSORS[serializer_class]
+    return tuple(
+        (
+            name,
+            (
+                expanded_accessors[name]
+                if name in expanded and name in expanded_accessors
+                else accessors[name]
+            ),
+        )
+        for name in serializer_class.Meta.fields
+        if name in names
+    )
+
+
+def _row(instance, accessors, page):
+    return {name: accessor(instance, page) for name, accessor in accessors}
+
+
+def _accessors(serializer_class, request):
+    return _compile(
+        serializer_class,
+        frozenset(serializer_class.requested_fields(request)),
+        frozenset(serializer_class.expanded_fields(request)),
+    )
+
+
+def posts(posts, request=None):
+    """`PostSerializer(posts, many=True, context={"request": request}).data`"""
+    if not settings.FAST_SERIALIZERS:
+        context = {"request": request}
+        return PostSerializer(posts, many=True, context=context).data
+    with metrics.measure("serialize"):
+        posts = list(posts)
+        page = Page(request)
+        accessors = _accessors(PostSerializer, request)
+        if page.authenticated and posts and "is_liked" in dict(accessors):
+            page.liked_ids.update(
+                Post.likers.through.objects.filter(
+                    user_id=request.user.id, post_id__in=[post.id for post in posts]
+                ).values_list("post_id", flat=True)
+            )
+        rows = [_row(post, accessors, page) for post in posts]
+        if like_buffer.enabled():
+            apply_buffered_likes(request, rows, [post.id for post in posts])
+        return rows
+
+
+def post(post, request=None):
+    """`PostSerializer(post, context={"request": request}).data`"""
+    if not settings.FAST_SERIALIZERS:
+        return PostSerializer(post, context={"request": request}).data
+    return posts([post], request)[0]
+
+
+def comments(comments, request=None):
+    """`CommentSerializer(comments, many=True, context=...).data`"""
+    if not settings.FAST_SERIALIZERS:
+        context = {"request": request}
+        return CommentSerializer(comments, many=True, context=context).data
+    with metrics.measure("serialize"):
+        page = Page(request)
+        accessors = _accessors(CommentSerializer, request)
+        return [_row(comment, accessors, page) for comment in comments]
+
+
+class FastJSONRenderer(TimedJSONRenderer):
+    """
+    `JSONRenderer`'s bytes from orjson. Datetimes, decimals and lazy strings
+    still go through DRF's encoder, and anything orjson refuses (non-string
+    keys, integers over 64 bits) or pretty printing falls back to the stock
+    renderer. orjson writes floats differently, so this is for payloads
+    without them, such as the feeds.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or not settings.FAST_SERIALIZERS
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        with metrics.measure("render"):
+            try:
+                rendered = orjson.dumps(data, default=self.default, option=self.options)
+            except orjson.JSONEncodeError:
+                return super().render(data, accepted_media_type, renderer_context)
+            # Escaped like JSONRenderer, to stay a strict JavaScript subset.
+            return rendered.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
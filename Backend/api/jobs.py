@@ -0,0 +1,172 @@
+"""
+A job queue kept in the database and worked by `manage.py run_jobs`, so
+slow or deferrable work leaves the request without needing a broker.
+
+`enqueue()` adds a row in the caller's transaction: the job exists exactly
+when the request's own writes commit. Workers claim due jobs of one kind,
+up to JOB_BATCH_SIZE at a time, with a conditional UPDATE, so any number
+of workers can share the table. Each batch's payloads go to that kind's
+handler in one call. A claim holds a lease of JOB_LEASE seconds, and a
+worker that dies loses its jobs to the next one once the lease expires.
+
+Failed jobs are retried with exponential backoff until they reach
+`max_attempts`, then kept as failed with their traceback. Handlers must be
+safe to run again, since a job can be retried after partly succeeding.
+"""
+
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}  # kind -> function taking a list of payloads
+
+
+def handler(kind):
+    """Register the decorated function to run batches of `kind` jobs."""
+
+    def register(function):
+        _handlers[kind] = function
+        return function
+
+    return register
+
+
+def enqueue(kind, payload=None, key=None, delay=0, max_attempts=None):
+    """
+    Queue a `kind` job with a JSON `payload`, runnable after `delay` seconds.
+    With a `key`, a job already queued (or run) for the same kind and key
+    is returned instead of adding another.
+    """
+    fields = {
+        "payload": payload or {},
+        "run_at": timezone.now() + timedelta(seconds=delay),
+        "max_attempts": max_attempts or settings.JOB_MAX_ATTEMPTS,
+    }
+    if key is None:
+        return Job.objects.create(kind=kind, **fields)
+    job, _ = Job.objects.get_or_create(kind=kind, key=key, defaults=fields)
+    return job
+
+
+def _due(now):
+    # Queued and due, or running on a lease that has run out.
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    )
+
+
+def claim(kinds=None, limit=None):
+    """Lease the oldest due jobs of one kind to this caller; [] if none."""
+    now = timezone.now()
+    due = _due(now)
+    if kinds:
+        due = due.filter(kind__in=kinds)
+    kind = due.order_by("run_at", "id").values_list("kind", flat=True).first()
+    if kind is None:
+        return []
+    ids = list(
+        due.filter(kind=kind)
+        .order_by("run_at", "id")
+        .values_list("id", flat=True)[: limit or settings.JOB_BATCH_SIZE]
+    )
+    # Rows another worker claimed first no longer match `due`.
+    token = uuid.uuid4().hex
+    due.filter(id__in=ids).update(
+        status=Job.RUNNING,
+        locked_by=token,
+        locked_until=now + timedelta(seconds=settings.JOB_LEASE),
+        attempts=F("attempts") + 1,
+    )
+    return list(Job.objects.filter(id__in=ids, locked_by=token, status=Job.RUNNING))
+
+
+def _fail(job, error):
+    now = timezone.now()
+    if job.attempts >= job.max_attempts:
+        changes = {"status": Job.FAILED, "finished_at": now}
+        logger.error("Job %s failed for good:\n%s", job, error)
+    else:
+        delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        changes = {"status": Job.QUEUED, "run_at": now + timedelta(seconds=delay)}
+        logger.warning("Job %s failed, retrying in %ss:\n%s", job, delay, error)
+    _release([job], last_error=error, **changes)
+
+
+def _release(jobs, **changes):
+    # Only jobs still leased to us: one whose lease ran out may be elsewhere.
+    Job.objects.filter(
+        id__in=[job.id for job in jobs], locked_by=jobs[0].locked_by
+    ).update(locked_by="", locked_until=None, **changes)
+
+
+def run(jobs):
+    """Run one claimed batch (all of one kind) and record the outcome."""
+    if not jobs:
+        return
+    function = _handlers.get(jobs[0].kind)
+    try:
+        if function is None:
+            raise LookupError(f"No handler for {jobs[0].kind!r} jobs.")
+        function([job.payload for job in jobs])
+    except Exception:
+        if len(jobs) > 1:
+            # Rerun one at a time, so a bad job cannot hold back the rest.
+            for job in jobs:
+                run([job])
+        else:
+            _fail(jobs[0], traceback.format_exc())
+        return
+    _release(jobs, status=Job.DONE, last_error="", finished_at=timezone.now())
+
+
+def work(kinds=None, limit=None):
+    """Claim and run one batch; the number of jobs it held."""
+    jobs = claim(kinds, limit)
+    run(jobs)
+    return len(jobs)
+
+
+def work_all(kinds=None):
+    """Run batches until nothing is due, e.g. in tests; the jobs run."""
+    total = 0
+    while processed := work(kinds):
+        total += processed
+    return total
+
+
+def prune():
+    """Delete jobs that finished (or failed) more than JOB_RETENTION ago."""
+    cutoff = timezone.now() - settings.JOB_RETENTION
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED], finished_at__lt=cutoff
+    ).delete()
+    return deleted
+
+
+def depth():
+    """Per kind: how many jobs are queued, running and failed, and since when."""
+    rows = (
+        Job.objects.exclude(status=Job.DONE)
+        .values("kind", "status")
+        .annotate(count=Count("*"), oldest=Min("run_at"))
+        .order_by("kind", "status")
+    )
+    queues = {}
+    for row in rows:
+        queue = queues.setdefault(
+            row["kind"],
+            {"queued": 0, "running": 0, "failed": 0, "oldest_queued": None},
+        )
+        queue[row["status"]] = row["count"]
+        if row["status"] == Job.QUEUED:
+            queue["oldest_queued"] = row["oldest"]
+    return queues
@@ -0,0 +1,130 @@
+import threading
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import Post
+
+
+# Leaderboard name -> the Post counter it ranks by.
+METRICS = {"most_liked": "likes_count", "most_commented": "comments_count"}
+
+# Each board keeps more candidates than it shows, so an unlike that drops a
+# post out of the top entries can be absorbed without a rebuild.
+TOP = 10
+BUFFER = 50
+
+_lock = threading.Lock()
+
+
+class UnknownWindow(ValueError):
+    pass
+
+
+def _key(metric, window):
+    return f"leaderboard:{metric}:{window}"
+
+
+def _window_start(window):
+    try:
+        span = settings.LEADERBOARD_WINDOWS[window]
+    except KeyError:
+        raise UnknownWindow(f"Unknown leaderboard window: {window}.") from None
+    return None if span is None else timezone.now() - span
+
+
+def _rebuild(metric, window):
+    field = METRICS[metric]
+    posts = Post.objects.all()
+    since = _window_start(window)
+    if since is not None:
+        posts = posts.filter(date_posted__gte=since)
+    entries = list(
+        posts.order_by(f"-{field}", "-date_posted", "-id").values_list(
+            field, "date_posted", "id"
+        )[:BUFFER]
+    )
+    # A board holding fewer than BUFFER posts holds every candidate.
+    return {"entries": entries, "complete": len(entries) < BUFFER}
+
+
+def _live(board, window):
+    since = _window_start(window)
+    if since is not None:
+        board["entries"] = [e for e in board["entries"] if e[1] >= since]
+    return board
+
+
+def top_post_ids(metric, window="all"):
+    """Ids of the top posts for `metric`, best first, served from the cache."""
+    key = _key(metric, window)
+    board = cache.get(key)
+    if board is not None:
+        board = _live(board, window)
+    if board is None or (len(board["entries"]) < TOP and not board["complete"]):
+        board = _rebuild(metric, window)
+        cache.set(key, board, settings.LEADERBOARD_TIMEOUT)
+    return [post_id for _, _, post_id in board["entries"][:TOP]]
+
+
+def top_posts(queryset, metric, window="all"):
+    ids = top_post_ids(metric, window)
+    posts = queryset.order_by().in_bulk(ids)
+    return [posts[post_id] for post_id in ids if post_id in posts]
+
+
+def record(post, metric, score):
+    """Move `post` to its new `score` on every cached board for `metric`."""
+    with _lock:
+        for window in settings.LEADERBOARD_WINDOWS:
+            key = _key(metric, window)
+            board = cache.get(key)
+            if board is None:
+                continue
+            since = _window_start(window)
+            if since is not None and post.date_posted < since:
+                continue
+            _place(board, (score, post.date_posted, post.id))
+            cache.set(key, board, settings.LEADERBOARD_TIMEOUT)
+
+
+def _place(board, entry):
+    entries = [e for e in board["entries"] if e[2] != entry[2]]
+    # Below the last kept candidate, the post may rank under posts the board
+    # never loaded, so it only stays if the board is known to be complete.
+    if board["complete"] or (entries and entry > entries[-1]):
+        entries.append(entry)
+        entries.sort(reverse=True)
+        if len(entries) > BUFFER:
+            entries = entries[:BUFFER]
+            board["complete"] = False
+    board["entries"] = entries
+
+
+def post_created(post):
+    for metric in METRICS:
+        record(post, metric, 0)
+
+
+def remove(post_ids):
+    """Take deleted posts off every cached board."""
+    post_ids = set(post_ids)
+    with _lock:
+        for metric in METRICS:
+            for window in settings.LEADERBOARD_WINDOWS:
+                key = _key(metric, window)
+                board = cache.get(key)
+                if board is None:
+                    continue
+                entries = [e for e in board["entries"] if e[2] not in post_ids]
+                if len(entries) != len(board["entries"]):
+                    board["entries"] = entries
+                    cache.set(key, board, settings.LEADERBOARD_TIMEOUT)
+
+
+def clear():
+    """Drop every cached board, e.g. after rows were bulk-loaded."""
+    cache.delete_many(
+        _key(metric, window)
+        for metric in METRICS
+        for window in settings.LEADERBOARD_WINDOWS
+    )
@@ -0,0 +1,230 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+from . import leaderboards
+from .models import User, Post
+
+
+logger = logging.getLogger(__name__)
+
+Like = Post.likers.through
+
+
+class LikeBuffer:
+    """
+    In-process write-behind queue for like/unlike intents.
+
+    Intents are collapsed per (user, post) and flushed in one transaction every
+    LIKE_FLUSH_INTERVAL seconds. Each intent remembers the state it started
+    from, so `delta()` (likes not yet persisted) and `state()` give readers
+    the pending + persisted view until the flush lands.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}  # (user_id, post_id) -> (desired, baseline)
+        self._flushing = {}
+        self._deltas = defaultdict(int)
+        self._attempts = defaultdict(int)  # (user_id, post_id) -> failed flushes
+        self._flushes = 0  # flushes finished, so enqueue() can tell one landed
+        self._thread = None
+
+    def state(self, user_id, post_id):
+        """The buffered like state of `user_id` for `post_id`, or None."""
+        entry = self._pending.get((user_id, post_id)) or self._flushing.get(
+            (user_id, post_id)
+        )
+        return None if entry is None else entry[0]
+
+    def delta(self, post_id):
+        """Likes of `post_id` that are buffered but not yet persisted."""
+        return self._deltas.get(post_id, 0)
+
+    def enqueue(self, user_id, post_id, liked=None):
+        """
+        Record a like (True), unlike (False) or toggle (None) and return
+        `(liked, changed)` against the buffered + persisted state.
+        """
+        key = (user_id, post_id)
+        persisted = flushes = None
+        while True:
+            with self._lock:
+                if key in self._pending:
+                    current, baseline = self._pending[key]
+                    self._deltas[post_id] -= current - baseline
+                elif key in self._flushing:
+                    current = baseline = self._flushing[key][0]
+                elif persisted is not None and flushes == self._flushes:
+                    current = baseline = persisted
+                else:
+                    # Not buffered: read what is persisted, and read it again
+                    # if a flush lands in the meantime.
+                    flushes, current = self._flushes, None
+                if current is not None:
+                    desired = (not current) if liked is None else liked
+                    self._pending[key] = (desired, baseline)
+                    self._deltas[post_id] += desired - baseline
+                    break
+            persisted = Like.objects.filter(user_id=user_id, post_id=post_id).exists()
+        self._start()
+        return desired, desired != current
+
+    def flush(self):
+        """
+        Persist every buffered intent in one transaction. If that fails, the
+        intents are written post by post, so one bad intent cannot hold back
+        the rest; the failed ones are retried on later flushes, up to
+        LIKE_FLUSH_MAX_ATTEMPTS times, then dropped.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            if not batch:
+                return 0
+            failed, error = {}, None
+            try:
+                self._write(batch)
+            except Exception as batch_error:
+                error = batch_error
+                by_post = defaultdict(dict)
+                for key, intent in batch.items():
+                    by_post[key[1]][key] = intent
+                for intents in by_post.values():
+                    try:
+                        self._write(intents)
+                    except Exception as post_error:
+                        error = post_error
+                        failed.update(intents)
+            with self._lock:
+                for key, (desired, baseline) in batch.items():
+                    post_id = key[1]
+                    if key in failed:
+                        self._attempts[key] += 1
+                        if self._attempts[key] < settings.LIKE_FLUSH_MAX_ATTEMPTS:
+                            # Back in front of anything queued since.
+                            if key in self._pending:
+                                desired = self._pending[key][0]
+                            self._pending[key] = (desired, baseline)
+                            continue
+                        logger.error("Dropped buffered like %s: %s", key, error)
+                        del self._attempts[key]
+                        if key in self._pending:
+                            # A newer intent started from this one: it now
+                            # starts from what is persisted, with the delta.
+                            self._pending[key] = (self._pending[key][0], baseline)
+                            continue
+                    else:
+                        self._attempts.pop(key, None)
+                    self._deltas[post_id] -= desired - baseline
+                    if not self._deltas[post_id]:
+                        del self._deltas[post_id]
+                self._flushing = {}
+                self._flushes += 1
+            if failed:
+                raise error
+            return len(batch)
+
+    def _write(self, batch):
+        post_ids = {post_id for _, post_id in batch}
+        user_ids = {user_id for user_id, _ in batch}
+        with transaction.atomic():
+            # Intents for posts or accounts deleted since are dropped.
+            post_ids = set(
+                Post.objects.filter(id__in=post_ids).values_list("id", flat=True)
+            )
+            user_ids = set(
+                User.objects.filter(id__in=user_ids).values_list("id", flat=True)
+            )
+            batch = {
+                (user_id, post_id): intent
+                for (user_id, post_id), intent in batch.items()
+                if user_id in user_ids and post_id in post_ids
+            }
+            existing = set(
+                Like.objects.filter(
+                    post_id__in=post_ids, user_id__in=user_ids
+                ).values_list("user_id", "post_id")
+            )
+            added = defaultdict(set)
+            removed = defaultdict(set)
+            for (user_id, post_id), (desired, _) in batch.items():
+                if desired and (user_id, post_id) not in existing:
+                    added[post_id].add(user_id)
+                elif not desired and (user_id, post_id) in existing:
+                    removed[post_id].add(user_id)
+
+            Like.objects.bulk_create(
+                [
+                    Like(post_id=post_id, user_id=user_id)
+                    for post_id, users in added.items()
+                    for user_id in users
+                ],
+                batch_size=500,
+                ignore_conflicts=True,
+            )
+            for post_id, users in removed.items():
+                Like.objects.filter(post_id=post_id, user_id__in=users).delete()
+
+            now = timezone.now()
+            changed = set(added) | set(removed)
+            for post_id in changed:
+                delta = len(added[post_id]) - len(removed[post_id])
+                Post.objects.filter(id=post_id).update(
+                    likes_count=F("likes_count") + delta, updated_at=now
+                )
+            changed_users = set().union(*added.values(), *removed.values())
+            User.objects.filter(id__in=changed_users).update(updated_at=now)
+
+            for action, changes in (("post_add", added), ("post_remove", removed)):
+                for post_id, users in changes.items():
+                    m2m_changed.send(
+                        sender=Like,
+                        instance=Post(id=post_id),
+                        action=action,
+                        reverse=False,
+                        model=User,
+                        pk_set=users,
+                        using=Like.objects.db,
+                    )
+
+        for post in Post.objects.filter(id__in=changed).only(
+            "id", "date_posted", "likes_count"
+        ):
+            leaderboards.record(post, "most_liked", post.likes_count)
+
+    def _start(self):
+        if self._thread is not None or settings.LIKE_FLUSH_INTERVAL is None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="like-buffer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(settings.LIKE_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing buffered likes failed.")
+            finally:
+                close_old_connections()
+
+
+buffer = LikeBuffer()
+
+
+def enabled():
+    return settings.LIKE_WRITE_BEHIND
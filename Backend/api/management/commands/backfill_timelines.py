@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from api.models import Post
+from api.timeline import fan_out_post
+
+
+class Command(BaseCommand):
+    help = "Fan out posts that were never copied into their followers' timelines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        posts = (
+            Post.objects.filter(fanned_out=False)
+            .select_related("poster")
+            .order_by("date_posted")
+        )
+        fanned = skipped = 0
+        for post in posts.iterator(chunk_size=options["chunk_size"]):
+            if fan_out_post(post):
+                fanned += 1
+            else:
+                skipped += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Fanned out {fanned} posts, left {skipped} to fan-out-on-read."
+            )
+        )
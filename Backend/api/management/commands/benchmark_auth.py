@@ -0,0 +1,62 @@
+import json
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+from api import authentication
+from api.benchmark import measure, scratch_database
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request authentication and refresh-token blacklist checks "
+        "with the stock simplejwt classes and the cached ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=2000)
+        parser.add_argument("--blacklisted", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with scratch_database(on_disk=True):
+            cache.clear()
+            authentication.blacklist.reset()
+            user = User.objects.create_user("bench")
+            for _ in range(options["blacklisted"]):
+                authentication.RefreshToken.for_user(user).blacklist()
+            results = self.run(user, options["repeat"])
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, user, repeat):
+        request = RequestFactory().get(
+            "/", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        refresh = str(authentication.RefreshToken.for_user(user))
+        stock, cached = JWTAuthentication(), authentication.CachedJWTAuthentication()
+        cases = {
+            "authenticate_stock": lambda: stock.authenticate(request),
+            "authenticate_cached": lambda: cached.authenticate(request),
+            "refresh_check_stock": lambda: tokens.RefreshToken(refresh),
+            "refresh_check_filtered": lambda: authentication.RefreshToken(refresh),
+        }
+        results = {}
+        for name, case in cases.items():
+            case()  # warm caches and the blacklist filter
+            queries = []
+
+            def count(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count):
+                timing = measure(case, repeat)
+            results[name] = {
+                "us_per_op": round(timing["mean_ms"] * 1000, 1),
+                "p99_us": round(timing["p99_ms"] * 1000, 1),
+                "queries_per_op": round(len(queries) / repeat, 3),
+            }
+        return results
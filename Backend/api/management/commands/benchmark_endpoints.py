@@ -0,0 +1,225 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from api.benchmark import scratch_database, summarize
+from api.models import User, Post
+from api.seeding import power_law_weights, seed
+
+# Endpoint name -> (method, path for a target chosen by `Target`).
+ENDPOINTS = {
+    "home": ("GET", lambda target: "/api/home/"),
+    "following_feed": ("GET", lambda target: "/api/following-feed/"),
+    "profile": ("GET", lambda target: f"/api/profile/{target.username()}/"),
+    "toggle_like": ("POST", lambda target: f"/api/tweet/like-unlike/{target.post()}/"),
+}
+
+
+class Target:
+    """
+    Picks who makes each request and what it is about. Viewers are chosen
+    uniformly, while profiles and posts are chosen by the same power law as
+    the seeded follows and likes, so popular rows get most of the traffic.
+    """
+
+    def __init__(self, prefix, alpha, rng):
+        self.rng = rng
+        users = list(
+            User.objects.filter(username__startswith=prefix)
+            .order_by("-followers_count", "id")
+            .values_list("id", "username")
+        )
+        if not users:
+            raise CommandError(f"No users named {prefix}*; run seed_data first.")
+        self.viewers = [user_id for user_id, _ in users]
+        self.usernames = [username for _, username in users]
+        self.posts = list(
+            Post.objects.filter(poster__username__startswith=prefix)
+            .order_by("-likes_count", "id")
+            .values_list("id", flat=True)
+        )
+        self.user_weights = power_law_weights(len(self.usernames), alpha)
+        self.post_weights = power_law_weights(len(self.posts), alpha)
+        self.tokens = {}
+
+    def viewer(self):
+        return self.rng.choice(self.viewers)
+
+    def username(self):
+        return self.rng.choices(self.usernames, cum_weights=self.user_weights)[0]
+
+    def post(self):
+        return self.rng.choices(self.posts, cum_weights=self.post_weights)[0]
+
+    def headers(self, user_id):
+        if user_id not in self.tokens:
+            self.tokens[user_id] = str(AccessToken.for_user(User(id=user_id)))
+        return {"Authorization": f"Bearer {self.tokens[user_id]}"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main endpoints at a given concurrency through the Django test "
+        "client on a seeded scratch database, or against a running server, and "
+        "report latency percentiles, queries per request and response bytes as "
+        "JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=2000)
+        parser.add_argument("--posts", type=int, default=20000)
+        parser.add_argument("--follows", type=int, default=20)
+        parser.add_argument("--likes", type=int, default=5)
+        parser.add_argument("--comments", type=int, default=1)
+        parser.add_argument("--alpha", type=float, default=1.1)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--requests", type=int, default=200, help="Per endpoint.")
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            choices=ENDPOINTS,
+            help="Endpoint to run; repeat for several. Defaults to all.",
+        )
+        parser.add_argument(
+            "--base-url",
+            help=(
+                "Benchmark a running server, e.g. http://127.0.0.1:8000, whose "
+                "database was filled by seed_data. Query counts are not available."
+            ),
+        )
+        parser.add_argument("--prefix", default="seed", help="Seeded username prefix.")
+        parser.add_argument(
+            "--no-response-cache",
+            action="store_true",
+            help="Bypass the response cache so every read reaches the database.",
+        )
+        parser.add_argument("--output", help="Also write the JSON report here.")
+
+    def handle(self, *args, **options):
+        remote = options["base_url"] is not None
+        response_cache = (
+            override_settings(RESPONSE_CACHE_TIMEOUT=0)
+            if options["no_response_cache"]
+            else nullcontext()
+        )
+        with (
+            nullcontext() if remote else scratch_database(on_disk=True)
+        ), response_cache:
+            if not remote:
+                cache.clear()
+                seed(
+                    options["users"],
+                    options["posts"],
+                    follows=options["follows"],
+                    likes=options["likes"],
+                    comments=options["comments"],
+                    alpha=options["alpha"],
+                    prefix=options["prefix"],
+                    rng=random.Random(options["seed"]),
+                )
+            target = Target(
+                options["prefix"], options["alpha"], random.Random(options["seed"])
+            )
+            report = {
+                "config": {
+                    key: options[key]
+                    for key in (
+                        "base_url",
+                        "concurrency",
+                        "requests",
+                        "no_response_cache",
+                    )
+                },
+                "endpoints": {},
+            }
+            if not remote:
+                report["config"].update(
+                    users=len(target.usernames), posts=len(target.posts)
+                )
+            for name in options["endpoint"] or ENDPOINTS:
+                report["endpoints"][name] = self.run(name, target, **options)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        self.stdout.write(output)
+
+    def run(self, name, target, base_url, concurrency, requests, **options):
+        method, path = ENDPOINTS[name]
+        # Draw every request up front so threads only time the requests.
+        jobs = [(target.viewer(), path(target)) for _ in range(requests)]
+        jobs = [(path, target.headers(viewer)) for viewer, path in jobs]
+        fetch = self.fetch_remote if base_url else self.fetch_local
+        local = threading.local()
+
+        def timed(job):
+            return fetch(local, method, base_url, *job)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            outcomes = list(pool.map(timed, jobs))
+        elapsed = time.perf_counter() - start
+
+        ok = [outcome for outcome in outcomes if outcome["status"] < 400]
+        if not ok:
+            raise CommandError(f"Every {name} request failed: {outcomes[0]}")
+        queries = [outcome["queries"] for outcome in ok]
+        return {
+            **summarize([outcome["seconds"] for outcome in ok]),
+            "requests_per_second": round(len(ok) / elapsed, 1),
+            "errors": len(outcomes) - len(ok),
+            "queries_per_request": (
+                None if base_url else round(sum(queries) / len(queries), 2)
+            ),
+            "bytes_per_response": round(
+                sum(outcome["bytes"] for outcome in ok) / len(ok)
+            ),
+        }
+
+    def fetch_local(self, local, method, base_url, path, headers):
+        if not hasattr(local, "client"):
+            local.client = Client()
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count):
+            response = local.client.generic(method, path, headers=headers)
+        return {
+            "status": response.status_code,
+            "seconds": time.perf_counter() - start,
+            "queries": queries,
+            "bytes": len(response.content),
+        }
+
+    def fetch_remote(self, local, method, base_url, path, headers):
+        request = urllib.request.Request(
+            base_url.rstrip("/") + path, method=method, headers=headers
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as error:
+            status, body = error.code, error.read()
+        return {
+            "status": status,
+            "seconds": time.perf_counter() - start,
+            "queries": None,
+            "bytes": len(body),
+        }
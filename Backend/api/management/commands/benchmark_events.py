@@ -0,0 +1,110 @@
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from api import events
+from api.benchmark import summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many idle /api/events/ streams on one ASGI application in this "
+        "process and measure their memory and how fast events fan out to all "
+        "of them. Streams are driven in memory, so kernel socket costs are "
+        "not included."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--connections",
+            default="100,1000,5000",
+            help="Comma-separated stream counts to try.",
+        )
+        parser.add_argument("--events", type=int, default=50, help="Per run.")
+
+    def handle(self, *args, **options):
+        application = get_asgi_application()
+        results = [
+            asyncio.run(self.run(application, int(count), options["events"]))
+            for count in options["connections"].split(",")
+        ]
+        self.stdout.write(json.dumps(results, indent=2))
+
+    async def run(self, application, connections, event_count):
+        started, delivered = [], {}
+        all_delivered = asyncio.Event()
+        closing = asyncio.Event()
+
+        def client():
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await closing.wait()
+                return {"type": "http.disconnect"}
+
+            return receive
+
+        async def send(message):
+            body = message.get("body", b"")
+            if body.startswith(b"retry:"):
+                started.append(None)
+            elif body.startswith(b"event:"):
+                delivered[body] = delivered.get(body, 0) + 1
+                if delivered[body] == connections:
+                    all_delivered.set()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/api/events/",
+            "raw_path": b"/api/events/",
+            "query_string": b"",
+            "headers": [(b"host", b"localhost")],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        streams = [
+            asyncio.create_task(application(dict(scope), client(), send))
+            for _ in range(connections)
+        ]
+        # Streams are open once they have sent their first chunk.
+        while len(started) < connections:
+            await asyncio.sleep(0.01)
+        connect_seconds = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        fan_out = []
+        start = time.perf_counter()
+        for i in range(event_count):
+            all_delivered.clear()
+            sent = time.perf_counter()
+            events.hub.dispatch(events.Event("likes", {"id": i, "count": i}))
+            await all_delivered.wait()
+            fan_out.append(time.perf_counter() - sent)
+        elapsed = time.perf_counter() - start
+
+        closing.set()
+        await asyncio.gather(*streams)
+        return {
+            "connections": connections,
+            "connect_seconds": round(connect_seconds, 2),
+            "kib_per_connection": round(memory / connections / 1024, 1),
+            "fan_out": summarize(fan_out),
+            "deliveries_per_second": round(connections * event_count / elapsed),
+        }
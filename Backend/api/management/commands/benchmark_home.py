@@ -0,0 +1,85 @@
+import json
+import random
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import Client
+from api import leaderboards
+from api.benchmark import measure, scratch_database
+from api.counters import repair_post_counters
+from api.models import User, Post, Comment
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the home page leaderboards against the per-request aggregate "
+        "queries on a seeded scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=100000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.seed(options["users"], options["posts"])
+            results = self.run(options["repeat"])
+        results["posts"] = options["posts"]
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def seed(self, user_count, post_count):
+        rng = random.Random(0)
+        users = User.objects.bulk_create(
+            [User(username=f"user{i}") for i in range(user_count)]
+        )
+        posts = Post.objects.bulk_create(
+            [
+                Post(tweet=f"post {i}", poster=rng.choice(users))
+                for i in range(post_count)
+            ],
+            batch_size=5000,
+        )
+        likes = set()
+        for _ in range(post_count * 3):
+            likes.add((rng.choice(posts).id, rng.choice(users).id))
+        Post.likers.through.objects.bulk_create(
+            [Post.likers.through(post_id=p, user_id=u) for p, u in likes],
+            batch_size=5000,
+        )
+        Comment.objects.bulk_create(
+            [
+                Comment(main_post=rng.choice(posts), commenter=rng.choice(users))
+                for _ in range(post_count)
+            ],
+            batch_size=5000,
+        )
+        repair_post_counters()
+
+    def run(self, repeat):
+        def aggregates():
+            posts = Post.objects.all()
+            list(
+                posts.annotate(like_count=Count("likers")).order_by(
+                    "-like_count", "-date_posted"
+                )[:10]
+            )
+            list(
+                posts.annotate(comment_count=Count("comments")).order_by(
+                    "-comment_count", "-date_posted"
+                )[:10]
+            )
+
+        def boards():
+            leaderboards.top_post_ids("most_liked")
+            leaderboards.top_post_ids("most_commented")
+
+        client = Client()
+        cache.clear()
+        cold = measure(boards, 1)
+        return {
+            "aggregate_queries": measure(aggregates, repeat),
+            "leaderboards_cold": cold,
+            "leaderboards_cached": measure(boards, repeat),
+            "home_page": measure(lambda: client.get("/api/home/"), repeat),
+        }
@@ -0,0 +1,75 @@
+import json
+import random
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+from api.benchmark import scratch_database
+from api.like_buffer import buffer
+from api.models import User, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure sustained like/unlike throughput on one viral post, writing "
+        "through directly and through the write-behind buffer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=200, help="Per thread.")
+
+    def handle(self, *args, **options):
+        with scratch_database(on_disk=True):
+            post = Post.objects.create(
+                tweet="viral", poster=User.objects.create_user("author")
+            )
+            users = User.objects.bulk_create(
+                [User(username=f"fan{i}") for i in range(options["threads"] * 50)]
+            )
+            results = {}
+            for mode, write_behind in (("direct", False), ("write_behind", True)):
+                with override_settings(
+                    LIKE_WRITE_BEHIND=write_behind, LIKE_FLUSH_INTERVAL=0.2
+                ):
+                    results[mode] = self.run(post, users, **options)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, post, users, threads, requests, **options):
+        errors = []
+        per_thread = len(users) // threads
+
+        def worker(index):
+            rng = random.Random(index)
+            client = APIClient()
+            mine = users[index * per_thread : (index + 1) * per_thread]
+            try:
+                for _ in range(requests):
+                    client.force_authenticate(rng.choice(mine))
+                    response = client.post(f"/api/tweet/like-unlike/{post.id}/")
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            except Exception as error:
+                errors.append(repr(error))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        buffer.flush()
+        elapsed = time.perf_counter() - start
+
+        total = threads * requests
+        return {
+            "threads": threads,
+            "requests": total,
+            "errors": len(errors),
+            "seconds": round(elapsed, 3),
+            "likes_per_second": round(total / elapsed, 1),
+        }
@@ -0,0 +1,77 @@
+import json
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api import fast_serializers
+from api.benchmark import scratch_database, summarize
+from api.models import Post
+from api.seeding import seed
+from api.serializers import PostSerializer
+
+# Variant -> FAST_SERIALIZERS. The renderer follows the same setting.
+VARIANTS = {"drf": False, "fast": True}
+
+
+class Command(BaseCommand):
+    help = (
+        "Serialize and render pages of seeded posts (with their likers and "
+        "comment previews) through PostSerializer + JSONRenderer and through "
+        "api.fast_serializers + FastJSONRenderer, check both give the same "
+        "bytes and report serialized posts per second as JSON. Pages are "
+        "loaded once, so only serialization and rendering are timed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=2000, help="To seed.")
+        parser.add_argument("--page", type=int, default=20, help="Posts per page.")
+        parser.add_argument("--rounds", type=int, default=200)
+        parser.add_argument(
+            "--query",
+            default="",
+            help="Query string of the simulated request, e.g. expand=poster.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed(
+                max(options["posts"] // 10, 2),
+                options["posts"],
+                likes=10,
+                comments=3,
+                rng=random.Random(options["seed"]),
+            )
+            request = Request(APIRequestFactory().get(f"/?{options['query']}"))
+            fields = PostSerializer.requested_fields(request)
+            listing = Post.objects.for_listing(fields=fields)
+            posts = list(listing.order_by("-likes_count", "id")[: options["page"]])
+            results, bodies = {}, {}
+            for name, fast in VARIANTS.items():
+                with override_settings(FAST_SERIALIZERS=fast):
+                    results[name], bodies[name] = self.run(
+                        posts, request, options["rounds"]
+                    )
+
+        if len(set(bodies.values())) != 1:
+            raise CommandError("The fast path rendered different bytes.")
+        results["speedup"] = round(
+            results["fast"]["posts_per_second"] / results["drf"]["posts_per_second"],
+            2,
+        )
+        results["bytes_per_page"] = len(bodies["fast"])
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, posts, request, rounds):
+        renderer = fast_serializers.FastJSONRenderer()
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            body = renderer.render(fast_serializers.posts(posts, request))
+            samples.append(time.perf_counter() - start)
+        return {
+            **summarize(samples),
+            "posts_per_second": round(len(posts) * rounds / sum(samples)),
+        }, body
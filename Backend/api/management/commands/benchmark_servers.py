@@ -0,0 +1,124 @@
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from api.benchmark import scratch_database, summarize
+from api.counters import repair_post_counters
+from api.models import User, Post, Comment
+
+ENDPOINTS = {
+    "home": ("/api/home/", "/api/async/home/"),
+    "profile": ("/api/profile/user0/", "/api/async/profile/user0/"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the read endpoints served by the sync views "
+        "through the WSGI and ASGI handlers and by the async views through ASGI."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=5000)
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--requests", type=int, default=400)
+        parser.add_argument("--endpoint", choices=ENDPOINTS, default="home")
+
+    def handle(self, *args, **options):
+        sync_url, async_url = ENDPOINTS[options["endpoint"]]
+        # Bypass the response cache so every request reaches the database.
+        with scratch_database(on_disk=True), override_settings(
+            RESPONSE_CACHE_TIMEOUT=0
+        ):
+            self.seed(options["users"], options["posts"])
+            token = str(AccessToken.for_user(User.objects.get(username="user1")))
+            headers = {"Authorization": f"Bearer {token}"}
+            cache.clear()
+            Client().get(sync_url, headers=headers)  # warm the leaderboards
+            concurrency, requests = options["concurrency"], options["requests"]
+            results = {
+                "wsgi_sync_views": self.wsgi(sync_url, headers, concurrency, requests),
+                "asgi_sync_views": asyncio.run(
+                    self.asgi(sync_url, headers, concurrency, requests)
+                ),
+                "asgi_async_views": asyncio.run(
+                    self.asgi(async_url, headers, concurrency, requests)
+                ),
+            }
+        results["endpoint"] = options["endpoint"]
+        results["concurrency"] = options["concurrency"]
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def seed(self, user_count, post_count):
+        rng = random.Random(0)
+        users = User.objects.bulk_create(
+            [User(username=f"user{i}") for i in range(user_count)]
+        )
+        posts = Post.objects.bulk_create(
+            [
+                Post(tweet=f"post {i}", poster=rng.choice(users))
+                for i in range(post_count)
+            ],
+            batch_size=5000,
+        )
+        likes = {(rng.choice(posts).id, rng.choice(users).id) for _ in posts * 3}
+        Post.likers.through.objects.bulk_create(
+            [Post.likers.through(post_id=p, user_id=u) for p, u in likes],
+            batch_size=5000,
+        )
+        Comment.objects.bulk_create(
+            [
+                Comment(main_post=rng.choice(posts), commenter=rng.choice(users))
+                for _ in posts
+            ],
+            batch_size=5000,
+        )
+        repair_post_counters()
+
+    def report(self, samples, errors, elapsed):
+        return {
+            **summarize(samples),
+            "errors": errors,
+            "requests_per_second": round(len(samples) / elapsed, 1),
+        }
+
+    def wsgi(self, url, headers, concurrency, requests):
+        def fetch(_):
+            client = Client()
+            start = time.perf_counter()
+            try:
+                return client.get(url, headers=headers).status_code, (
+                    time.perf_counter() - start
+                )
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            outcomes = list(pool.map(fetch, range(requests)))
+        elapsed = time.perf_counter() - start
+        errors = sum(code != 200 for code, _ in outcomes)
+        return self.report([seconds for _, seconds in outcomes], errors, elapsed)
+
+    async def asgi(self, url, headers, concurrency, requests):
+        client = AsyncClient()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def fetch():
+            async with slots:
+                start = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                return response.status_code, time.perf_counter() - start
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(fetch() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+        errors = sum(code != 200 for code, _ in outcomes)
+        return self.report([seconds for _, seconds in outcomes], errors, elapsed)
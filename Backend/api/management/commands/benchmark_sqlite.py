@@ -0,0 +1,103 @@
+import json
+import multiprocessing
+import random
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+from api.benchmark import scratch_database, summarize
+from api.models import User, Post
+
+PROFILES = {
+    "default": {},
+    "production": settings.SQLITE_PRODUCTION_OPTIONS,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a mixed read/write load from several processes against an on-disk "
+        "scratch database with the default and the production SQLite settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=8)
+        parser.add_argument("--operations", type=int, default=200, help="Per process.")
+        parser.add_argument("--write-ratio", type=float, default=0.3)
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile, db_options in PROFILES.items():
+            connection.settings_dict["OPTIONS"] = db_options
+            # Bypass the response cache so every read reaches the database.
+            with scratch_database(on_disk=True), override_settings(
+                RESPONSE_CACHE_TIMEOUT=0
+            ):
+                self.seed(options["processes"])
+                results[profile] = self.run(**options)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def seed(self, processes):
+        users = User.objects.bulk_create(
+            [User(username=f"user{i}") for i in range(processes)]
+        )
+        Post.objects.bulk_create(
+            [Post(tweet=f"post {i}", poster=users[i % processes]) for i in range(50)]
+        )
+        # Forked workers must open their own connections.
+        connection.close()
+
+    def run(self, processes, operations, write_ratio, **options):
+        jobs = [(index, operations, write_ratio) for index in range(processes)]
+        start = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(processes) as pool:
+            outcomes = pool.map(worker, jobs)
+        elapsed = time.perf_counter() - start
+
+        reads = [s for outcome in outcomes for s in outcome["reads"]]
+        writes = [s for outcome in outcomes for s in outcome["writes"]]
+        errors = [e for outcome in outcomes for e in outcome["errors"]]
+        return {
+            "operations": len(reads) + len(writes) + len(errors),
+            "operations_per_second": round((len(reads) + len(writes)) / elapsed, 1),
+            "locked_errors": sum("locked" in error for error in errors),
+            "other_errors": sum("locked" not in error for error in errors),
+            "reads": summarize(reads) if reads else None,
+            "writes": summarize(writes) if writes else None,
+        }
+
+
+def worker(job):
+    index, operations, write_ratio = job
+    rng = random.Random(index)
+    user = User.objects.get(username=f"user{index}")
+    post_ids = list(Post.objects.values_list("id", flat=True))
+    client = APIClient()
+    client.force_authenticate(user)
+    outcome = {"reads": [], "writes": [], "errors": []}
+    try:
+        for _ in range(operations):
+            post_id = rng.choice(post_ids)
+            write = rng.random() < write_ratio
+            start = time.perf_counter()
+            try:
+                if not write:
+                    response = client.get(f"/api/tweet/{post_id}/")
+                elif rng.random() < 0.5:
+                    response = client.post(f"/api/tweet/like-unlike/{post_id}/")
+                else:
+                    response = client.post(
+                        f"/api/tweet/comment/{post_id}/", {"comment": "hi"}
+                    )
+            except Exception as error:
+                outcome["errors"].append(repr(error))
+                continue
+            if response.status_code >= 400:
+                outcome["errors"].append(f"HTTP {response.status_code}")
+                continue
+            outcome["writes" if write else "reads"].append(time.perf_counter() - start)
+    finally:
+        connection.close()
+    return outcome
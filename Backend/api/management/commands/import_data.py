@@ -0,0 +1,45 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api import leaderboards
+from api.archive import Importer, InvalidRecord
+from api.response_cache import ALL, invalidate
+
+
+class Command(BaseCommand):
+    help = (
+        "Import NDJSON dumps of users, posts, follows, likes and comments, such "
+        "as the archives served by /api/profile/<username>/export/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="NDJSON files, or - for stdin.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        importer = Importer(options["chunk_size"])
+        try:
+            # All or nothing: a bad line rolls back everything before it.
+            with transaction.atomic():
+                for path in options["paths"]:
+                    if path == "-":
+                        importer.add_lines(sys.stdin)
+                    else:
+                        with open(path, encoding="utf-8") as file:
+                            importer.add_lines(file)
+                importer.finish()
+        except InvalidRecord as error:
+            raise CommandError(f"{path}: {error}")
+        leaderboards.clear()
+        invalidate(ALL)
+
+        counts = importer.counts
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {counts['users']} users ({counts['existing_users']} "
+                f"already existed), {counts['posts']} posts, {counts['follows']} "
+                f"follows, {counts['likes']} likes and {counts['comments']} "
+                f"comments; skipped {counts['skipped']} records with unknown "
+                "references."
+            )
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api import search
+from api.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Reindex every post for full-text search, restoring the index triggers "
+        "if a table rebuild dropped them."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(f"Indexed {Post.objects.count()} posts.")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.response_cache import ALL, invalidate
+from api.counters import (
+    drifted_posts,
+    drifted_users,
+    repair_post_counters,
+    repair_user_counters,
+)
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized like/comment/follow counters and fix drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many rows have drifted.",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            posts = drifted_posts().count()
+            users = drifted_users().count()
+            self.stdout.write(f"{posts} posts and {users} users have drifted.")
+            return
+
+        with transaction.atomic():
+            posts = repair_post_counters()
+            users = repair_user_counters()
+        invalidate(ALL)
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired {posts} posts and {users} users.")
+        )
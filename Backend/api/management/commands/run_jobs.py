@@ -0,0 +1,49 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Work the background job queue: claim due jobs in batches of one kind, "
+        "run them and retry failures. Run as many workers as needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no job is due instead of polling for more.",
+        )
+        parser.add_argument(
+            "--kind",
+            action="append",
+            help="Only run jobs of this kind; repeat for several.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.JOB_BATCH_SIZE,
+            help="Most jobs claimed at once.",
+        )
+
+    def handle(self, *args, **options):
+        total, pruned_at = 0, 0.0
+        try:
+            while True:
+                close_old_connections()
+                processed = jobs.work(options["kind"], options["batch_size"])
+                total += processed
+                if processed:
+                    continue
+                if options["once"]:
+                    break
+                if time.monotonic() - pruned_at > 3600:
+                    jobs.prune()
+                    pruned_at = time.monotonic()
+                time.sleep(settings.JOB_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Ran {total} jobs.")
@@ -0,0 +1,49 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api.models import User
+from api.seeding import seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed users, posts, a power-law follow graph and power-law likes and "
+        "comments for load testing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--posts", type=int, default=100000)
+        parser.add_argument("--follows", type=int, default=20, help="Mean per user.")
+        parser.add_argument("--likes", type=int, default=5, help="Mean per post.")
+        parser.add_argument("--comments", type=int, default=1, help="Mean per post.")
+        parser.add_argument(
+            "--alpha", type=float, default=1.1, help="Power-law exponent."
+        )
+        parser.add_argument("--days", type=int, default=30, help="Span of post dates.")
+        parser.add_argument("--prefix", default="seed", help="Username prefix.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=options["prefix"]).exists():
+            raise CommandError(
+                f"Users named {options['prefix']}* already exist; pick another --prefix."
+            )
+        start = time.perf_counter()
+        seed(
+            options["users"],
+            options["posts"],
+            follows=options["follows"],
+            likes=options["likes"],
+            comments=options["comments"],
+            alpha=options["alpha"],
+            days=options["days"],
+            prefix=options["prefix"],
+            rng=random.Random(options["seed"]),
+            log=lambda message: self.stdout.write(
+                f"{time.perf_counter() - start:7.1f}s  {message}"
+            ),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Seeded in {time.perf_counter() - start:.1f}s.")
+        )
@@ -0,0 +1,424 @@
+"""
+Per-request timings and their aggregates.
+
+`measure_requests` times each request and notes where the time went: DB
+time and query count (from an execute wrapper on every connection, see
+api.signals), serializer time and rendering time. They are sent back in a
+`Server-Timing` header and aggregated per URL name. Each process writes its
+aggregates to METRICS_DIR, and `/metrics` sums every process's file into
+the Prometheus text format. Files of processes that have exited are folded
+into one totals file as they are found, so the directory holds one file per
+live process.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.renderers import JSONRenderer
+
+
+slow_query_logger = logging.getLogger("api.slow_queries")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+PHASES = ("db", "serialize", "render")
+
+
+class Timings:
+    """What one request spent, shared with the threads it runs queries on."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        self.slow_queries = 0
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.seconds[phase] += seconds
+
+    def add_query(self, seconds, slow):
+        with self._lock:
+            self.seconds["db"] += seconds
+            self.queries += 1
+            self.slow_queries += slow
+
+    def header(self, total):
+        parts = [
+            f'db;dur={self.seconds["db"] * 1000:.1f};desc="{self.queries} queries"',
+            *(
+                f"{phase};dur={self.seconds[phase] * 1000:.1f}"
+                for phase in ("serialize", "render")
+            ),
+            f"total;dur={total * 1000:.1f}",
+        ]
+        return ", ".join(parts)
+
+
+current = ContextVar("timings", default=None)
+# Phases already being timed further up the stack, so nested serializers
+# are not counted twice.
+_active = ContextVar("active_phases", default=frozenset())
+
+
+@contextmanager
+def measure(phase):
+    timings = current.get()
+    if timings is None or phase in _active.get():
+        yield
+        return
+    token = _active.set(_active.get() | {phase})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+        _active.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper timing every query, installed on each new connection."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        threshold = settings.SLOW_QUERY_THRESHOLD
+        slow = threshold is not None and elapsed >= threshold
+        timings = current.get()
+        if timings is not None:
+            timings.add_query(elapsed, slow)
+        if slow:
+            log_slow_query(sql, params, elapsed)
+
+
+def _project_stack():
+    # Only our own frames: the ORM and Django internals are the same for all.
+    root = str(settings.BASE_DIR)
+    frames = [
+        frame
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(root)
+        and "site-packages" not in frame.filename
+        and frame.filename != __file__
+    ]
+    return "".join(traceback.format_list(frames))
+
+
+def log_slow_query(sql, params, seconds):
+    slow_query_logger.warning(
+        "Slow query (%.1f ms): %s\nParams: %r\n%s",
+        seconds * 1000,
+        sql,
+        params,
+        _project_stack(),
+    )
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with measure("render"):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """This process's aggregates, written to METRICS_DIR now and then."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = defaultdict(int)  # (view, method, status) -> count
+        self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.phases = defaultdict(float)  # (view, phase) -> seconds
+        self.slow_queries = defaultdict(int)  # view -> count
+        self._written = 0.0
+        self.path = None
+
+    def observe(self, view, method, status, total, timings):
+        with self._lock:
+            self.requests[view, method, str(status)] += 1
+            self.durations[view].observe(total)
+            self.queries[view].observe(timings.queries)
+            for phase, seconds in timings.seconds.items():
+                self.phases[view, phase] += seconds
+            if timings.slow_queries:
+                self.slow_queries[view] += timings.slow_queries
+        due = time.monotonic() - self._written >= settings.METRICS_WRITE_INTERVAL
+        # Skip rather than wait if another thread is writing already.
+        if due and self._write_lock.acquire(blocking=False):
+            try:
+                self._write()
+            finally:
+                self._write_lock.release()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": [[*key, count] for key, count in self.requests.items()],
+                "durations": {
+                    view: [h.counts, h.sum] for view, h in self.durations.items()
+                },
+                "queries": {
+                    view: [h.counts, h.sum] for view, h in self.queries.items()
+                },
+                "phases": [[*key, seconds] for key, seconds in self.phases.items()],
+                "slow_queries": dict(self.slow_queries),
+            }
+
+    def write(self):
+        """Atomically replace this process's file in METRICS_DIR."""
+        with self._write_lock:
+            self._write()
+
+    def _write(self):
+        directory = Path(settings.METRICS_DIR)
+        if self.path is None or self.path.parent != directory:
+            directory.mkdir(parents=True, exist_ok=True)
+            # Start time keeps a recycled pid from overwriting a dead
+            # process's totals.
+            self.path = directory / f"{os.getpid()}-{time.time_ns()}.json"
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, self.path)
+        self._written = time.monotonic()
+
+
+registry = Registry()
+# A forked worker starts from zero instead of counting its parent's requests.
+os.register_at_fork(after_in_child=registry.reset)
+
+
+TOTALS = "totals.json"
+_PROCESS_FILE = re.compile(r"(\d+)-\d+\.json")
+
+
+def _empty():
+    return {
+        "requests": defaultdict(int),
+        "durations": {},
+        "queries": {},
+        "phases": defaultdict(float),
+        "slow_queries": defaultdict(int),
+    }
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None  # replaced or removed while reading
+
+
+def _add(total, snapshot):
+    for *key, count in snapshot["requests"]:
+        total["requests"][tuple(key)] += count
+    for name in ("durations", "queries"):
+        for view, (counts, value_sum) in snapshot[name].items():
+            merged = total[name].setdefault(view, [[0] * len(counts), 0.0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += value_sum
+    for view, phase, seconds in snapshot["phases"]:
+        total["phases"][view, phase] += seconds
+    for view, count in snapshot["slow_queries"].items():
+        total["slow_queries"][view] += count
+
+
+def _as_snapshot(total):
+    return {
+        "requests": [[*key, count] for key, count in total["requests"].items()],
+        "durations": total["durations"],
+        "queries": total["queries"],
+        "phases": [[*key, seconds] for key, seconds in total["phases"].items()],
+        "slow_queries": dict(total["slow_queries"]),
+    }
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # someone else's process
+    return True
+
+
+@contextmanager
+def _locked(directory, operation):
+    # Folding rewrites the totals and removes files, so readers wait for it.
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / ".lock", "a") as lock:
+        fcntl.flock(lock, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _fold_exited(directory):
+    """Add the files of processes that have exited to TOTALS, then drop them."""
+    exited = [
+        path
+        for path in directory.glob("*.json")
+        if (match := _PROCESS_FILE.fullmatch(path.name)) and not _alive(int(match[1]))
+    ]
+    if not exited:
+        return
+    with _locked(directory, fcntl.LOCK_EX):
+        # Another scrape may have folded some of them while we waited.
+        exited = [path for path in exited if path.exists()]
+        if not exited:
+            return
+        total = _empty()
+        for path in [directory / TOTALS, *exited]:
+            snapshot = _read(path)
+            if snapshot is not None:
+                _add(total, snapshot)
+        temporary = directory / f"{TOTALS}.{os.getpid()}.tmp"
+        temporary.write_text(json.dumps(_as_snapshot(total)))
+        os.replace(temporary, directory / TOTALS)
+        for path in exited:
+            path.unlink(missing_ok=True)
+
+
+def collect():
+    """Every process's aggregates in METRICS_DIR, summed."""
+    registry.write()
+    directory = Path(settings.METRICS_DIR)
+    _fold_exited(directory)
+    total = _empty()
+    with _locked(directory, fcntl.LOCK_SH):
+        for path in directory.glob("*.json"):
+            snapshot = _read(path)
+            if snapshot is not None:
+                _add(total, snapshot)
+    return total
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _histogram(lines, name, help_text, bounds, histograms):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for view, (counts, value_sum) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip([*bounds, "+Inf"], counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(view=view, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(view=view)} {value_sum}")
+        lines.append(f"{name}_count{_labels(view=view)} {cumulative}")
+
+
+def prometheus_text():
+    total = collect()
+    lines = [
+        "# HELP network_http_requests_total Requests by view, method and status.",
+        "# TYPE network_http_requests_total counter",
+    ]
+    for (view, method, status), count in sorted(total["requests"].items()):
+        labels = _labels(view=view, method=method, status=status)
+        lines.append(f"network_http_requests_total{labels} {count}")
+    _histogram(
+        lines,
+        "network_http_request_duration_seconds",
+        "Time to the response headers, by view.",
+        DURATION_BUCKETS,
+        total["durations"],
+    )
+    _histogram(
+        lines,
+        "network_http_request_queries",
+        "Database queries per request, by view.",
+        QUERY_BUCKETS,
+        total["queries"],
+    )
+    lines += [
+        "# HELP network_http_request_phase_seconds_total Time spent in the "
+        "database, serializers (including the queries they run) and renderers.",
+        "# TYPE network_http_request_phase_seconds_total counter",
+    ]
+    for (view, phase), seconds in sorted(total["phases"].items()):
+        labels = _labels(view=view, phase=phase)
+        lines.append(f"network_http_request_phase_seconds_total{labels} {seconds}")
+    lines += [
+        "# HELP network_slow_queries_total Queries over SLOW_QUERY_THRESHOLD.",
+        "# TYPE network_slow_queries_total counter",
+    ]
+    for view, count in sorted(total["slow_queries"].items()):
+        lines.append(f"network_slow_queries_total{_labels(view=view)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return (match and match.url_name) or "unmatched"
+
+
+def _finish(request, response, timings, start):
+    total = time.perf_counter() - start
+    registry.observe(
+        _view_name(request), request.method, response.status_code, total, timings
+    )
+    response["Server-Timing"] = timings.header(total)
+    return response
+
+
+@sync_and_async_middleware
+def measure_requests(get_response):
+    """Middleware timing each request, outermost so it sees all of it."""
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            timings, start = Timings(), time.perf_counter()
+            token = current.set(timings)
+            try:
+                response = await get_response(request)
+            finally:
+                current.reset(token)
+            return _finish(request, response, timings, start)
+
+        return markcoroutinefunction(middleware)
+
+    def middleware(request):
+        timings, start = Timings(), time.perf_counter()
+        token = current.set(timings)
+        try:
+            response = get_response(request)
+        finally:
+            current.reset(token)
+        return _finish(request, response, timings, start)
+
+    return middleware
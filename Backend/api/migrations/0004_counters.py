@@ -0,0 +1,63 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:53
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count_of(queryset, field):
+    counted = (
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model("api", "Post")
+    Comment = apps.get_model("api", "Comment")
+    User = apps.get_model("api", "User")
+    follows = User.following.through.objects.all()
+
+    Post.objects.update(
+        likes_count=_count_of(Post.likers.through.objects.all(), "post_id"),
+        comments_count=_count_of(Comment.objects.all(), "main_post_id"),
+    )
+    User.objects.update(
+        followers_count=_count_of(follows, "to_user_id"),
+        following_count=_count_of(follows, "from_user_id"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_rename_content_post_tweet"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="comments_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_counters"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["date_posted", "id"], name="post_date_posted_id_idx"
+            ),
+        ),
+    ]
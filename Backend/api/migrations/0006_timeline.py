@@ -0,0 +1,78 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_post_date_posted_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="fanned_out",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date_posted", models.DateTimeField()),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to="api.post",
+                    ),
+                ),
+                (
+                    "poster",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-date_posted"],
+                "indexes": [
+                    models.Index(
+                        fields=["owner", "date_posted", "post"],
+                        name="timeline_owner_date_idx",
+                    ),
+                    models.Index(
+                        fields=["owner", "poster"], name="timeline_owner_poster_idx"
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("owner", "post"), name="timeline_owner_post_unique"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_timeline"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["main_post", "commented", "id"],
+                name="comment_post_commented_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_comment_post_commented_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["commenter", "commented", "id"],
+                name="comment_commenter_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["poster", "date_posted", "id"], name="post_poster_date_idx"
+            ),
+        ),
+    ]
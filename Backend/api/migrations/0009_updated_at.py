@@ -0,0 +1,34 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_profile_section_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["updated_at"], name="post_updated_at_idx"),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_updated_at"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="comment",
+            name="comment_post_commented_idx",
+        ),
+        migrations.AlterField(
+            model_name="post",
+            name="poster",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="posts",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["main_post", "-commented", "-id"],
+                name="comment_post_newest_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["likes_count", "date_posted", "id"], name="post_likes_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["comments_count", "date_posted", "id"], name="post_comments_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("fanned_out", False)),
+                fields=["date_posted", "id"],
+                name="post_pulled_date_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                """CREATE VIRTUAL TABLE api_post_fts USING fts5(
+                    tweet,
+                    content='api_post',
+                    content_rowid='id',
+                    tokenize='porter unicode61'
+                )""",
+                """CREATE TRIGGER api_post_fts_insert AFTER INSERT ON api_post BEGIN
+                    INSERT INTO api_post_fts(rowid, tweet) VALUES (new.id, new.tweet);
+                END""",
+                """CREATE TRIGGER api_post_fts_delete AFTER DELETE ON api_post BEGIN
+                    INSERT INTO api_post_fts(api_post_fts, rowid, tweet)
+                    VALUES ('delete', old.id, old.tweet);
+                END""",
+                """CREATE TRIGGER api_post_fts_update AFTER UPDATE OF tweet ON api_post
+                BEGIN
+                    INSERT INTO api_post_fts(api_post_fts, rowid, tweet)
+                    VALUES ('delete', old.id, old.tweet);
+                    INSERT INTO api_post_fts(rowid, tweet) VALUES (new.id, new.tweet);
+                END""",
+                "INSERT INTO api_post_fts(api_post_fts) VALUES ('rebuild')",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER api_post_fts_update",
+                "DROP TRIGGER api_post_fts_delete",
+                "DROP TRIGGER api_post_fts_insert",
+                "DROP TABLE api_post_fts",
+            ],
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_post_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrendBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tag", models.CharField(max_length=151)),
+                ("bucket", models.DateTimeField()),
+                ("count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("bucket", "tag"), name="trendbucket_bucket_tag_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="PostTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tag", models.CharField(max_length=151)),
+                ("date_posted", models.DateTimeField()),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tags",
+                        to="api.post",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-date_posted"],
+                "indexes": [
+                    models.Index(
+                        fields=["tag", "date_posted", "id"], name="posttag_tag_date_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("post", "tag"), name="posttag_post_tag_unique"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_job"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="post",
+            name="post_pulled_date_idx",
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("fanned_out", False)),
+                fields=["poster", "date_posted", "id"],
+                name="post_pulled_poster_idx",
+            ),
+        ),
+    ]
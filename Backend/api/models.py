@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
 
@@ -30,6 +32,11 @@ class User(AbstractUser):
     following = models.ManyToManyField(
         "self", blank=True, related_name="followers", symmetrical=False
     )
+    # Denormalized counters, kept in step with `following` on write.
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Bumped whenever anything shown on the user's profile changes.
+    updated_at = models.DateTimeField(auto_now=True)
 
     USERNAME_FIELD = "username"
     REQUIRED_FIELDS = []
@@ -40,18 +47,83 @@ class User(AbstractUser):
         return f"{self.id}. {self.username}"
 
 
+class PostQuerySet(models.QuerySet):
+    def for_listing(self, all_comments=False, fields=None):
+        """
+        Load everything `PostSerializer` touches in a fixed number of queries.
+
+        Unless `all_comments` is set, only each post's latest
+        COMMENT_PREVIEW_SIZE comments are loaded, in one windowed query for
+        the whole page. When `fields` is given, relations backing fields
+        outside it are not loaded at all.
+        """
+        queryset = self
+        if fields is None or "poster" in fields:
+            queryset = queryset.select_related("poster")
+        if fields is None or "likers" in fields:
+            queryset = queryset.prefetch_related(
+                models.Prefetch("likers", queryset=User.objects.only("id", "username"))
+            )
+        if fields is None or "comments" in fields:
+            comments = Comment.objects.select_related("commenter").order_by(
+                "-commented", "-id"
+            )
+            if not all_comments:
+                comments = comments[: settings.COMMENT_PREVIEW_SIZE]
+            queryset = queryset.prefetch_related(
+                models.Prefetch(
+                    "comments", queryset=comments, to_attr="loaded_comments"
+                )
+            )
+        return queryset
+
+
 class Post(models.Model):
     tweet = models.CharField(max_length=255)
-    poster = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
+    # Indexed through post_poster_date_idx, which leads with the poster.
+    poster = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="posts", db_index=False
+    )
     likers = models.ManyToManyField(User, blank=True, related_name="likes")
     date_posted = models.DateTimeField(auto_now_add=True)
     edited = models.BooleanField(default=False)
+    # Denormalized counters, kept in step with `likers`/`comments` on write.
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    # Whether the post was pushed into its followers' timelines on write.
+    fanned_out = models.BooleanField(default=False)
+    # Bumped on edits and whenever the post's likes or comments change.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return f"Post#{self.id} - {self.poster.username}: {self.tweet}"
 
     class Meta:
         ordering = ["-date_posted"]
+        indexes = [
+            models.Index(fields=["date_posted", "id"], name="post_date_posted_id_idx"),
+            models.Index(
+                fields=["poster", "date_posted", "id"], name="post_poster_date_idx"
+            ),
+            models.Index(fields=["updated_at"], name="post_updated_at_idx"),
+            # Leaderboard rebuilds read the top of these in order.
+            models.Index(
+                fields=["likes_count", "date_posted", "id"], name="post_likes_idx"
+            ),
+            models.Index(
+                fields=["comments_count", "date_posted", "id"],
+                name="post_comments_idx",
+            ),
+            # The few posts left out of fan-out, merged into following feeds
+            # per poster.
+            models.Index(
+                fields=["poster", "date_posted", "id"],
+                condition=models.Q(fanned_out=False),
+                name="post_pulled_poster_idx",
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -72,3 +144,130 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["-commented"]
+        indexes = [
+            # Descending so the newest-first preview per post needs no sort.
+            models.Index(
+                fields=["main_post", "-commented", "-id"],
+                name="comment_post_newest_idx",
+            ),
+            models.Index(
+                fields=["commenter", "commented", "id"],
+                name="comment_commenter_date_idx",
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """A post materialized into one follower's following feed."""
+
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline", db_index=False
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    poster = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+", db_index=False
+    )
+    date_posted = models.DateTimeField()
+
+    def __str__(self):
+        return f"Timeline of {self.owner_id} - Post#{self.post_id}"
+
+    class Meta:
+        ordering = ["-date_posted"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "post"], name="timeline_owner_post_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["owner", "date_posted", "post"], name="timeline_owner_date_idx"
+            ),
+            models.Index(fields=["owner", "poster"], name="timeline_owner_poster_idx"),
+        ]
+
+
+class PostTag(models.Model):
+    """A `#hashtag` or `@mention` found in a post, stored with its sigil."""
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="tags")
+    tag = models.CharField(max_length=151)
+    date_posted = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.tag} - Post#{self.post_id}"
+
+    class Meta:
+        ordering = ["-date_posted"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "tag"], name="posttag_post_tag_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["tag", "date_posted", "id"], name="posttag_tag_date_idx"
+            ),
+        ]
+
+
+class TrendBucket(models.Model):
+    """How often `tag` was used in the TRENDING_BUCKET starting at `bucket`."""
+
+    tag = models.CharField(max_length=151)
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.tag} @ {self.bucket}: {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["bucket", "tag"], name="trendbucket_bucket_tag_unique"
+            ),
+        ]
+
+
+class Job(models.Model):
+    """Deferred work for `manage.py run_jobs`, see api.jobs."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    # Idempotency key: enqueuing the same (kind, key) again returns this job.
+    key = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(max_length=8, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    run_at = models.DateTimeField(default=timezone.now)
+    # The worker holding a running job, until its lease expires.
+    locked_by = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Job#{self.id} {self.kind} ({self.status})"
+
+    class Meta:
+        ordering = ["run_at", "id"]
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "key"], name="job_kind_key_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["status", "run_at", "id"], name="job_due_idx"),
+        ]
@@ -0,0 +1,103 @@
+import base64
+from datetime import datetime
+from functools import partial
+from django.db.models import QuerySet
+from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+
+
+PAGE_SIZE = 10
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(value, pk):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    value = str(value) if value is not None else ""
+    raw = f"{value}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, parse=datetime.fromisoformat):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, pk = base64.urlsafe_b64decode(padded).decode().split("|")
+        return (parse(value) if value else None), int(pk)
+    except (ValueError, UnicodeDecodeError) as error:
+        raise InvalidCursor("Invalid cursor.") from error
+
+
+def after_cursor(queryset, cursor, field="date_posted", tiebreak="id"):
+    """Restrict a newest-first queryset to the rows that come after `cursor`."""
+    value, pk = decode_cursor(cursor)
+    if field is None:
+        return queryset.filter(**{f"{tiebreak}__lt": pk})
+    if value is None:
+        raise InvalidCursor("Invalid cursor.")
+    return queryset.filter(**{f"{field}__lte": value}).exclude(
+        **{field: value, f"{tiebreak}__gte": pk}
+    )
+
+
+def cursor_paginate(queryset, cursor=None, page_size=PAGE_SIZE, field="date_posted"):
+    """
+    Return one keyset page of `queryset`, newest first, and the cursor of the
+    next page (None on the last page). Every page is a range scan on
+    `(field, id)`, or on `id` alone when `field` is None, so deep pages cost
+    the same as the first one.
+    """
+    if field is None:
+        queryset = queryset.order_by("-id")
+    else:
+        queryset = queryset.order_by(f"-{field}", "-id")
+    if cursor:
+        queryset = after_cursor(queryset, cursor, field)
+
+    items = list(queryset[: page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        value = getattr(last, field) if field is not None else None
+        next_cursor = encode_cursor(value, last.id)
+    return items, next_cursor
+
+
+def paginate_posts(request, queryset, page_size=PAGE_SIZE):
+    """
+    Paginate a post feed in one of two modes and return `(posts, meta)`.
+
+    `?cursor=` (empty for the first page) switches to keyset pagination and
+    skips the `COUNT(*)` unless `?count=true` is also given. Otherwise the
+    legacy `?page=` mode with `total_tweets`/`total_pages` is used.
+    """
+    params = request.query_params
+    if "cursor" in params:
+        # Feeds that are not a plain queryset bring their own keyset paging.
+        paginate = getattr(queryset, "cursor_page", None)
+        if paginate is None:
+            paginate = partial(cursor_paginate, queryset)
+        posts, next_cursor = paginate(params["cursor"], page_size)
+        meta = {"next_cursor": next_cursor}
+        if params.get("count", "").lower() in ("1", "true"):
+            meta["total_tweets"] = queryset.count()
+        return posts, meta
+
+    if isinstance(queryset, QuerySet):
+        queryset = queryset.order_by("-date_posted", "-id")
+    paginator = Paginator(queryset, page_size)
+    try:
+        page = paginator.page(params.get("page", 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+
+    meta = {
+        "total_tweets": paginator.count,
+        "total_pages": paginator.num_pages,
+        "current_page": page.number,
+    }
+    return page, meta
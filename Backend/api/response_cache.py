@@ -0,0 +1,158 @@
+import copy
+import hashlib
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+from . import like_buffer
+from .models import Post
+
+
+ALL = "response:gen:all"
+HOME = "response:gen:home"
+
+
+def post_generation(post_id):
+    return f"response:gen:post:{post_id}"
+
+
+def user_generation(user_id):
+    return f"response:gen:user:{user_id}"
+
+
+def profile_generation(user_id):
+    # Bumped by anything shown on the user's profile; see api.signals.
+    return f"response:gen:profile:{user_id}"
+
+
+def profile_generations(user_ids=(), post_ids=()):
+    """The profile generations of `user_ids` and of the posters of `post_ids`."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if post_ids:
+        user_ids.update(
+            Post.objects.filter(id__in=post_ids).values_list("poster_id", flat=True)
+        )
+    return [profile_generation(user_id) for user_id in user_ids]
+
+
+def invalidate(*keys):
+    """Bump generation counters, orphaning every response cached under them."""
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def current(keys):
+    """The values of the generation counters `keys`, seeding missing ones."""
+    found = cache.get_many(keys)
+    for key in keys:
+        # Seed missing counters with the clock so an evicted counter can
+        # never come back at a value that old entries were stored under.
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def _count(scope, outcome):
+    key = f"response:stats:{scope}:{outcome}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def stats():
+    stats = {}
+    for scope in ("home", "tweet"):
+        hits = cache.get(f"response:stats:{scope}:hit", 0)
+        misses = cache.get(f"response:stats:{scope}:miss", 0)
+        stats[scope] = {"hits": hits, "misses": misses}
+    return stats
+
+
+def _set_liked(posts, liked_ids):
+    for post in posts:
+        if "is_liked" in post:
+            post["is_liked"] = post["id"] in liked_ids
+
+
+def _overlayable(posts):
+    return all("id" in post for post in posts if "is_liked" in post)
+
+
+def cached_response(scope, generations, posts):
+    """
+    Cache the viewer-independent body of an `APIView` GET handler.
+
+    `generations(request, *args, **kwargs)` names the generation counters the
+    body depends on, and `posts(data)` lists the serialized posts in it. Bodies
+    are stored with `is_liked` cleared and the viewer's likes are overlaid on
+    every hit with a single lookup. A body whose posts carry `is_liked` but
+    not their `id` (e.g. `?fields=is_liked`) cannot be overlaid, so it is not
+    cached.
+    """
+
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            keys = [ALL, *generations(request, *args, **kwargs)]
+            fingerprint = repr([request.get_full_path(), *current(keys)])
+            key = "response:" + hashlib.sha1(fingerprint.encode()).hexdigest()
+
+            data = cache.get(key)
+            if data is None:
+                _count(scope, "miss")
+                response = handler(self, request, *args, **kwargs)
+                if response.status_code == 200 and _overlayable(posts(response.data)):
+                    shared = copy.deepcopy(response.data)
+                    _set_liked(posts(shared), ())
+                    cache.set(key, shared, settings.RESPONSE_CACHE_TIMEOUT)
+                return response
+
+            _count(scope, "hit")
+            if request.user.is_authenticated:
+                page = [post for post in posts(data) if "is_liked" in post]
+                liked_ids = set(
+                    Post.likers.through.objects.filter(
+                        user_id=request.user.id,
+                        post_id__in=[post["id"] for post in page],
+                    ).values_list("post_id", flat=True)
+                )
+                _set_liked(page, liked_ids)
+            if like_buffer.enabled():
+                for post in posts(data):
+                    if "is_liked" in post:
+                        state = like_buffer.buffer.state(request.user.id, post["id"])
+                        if state is not None:
+                            post["is_liked"] = state
+            return Response(data)
+
+        return wrapper
+
+    return decorator
+
+
+def home_generations(request):
+    return [HOME]
+
+
+def home_posts(data):
+    return [
+        *data["recent_tweets"],
+        *data["most_liked_tweets"],
+        *data["most_commented_tweets"],
+    ]
+
+
+def tweet_generations(request, post_id):
+    poster_id = Post.objects.filter(id=post_id).values_list("poster_id", flat=True)
+    return [post_generation(post_id), *map(user_generation, poster_id)]
+
+
+def tweet_posts(data):
+    return [data]
@@ -0,0 +1,85 @@
+import re
+from django.db import connections, router
+from .models import Post
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+
+TABLE = "api_post_fts"
+
+# External-content FTS5 index over Post.tweet, kept in step by triggers so
+# every write path (serializers, update(), bulk_create, deletes) is covered.
+SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        tweet, content='api_post', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_insert AFTER INSERT ON api_post BEGIN
+        INSERT INTO {TABLE}(rowid, tweet) VALUES (new.id, new.tweet);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_delete AFTER DELETE ON api_post BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, tweet) VALUES ('delete', old.id, old.tweet);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_update AFTER UPDATE OF tweet ON api_post
+    BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, tweet) VALUES ('delete', old.id, old.tweet);
+        INSERT INTO {TABLE}(rowid, tweet) VALUES (new.id, new.tweet);
+    END""",
+]
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def match_expression(text):
+    """Every word of `text` must match; the last one may be a prefix."""
+    words = re.findall(r"\w+", text)
+    if not words:
+        raise InvalidQuery("Search query must contain at least one word.")
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def rebuild():
+    """(Re)create the index and its triggers, then reindex every post."""
+    connection = connections[router.db_for_write(Post)]
+    with connection.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')")
+
+
+class PostSearch:
+    """
+    Posts matching `text`, best bm25 rank first. Cursors carry the rank and
+    id of the last result, so every page is a single query on the index.
+    """
+
+    def __init__(self, queryset, text):
+        self.queryset = queryset
+        self.match = match_expression(text)
+
+    def _ranked(self, limit, cursor=None):
+        sql = f"SELECT rowid, rank FROM {TABLE} WHERE {TABLE} MATCH %s"
+        params = [self.match]
+        if cursor:
+            rank, pk = decode_cursor(cursor, parse=float)
+            if rank is None:
+                raise InvalidCursor("Invalid cursor.")
+            sql += " AND (rank > %s OR (rank = %s AND rowid > %s))"
+            params += [rank, rank, pk]
+        sql += " ORDER BY rank, rowid LIMIT %s"
+        params.append(limit)
+        connection = connections[router.db_for_read(Post)]
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            return db_cursor.fetchall()
+
+    def cursor_page(self, cursor, page_size):
+        rows = self._ranked(page_size + 1, cursor)
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            pk, rank = rows[-1]
+            next_cursor = encode_cursor(rank, pk)
+        posts = self.queryset.order_by().in_bulk([pk for pk, _ in rows])
+        return [posts[pk] for pk, _ in rows if pk in posts], next_cursor
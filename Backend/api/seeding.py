@@ -0,0 +1,224 @@
+"""
+Synthetic data at realistic scale: who follows whom, who posts and which
+posts get likes and comments all follow power laws, so a few accounts and
+posts draw most of the activity as they do on a real network.
+"""
+
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from . import leaderboards
+from .counters import repair_post_counters, repair_user_counters
+from .models import User, Post, Comment, PostTag, TimelineEntry
+from .response_cache import ALL, invalidate
+from .tags import HASHTAG
+
+WORDS = (
+    "the a of to and in is it you that was for on are with as be at one have "
+    "this from by hot word but what some we can out other were all there when "
+    "up use your how said an each she which do their time if will way about "
+    "many then them write would like so these her long make thing see him two"
+).split()
+HASHTAGS = [f"#{word}" for word in ("django", "python", "news", "music", "sports")]
+
+BATCH = 5000
+
+
+def power_law_weights(count, alpha):
+    """Cumulative Zipf weights: item `i` is drawn in proportion to 1/(i+1)^alpha."""
+    return list(itertools.accumulate(1 / (rank + 1) ** alpha for rank in range(count)))
+
+
+@contextmanager
+def historical_dates(*fields):
+    """Let bulk_create keep the dates we set on `auto_now(_add)` fields."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field, _, _ in saved:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _field(model, name):
+    return model._meta.get_field(name)
+
+
+def seed(
+    users,
+    posts,
+    follows=20,
+    likes=5,
+    comments=1,
+    alpha=1.1,
+    days=30,
+    prefix="seed",
+    rng=None,
+    log=lambda message: None,
+):
+    """
+    Create `users` users and `posts` posts with on average `follows` follows
+    per user and `likes`/`comments` per post, all via `bulk_create`. Counters,
+    timelines and tags are filled in as the write paths would have.
+    """
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    password = make_password(None)
+
+    with transaction.atomic(), historical_dates(
+        _field(User, "date_joined"),
+        _field(User, "updated_at"),
+        _field(Post, "date_posted"),
+        _field(Post, "updated_at"),
+        _field(Comment, "commented"),
+    ):
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f"{prefix}{i}",
+                    password=password,
+                    date_joined=now - timedelta(days=days),
+                    updated_at=now,
+                )
+                for i in range(users)
+            ),
+            batch_size=BATCH,
+        )
+        # bulk_create only sets primary keys on some backends; reload them.
+        user_ids = list(
+            User.objects.filter(username__startswith=prefix)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        popular = power_law_weights(len(user_ids), alpha)
+        log(f"{len(user_ids)} users")
+
+        follow_rows = set()
+        for follower in user_ids:
+            count = min(len(user_ids) - 1, max(1, int(rng.expovariate(1 / follows))))
+            for followee in rng.choices(user_ids, cum_weights=popular, k=count):
+                if followee != follower:
+                    follow_rows.add((follower, followee))
+        Follow = User.following.through
+        Follow.objects.bulk_create(
+            (Follow(from_user_id=a, to_user_id=b) for a, b in follow_rows),
+            batch_size=BATCH,
+            ignore_conflicts=True,
+        )
+        log(f"{len(follow_rows)} follows")
+
+        # Who posts a lot is independent of who is followed a lot; tying the
+        # two would put nearly every post into the largest timelines.
+        active = user_ids[:]
+        rng.shuffle(active)
+        span = days * 86400
+        new_posts = []
+        for poster in rng.choices(active, cum_weights=popular, k=posts):
+            text = " ".join(rng.choices(WORDS, k=rng.randint(3, 12)))
+            if rng.random() < 0.2:
+                text += " " + rng.choice(HASHTAGS)
+            date = now - timedelta(seconds=rng.uniform(0, span))
+            new_posts.append(
+                Post(
+                    tweet=text,
+                    poster_id=poster,
+                    date_posted=date,
+                    updated_at=date,
+                    fanned_out=True,
+                )
+            )
+        new_posts.sort(key=lambda post: post.date_posted)
+        Post.objects.bulk_create(new_posts, batch_size=BATCH)
+        post_rows = list(
+            Post.objects.filter(poster_id__in=user_ids)
+            .order_by("id")
+            .values_list("id", "date_posted", "tweet")
+        )
+        post_ids = [post_id for post_id, _, _ in post_rows]
+        log(f"{len(post_ids)} posts")
+
+        # The newest posts are not the most liked: shuffle who gets the weights.
+        hot = post_ids[:]
+        rng.shuffle(hot)
+        viral = power_law_weights(len(hot), alpha)
+        like_rows = set(
+            zip(
+                rng.choices(hot, cum_weights=viral, k=posts * likes),
+                rng.choices(user_ids, k=posts * likes),
+            )
+        )
+        Like = Post.likers.through
+        Like.objects.bulk_create(
+            (Like(post_id=post, user_id=user) for post, user in like_rows),
+            batch_size=BATCH,
+            ignore_conflicts=True,
+        )
+        log(f"{len(like_rows)} likes")
+
+        dates = dict((post_id, date) for post_id, date, _ in post_rows)
+        Comment.objects.bulk_create(
+            (
+                Comment(
+                    main_post_id=post,
+                    commenter_id=rng.choice(user_ids),
+                    comment=" ".join(rng.choices(WORDS, k=rng.randint(2, 8))),
+                    commented=dates[post] + (now - dates[post]) * rng.random(),
+                )
+                for post in rng.choices(hot, cum_weights=viral, k=posts * comments)
+            ),
+            batch_size=BATCH,
+        )
+        log(f"{posts * comments} comments")
+
+        PostTag.objects.bulk_create(
+            (
+                PostTag(post_id=post_id, tag=f"#{name.lower()}", date_posted=date)
+                for post_id, date, text in post_rows
+                for name in set(HASHTAG.findall(text))
+            ),
+            batch_size=BATCH,
+            ignore_conflicts=True,
+        )
+
+        repair_post_counters(Post.objects.filter(id__in=post_ids))
+        repair_user_counters(User.objects.filter(id__in=user_ids))
+        fan_out(prefix)
+    # Cached boards and responses predate the seeded rows.
+    leaderboards.clear()
+    invalidate(ALL)
+    log("counters and timelines")
+
+
+def fan_out(prefix):
+    """
+    Materialize the timelines of the seeded posts in one INSERT ... SELECT,
+    leaving posts of accounts over the fan-out limit to be merged on read.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    Post.objects.filter(
+        poster__username__startswith=prefix, poster__followers_count__gt=limit
+    ).update(fanned_out=False)
+
+    timeline = TimelineEntry._meta.db_table
+    post = Post._meta.db_table
+    user = User._meta.db_table
+    follow = User.following.through._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {timeline} (owner_id, post_id, poster_id, date_posted)
+            SELECT f.from_user_id, p.id, p.poster_id, p.date_posted
+            FROM {user} u
+            JOIN {post} p ON p.poster_id = u.id
+            JOIN {follow} f ON f.to_user_id = u.id
+            WHERE u.username LIKE %s AND u.followers_count <= %s
+            """,
+            [f"{prefix}%", limit],
+        )
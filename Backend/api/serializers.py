@@ -1,31 +1,139 @@
+from django.db.models.manager import BaseManager
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from . import like_buffer, metrics
+from .authentication import RefreshToken, record_login, schedule_token_prune
 from .models import User, Post, Comment
 
 
-class UserSerializer(serializers.ModelSerializer):
+def _query_list(request, name):
+    if request is None or name not in request.query_params:
+        return None
+    return {item.strip() for item in request.query_params[name].split(",") if item}
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with metrics.measure("serialize"):
+            return super().data
+
+
+class SparseFieldsMixin:
+    """
+    Honor `?fields=` / `?omit=` (comma separated field names) and `?expand=`
+    (names from `Meta.expandable`) on the request in the serializer context.
+    The same options can be given as `fields`/`omit`/`expand` arguments.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        requested = self.requested_fields(request, fields, omit)
+        for name in list(self.fields):
+            if name not in requested:
+                self.fields.pop(name)
+        self.expanded = self.expanded_fields(request, expand)
+
+    @property
+    def data(self):
+        with metrics.measure("serialize"):
+            return super().data
+
+    @classmethod
+    def requested_fields(cls, request, fields=None, omit=None):
+        if fields is None:
+            fields = _query_list(request, "fields")
+        if omit is None:
+            omit = _query_list(request, "omit") or ()
+        return {
+            name
+            for name in cls.Meta.fields
+            if (fields is None or name in fields) and name not in omit
+        }
+
+    @classmethod
+    def expanded_fields(cls, request, expand=None):
+        if expand is None:
+            expand = _query_list(request, "expand") or ()
+        return set(expand) & set(getattr(cls.Meta, "expandable", ()))
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    following = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ["id", "username", "date_joined", "following"]
+        fields = [
+            "id",
+            "username",
+            "date_joined",
+            "following",
+            "followers_count",
+            "following_count",
+        ]
+        list_serializer_class = TimedListSerializer
+        expandable = ["following"]
+
+    def get_following(self, obj):
+        following = obj.following.all()
+        if "following" in self.expanded:
+            return UserSerializer(following, many=True, fields=["id", "username"]).data
+        return [user.id for user in following]
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     commenter = serializers.SerializerMethodField()  # Field for the username
 
     class Meta:
         model = Comment
         fields = ["id", "main_post", "comment", "commenter", "commented"]
+        list_serializer_class = TimedListSerializer
+        expandable = ["commenter"]
 
     def get_commenter(self, obj):
-        return obj.commenter.username if obj.commenter else None
+        if not obj.commenter:
+            return None
+        if "commenter" in self.expanded:
+            return UserSerializer(obj.commenter, omit=["following"]).data
+        return obj.commenter.username
+
+
+def apply_buffered_likes(request, posts, post_ids):
+    """
+    Show likes that are still queued in the write-behind buffer. `post_ids`
+    are the ids of `posts`, which may have been left out of the fields.
+    """
+    viewer = request.user.id if request and request.user.is_authenticated else None
+    for post, post_id in zip(posts, post_ids):
+        if "likes_count" in post:
+            post["likes_count"] += like_buffer.buffer.delta(post_id)
+        if "is_liked" in post and viewer is not None:
+            state = like_buffer.buffer.state(viewer, post_id)
+            if state is not None:
+                post["is_liked"] = state
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostListSerializer(TimedListSerializer):
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, BaseManager) else data)
+
+        # Resolve `is_liked` for the whole page with a single lookup.
+        request = self.context.get("request")
+        wants_liked = "is_liked" in self.child.fields
+        if request and request.user.is_authenticated and posts and wants_liked:
+            liked_ids = Post.likers.through.objects.filter(
+                user_id=request.user.id, post_id__in=[post.id for post in posts]
+            ).values_list("post_id", flat=True)
+            self.context.setdefault("liked_ids", set()).update(liked_ids)
+
+        return super().to_representation(posts)
+
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     poster = serializers.SerializerMethodField()
     likers = serializers.SerializerMethodField()
-    comments = CommentSerializer(many=True, read_only=True)
-    likes_count = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
+    comments = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
 
     class Meta:
@@ -42,23 +150,46 @@ class PostSerializer(serializers.ModelSerializer):
             "likes_count",
             "comments_count",
         ]
+        read_only_fields = ["likes_count", "comments_count"]
+        list_serializer_class = PostListSerializer
+        expandable = ["poster"]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if like_buffer.enabled():
+            request = self.context.get("request")
+            apply_buffered_likes(request, [data], [instance.id])
+        return data
+
+    def update(self, instance, validated_data):
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        # Only the edited columns: the counters may have moved since the read.
+        instance.save(update_fields=[*validated_data, "updated_at"])
+        return instance
 
     def get_poster(self, obj):
+        if "poster" in self.expanded:
+            return UserSerializer(obj.poster, omit=["following"]).data
         return obj.poster.username
 
     def get_likers(self, obj):
         return [user.username for user in obj.likers.all()]
 
-    def get_likes_count(self, obj):
-        return obj.likers.count()
-
-    def get_comments_count(self, obj):
-        return obj.comments.count()
+    def get_comments(self, obj):
+        # `for_listing()` loads either a preview or every comment up front.
+        comments = getattr(obj, "loaded_comments", None)
+        if comments is None:
+            comments = obj.comments.all()
+        return CommentSerializer(comments, many=True).data
 
     def get_is_liked(self, obj):
         request = self.context.get("request")
         if request and request.user.is_authenticated:
-            return request.user in obj.likers.all()
+            liked_ids = self.context.get("liked_ids")
+            if liked_ids is not None:
+                return obj.id in liked_ids
+            return obj.likers.filter(pk=request.user.pk).exists()
         return False
 
 
@@ -84,12 +215,42 @@ class UserRegisterSerializer(serializers.ModelSerializer):
 
 
 class LoginSerializer(TokenObtainPairSerializer):
+    token_class = RefreshToken
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
         token["username"] = user.username
         return token
 
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        record_login(self.user)
+        schedule_token_prune()
+        return data
+
 
 class LogoutSerializer(serializers.Serializer):
     refresh = serializers.CharField()
+
+
+# Largest id SQLite can store; bigger ones overflow instead of not matching.
+MAX_ID = 2**63 - 1
+
+
+class BatchActionSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=["like", "unlike", "follow", "unfollow"])
+    tweet = serializers.IntegerField(required=False, min_value=1, max_value=MAX_ID)
+    username = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        target = "tweet" if attrs["action"] in ("like", "unlike") else "username"
+        if target not in attrs:
+            raise serializers.ValidationError(
+                f"'{attrs['action']}' needs a '{target}'."
+            )
+        return attrs
+
+
+class BatchSerializer(serializers.Serializer):
+    actions = BatchActionSerializer(many=True, allow_empty=False, max_length=100)
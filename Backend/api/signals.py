@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .authentication import blacklist, user_cache_key
+from .metrics import record_query
+from .models import User, Post, Comment
+from .response_cache import (
+    ALL,
+    HOME,
+    invalidate,
+    post_generation,
+    profile_generation,
+    profile_generations,
+    user_generation,
+)
+
+
+def invalidate_on_commit(*keys):
+    # Bump now and again after commit: a read racing the open transaction
+    # could otherwise cache the old rows under the new generation.
+    invalidate(*keys)
+    transaction.on_commit(lambda: invalidate(*keys))
+
+
+@receiver([post_save, post_delete], sender=Post)
+def post_changed(sender, instance, **kwargs):
+    invalidate_on_commit(
+        HOME, post_generation(instance.id), profile_generation(instance.poster_id)
+    )
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    invalidate_on_commit(
+        HOME,
+        post_generation(instance.main_post_id),
+        *profile_generations([instance.commenter_id], [instance.main_post_id]),
+    )
+
+
+@receiver(m2m_changed, sender=Post.likers.through)
+def likers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if pk_set is None:
+        # Cleared: the former likers are unknown.
+        invalidate_on_commit(ALL)
+    elif not reverse:
+        invalidate_on_commit(
+            HOME,
+            post_generation(instance.id),
+            *profile_generations(pk_set, [instance.id]),
+        )
+    else:
+        # Changed from the user's side (`user.likes`): pk_set holds post ids.
+        invalidate_on_commit(
+            HOME,
+            *map(post_generation, pk_set),
+            *profile_generations([instance.id], pk_set),
+        )
+
+
+@receiver(m2m_changed, sender=User.following.through)
+def following_changed(sender, instance, action, pk_set, **kwargs):
+    # Follower counts show up wherever a poster is expanded.
+    if not action.startswith("post_"):
+        return
+    if pk_set is None:
+        invalidate_on_commit(ALL)
+    else:
+        users = [instance.id, *pk_set]
+        invalidate_on_commit(
+            HOME, *map(user_generation, users), *map(profile_generation, users)
+        )
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Drop the copy CachedJWTAuthentication serves, now and after commit.
+    key = user_cache_key(instance.id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+    invalidate_on_commit(profile_generation(instance.id))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, **kwargs):
+    if created:
+        blacklist.add(instance.token.jti)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Fired again whenever the same alias reconnects.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,116 @@
+import datetime
+import re
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import User, PostTag, TrendBucket
+
+HASHTAG = re.compile(r"(?<![\w#])#(\w+)")
+MENTION = re.compile(r"(?<![\w@])@([\w.+-]*\w)")
+
+TRENDING_KEY = "trending"
+
+
+def normalize(name):
+    """URL form of a tag (`python`, `#Python` or `@alice`) as stored."""
+    if name.startswith("@"):
+        return name
+    return f"#{name.removeprefix('#').lower()}"
+
+
+def extract_tags(text):
+    """Hashtags (lowercased) and mentions of existing users in `text`."""
+    tags = {f"#{name.lower()}" for name in HASHTAG.findall(text)}
+    mentioned = set(MENTION.findall(text))
+    if mentioned:
+        usernames = User.objects.filter(username__in=mentioned).values_list(
+            "username", flat=True
+        )
+        tags.update(f"@{username}" for username in usernames)
+    return tags
+
+
+def index_tags(post):
+    """
+    Sync the tag rows of `post` with its text, counting newly used tags
+    towards trending. Called on create and on edit.
+    """
+    wanted = extract_tags(post.tweet)
+    existing = set(post.tags.order_by().values_list("tag", flat=True))
+    added = wanted - existing
+    with transaction.atomic():
+        if existing - wanted:
+            post.tags.filter(tag__in=existing - wanted).delete()
+        PostTag.objects.bulk_create(
+            [
+                PostTag(post=post, tag=tag, date_posted=post.date_posted)
+                for tag in added
+            ],
+            ignore_conflicts=True,
+        )
+        for tag in added:
+            _count(tag, bucket_start(timezone.now()))
+    return wanted
+
+
+def index_new_posts(posts):
+    """
+    Tag rows for bulk-created `posts`, resolving the mentions of all of them
+    in one query. Nothing is counted towards trending.
+    """
+    mentioned = {name for post in posts for name in MENTION.findall(post.tweet)}
+    users = set(
+        User.objects.filter(username__in=mentioned).values_list("username", flat=True)
+        if mentioned
+        else ()
+    )
+    PostTag.objects.bulk_create(
+        [
+            PostTag(post=post, tag=tag, date_posted=post.date_posted)
+            for post in posts
+            for tag in {f"#{name.lower()}" for name in HASHTAG.findall(post.tweet)}
+            | {f"@{name}" for name in MENTION.findall(post.tweet) if name in users}
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def bucket_start(moment):
+    size = settings.TRENDING_BUCKET.total_seconds()
+    start = moment.timestamp() // size * size
+    return datetime.datetime.fromtimestamp(start, datetime.timezone.utc)
+
+
+def _count(tag, bucket):
+    bumped = TrendBucket.objects.filter(tag=tag, bucket=bucket)
+    if bumped.update(count=F("count") + 1):
+        return
+    try:
+        with transaction.atomic():
+            TrendBucket.objects.create(tag=tag, bucket=bucket, count=1)
+    except IntegrityError:
+        # Another writer opened the bucket first.
+        bumped.update(count=F("count") + 1)
+
+
+def trending():
+    """
+    `[{"tag", "count"}]` over the last TRENDING_WINDOW, most used first.
+
+    Reads only the buckets inside the window, never the post history, and
+    is cached for TRENDING_TIMEOUT seconds.
+    """
+    result = cache.get(TRENDING_KEY)
+    if result is None:
+        since = bucket_start(timezone.now() - settings.TRENDING_WINDOW)
+        TrendBucket.objects.filter(bucket__lt=since).delete()
+        result = list(
+            TrendBucket.objects.filter(bucket__gte=since)
+            .values("tag")
+            .annotate(count=Sum("count"))
+            .order_by("-count", "tag")[: settings.TRENDING_SIZE]
+        )
+        cache.set(TRENDING_KEY, result, settings.TRENDING_TIMEOUT)
+    return result
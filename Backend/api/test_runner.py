@@ -0,0 +1,16 @@
+import tempfile
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the tests with METRICS_DIR in a temporary directory."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.metrics_dir = tempfile.TemporaryDirectory()
+        settings.METRICS_DIR = self.metrics_dir.name
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self.metrics_dir.cleanup()
@@ -1,3 +1,1969 @@
-from django.test import TestCase
+import asyncio
+import json
+import socket
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, connections
+from django.test import (
+    AsyncClient,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import AccessToken
+from . import (
+    authentication,
+    db_router,
+    events,
+    fast_serializers,
+    jobs,
+    leaderboards,
+    metrics,
+    like_buffer,
+    response_cache,
+    tags,
+)
+from .counters import drifted_posts, drifted_users, repair_post_counters
+from .models import User, Post, Comment, Job, PostTag, TimelineEntry, TrendBucket
+from .actions import set_follow, set_like
+from .timeline import TimelineFeed, fan_out_post
+from .serializers import CommentSerializer, PostSerializer, UserSerializer
 
-# Create your tests here.
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", "pass")
+        self.bob = User.objects.create_user("bob", "pass")
+        self.post = Post.objects.create(tweet="hello", poster=self.alice)
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def test_like_toggle_updates_counter(self):
+        response = self.client.post(f"/api/tweet/like-unlike/{self.post.id}/")
+        self.assertEqual(response.data["likes_count"], 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+        response = self.client.post(f"/api/tweet/like-unlike/{self.post.id}/")
+        self.assertEqual(response.data["likes_count"], 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_comment_updates_counter(self):
+        self.client.post(
+            f"/api/tweet/comment/{self.post.id}/", {"comment": "hi"}, format="json"
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+        response = self.client.get(f"/api/tweet/{self.post.id}/")
+        self.assertEqual(response.data["comments_count"], 1)
+
+    def test_follow_toggle_updates_counters(self):
+        self.client.post("/api/profile/alice/")
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.followers_count, 1)
+        self.assertEqual(self.bob.following_count, 1)
+
+        response = self.client.get("/api/profile/alice/")
+        self.assertEqual(response.data["user"]["followers_count"], 1)
+
+        self.client.post("/api/profile/alice/")
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.followers_count, 0)
+        self.assertEqual(self.bob.following_count, 0)
+
+    def test_counters_are_read_only(self):
+        self.client.force_authenticate(self.alice)
+        response = self.client.post(
+            "/api/tweet/", {"tweet": "new", "likes_count": 99}, format="json"
+        )
+        self.assertEqual(response.data["likes_count"], 0)
+
+    def test_edit_keeps_counters_that_moved_meanwhile(self):
+        self.client.force_authenticate(self.alice)
+        is_valid = PostSerializer.is_valid
+
+        def like_meanwhile(serializer, *args, **kwargs):
+            set_like(self.bob, self.post, True)
+            return is_valid(serializer, *args, **kwargs)
+
+        with mock.patch.object(PostSerializer, "is_valid", like_meanwhile):
+            response = self.client.put(
+                f"/api/tweet/{self.post.id}/", {"tweet": "edited"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.tweet, self.post.edited), ("edited", True))
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_repair_counters_fixes_drift(self):
+        self.post.likers.add(self.bob)
+        Comment.objects.create(main_post=self.post, commenter=self.bob, comment="x")
+        self.alice.followers.add(self.bob)
+        Post.objects.filter(id=self.post.id).update(likes_count=7)
+
+        call_command("repair_counters", stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.alice.followers_count, 1)
+        self.assertEqual(self.bob.following_count, 1)
+
+
+class QueryCountTests(TestCase):
+    """Each endpoint must cost the same number of queries however big the page."""
+
+    def setUp(self):
+        self.viewer = User.objects.create_user("viewer", "pass")
+        self.author = User.objects.create_user("author", "pass")
+        self.viewer.following.add(self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+        self.seed(1)
+
+    def seed(self, n):
+        fans = [
+            User.objects.create_user(f"fan{User.objects.count()}") for _ in range(n)
+        ]
+        for i in range(n):
+            post = Post.objects.create(tweet=f"post {i}", poster=self.author)
+            post.likers.add(self.viewer, *fans)
+            for fan in fans:
+                Comment.objects.create(main_post=post, commenter=fan, comment="hi")
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant_queries(self, url):
+        small = self.count_queries(url)
+        self.seed(12)
+        self.assertEqual(self.count_queries(url), small)
+
+    def test_home(self):
+        self.assert_constant_queries("/api/home/")
+
+    def test_anonymous_home(self):
+        self.client.force_authenticate(None)
+        self.assert_constant_queries("/api/home/")
+
+    def test_following_feed(self):
+        self.assert_constant_queries("/api/following-feed/")
+
+    def test_profile(self):
+        self.assert_constant_queries("/api/profile/author/")
+
+    def test_tweet_detail(self):
+        post = Post.objects.get()
+        small = self.count_queries(f"/api/tweet/{post.id}/")
+        for fan in [User.objects.create_user(f"extra{i}") for i in range(5)]:
+            post.likers.add(fan)
+            Comment.objects.create(main_post=post, commenter=fan, comment="hi")
+        self.assertEqual(self.count_queries(f"/api/tweet/{post.id}/"), small)
+
+    def test_is_liked_is_per_viewer(self):
+        self.seed(2)
+        response = self.client.get("/api/following-feed/")
+        self.assertTrue(all(tweet["is_liked"] for tweet in response.data["tweets"]))
+
+        self.client.force_authenticate(self.author)
+        response = self.client.get("/api/home/")
+        self.assertFalse(
+            any(tweet["is_liked"] for tweet in response.data["recent_tweets"])
+        )
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user("author")
+        self.reader = User.objects.create_user("reader")
+        self.reader.following.add(self.author)
+        Post.objects.bulk_create(
+            [Post(tweet=f"post {i}", poster=self.author) for i in range(25)]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def walk(self, url, key):
+        seen, cursor = [], ""
+        while cursor is not None:
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("total_tweets", response.data)
+            seen += [tweet["id"] for tweet in response.data[key]]
+            cursor = response.data["next_cursor"]
+        return seen
+
+    def test_home_cursor_walks_every_post_once(self):
+        expected = list(
+            Post.objects.order_by("-date_posted", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(self.walk("/api/home/", "recent_tweets"), expected)
+
+    def test_following_feed_cursor(self):
+        self.assertEqual(len(self.walk("/api/following-feed/", "tweets")), 25)
+
+    def test_cursor_count_is_opt_in(self):
+        response = self.client.get("/api/home/", {"cursor": "", "count": "true"})
+        self.assertEqual(response.data["total_tweets"], 25)
+
+    def test_page_mode_is_unchanged(self):
+        response = self.client.get("/api/home/", {"page": 3})
+        self.assertEqual(response.data["total_pages"], 3)
+        self.assertEqual(response.data["current_page"], 3)
+        self.assertEqual(len(response.data["recent_tweets"]), 5)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/home/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user("author")
+        self.reader = User.objects.create_user("reader")
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        self.client.post("/api/profile/author/")
+        self.author.refresh_from_db()
+
+    def tweet(self, text):
+        return self.author_client.post("/api/tweet/", {"tweet": text}, format="json")
+
+    def feed_ids(self, **params):
+        response = self.client.get("/api/following-feed/", params)
+        return [tweet["id"] for tweet in response.data["tweets"]]
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        post_id = self.tweet("hello").data["id"]
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=self.reader, post_id=post_id).exists()
+        )
+        self.assertEqual(self.feed_ids(), [post_id])
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        self.client.post("/api/profile/author/")
+        post_id = self.tweet("while unfollowed").data["id"]
+        self.assertEqual(self.feed_ids(), [])
+
+        self.client.post("/api/profile/author/")
+        self.assertEqual(self.feed_ids(), [post_id])
+
+        self.client.post("/api/profile/author/")
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.reader).exists())
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_high_follower_accounts_are_merged_on_read(self):
+        fanned = [self.tweet(f"fanned {i}").data["id"] for i in range(6)]
+        with self.settings(TIMELINE_FANOUT_LIMIT=0):
+            pulled = [self.tweet(f"pulled {i}").data["id"] for i in range(6)]
+        legacy = Post.objects.create(tweet="legacy", poster=self.author).id
+
+        expected = [legacy] + pulled[::-1] + fanned[::-1]
+        self.assertEqual(self.feed_ids(page=1) + self.feed_ids(page=2), expected)
+
+        seen, cursor = [], ""
+        while cursor is not None:
+            response = self.client.get("/api/following-feed/", {"cursor": cursor})
+            seen += [tweet["id"] for tweet in response.data["tweets"]]
+            cursor = response.data["next_cursor"]
+        self.assertEqual(seen, expected)
+
+    def test_only_followees_with_pulled_posts_are_scanned(self):
+        fanned = self.tweet("fanned").data["id"]
+        stranger = User.objects.create_user("stranger")
+        Post.objects.bulk_create(
+            Post(tweet=f"stranger {i}", poster=stranger) for i in range(5)
+        )
+        feed = TimelineFeed(Post.objects.all(), self.reader)
+        self.assertEqual(len(feed._sources()), 1)
+        self.assertEqual(self.feed_ids(), [fanned])
+
+        legacy = Post.objects.create(tweet="legacy", poster=self.author).id
+        feed = TimelineFeed(Post.objects.all(), self.reader)
+        self.assertEqual(feed._pulled_posters(), [self.author.id])
+        self.assertEqual(self.feed_ids(), [legacy, fanned])
+
+    def test_backfill_command(self):
+        post = Post.objects.create(tweet="legacy", poster=self.author)
+        call_command("backfill_timelines", stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.fanned_out)
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.reader).exists())
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.fans = [User.objects.create_user(f"fan{i}") for i in range(3)]
+        self.posts = [
+            Post.objects.create(tweet=f"post {i}", poster=self.author) for i in range(3)
+        ]
+        self.client = APIClient()
+
+    def like(self, fan, post):
+        self.client.force_authenticate(fan)
+        self.client.post(f"/api/tweet/like-unlike/{post.id}/")
+
+    def board(self, key="most_liked_tweets", **params):
+        self.client.force_authenticate(None)
+        response = self.client.get("/api/home/", params)
+        return [tweet["id"] for tweet in response.data[key]]
+
+    def test_likes_reorder_cached_board(self):
+        old, middle, new = self.posts
+        self.assertEqual(self.board(), [new.id, middle.id, old.id])
+
+        self.like(self.fans[0], old)
+        self.like(self.fans[1], old)
+        self.like(self.fans[0], middle)
+        self.assertEqual(self.board(), [old.id, middle.id, new.id])
+
+        self.like(self.fans[0], old)
+        self.like(self.fans[1], old)
+        self.assertEqual(self.board(), [middle.id, new.id, old.id])
+
+    def test_comments_and_new_posts_update_board(self):
+        self.board("most_commented_tweets")
+        self.client.force_authenticate(self.author)
+        post_id = self.client.post("/api/tweet/", {"tweet": "x"}, format="json").data[
+            "id"
+        ]
+        self.client.post(f"/api/tweet/comment/{post_id}/", {"comment": "hi"})
+        self.assertEqual(self.board("most_commented_tweets")[0], post_id)
+
+    def test_windows(self):
+        Post.objects.filter(id=self.posts[0].id).update(
+            date_posted=timezone.now() - timedelta(days=3)
+        )
+        self.assertEqual(len(self.board(window="all")), 3)
+        self.assertEqual(len(self.board(window="7d")), 3)
+        self.assertNotIn(self.posts[0].id, self.board(window="24h"))
+
+    def test_unknown_window(self):
+        response = self.client.get("/api/home/", {"window": "1y"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_partial_board_rebuilds(self):
+        with self.settings(LEADERBOARD_WINDOWS={"all": None}):
+            for i in range(leaderboards.BUFFER + 5):
+                Post.objects.create(tweet=f"extra {i}", poster=self.author)
+            liked = self.posts[0]
+            self.like(self.fans[0], liked)
+            top = self.board()
+            self.assertEqual(top[0], liked.id)
+            self.like(self.fans[0], liked)
+            self.assertEqual(len(self.board()), leaderboards.TOP)
+
+
+class CommentPaginationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user("author")
+        self.post = Post.objects.create(tweet="viral", poster=self.author)
+        self.comments = [
+            Comment.objects.create(
+                main_post=self.post, commenter=self.author, comment=f"c{i}"
+            )
+            for i in range(45)
+        ]
+        self.newest_first = [comment.id for comment in reversed(self.comments)]
+        self.client = APIClient()
+
+    def test_feeds_embed_a_preview(self):
+        response = self.client.get("/api/home/")
+        tweet = response.data["recent_tweets"][0]
+        self.assertEqual(
+            [comment["id"] for comment in tweet["comments"]], self.newest_first[:3]
+        )
+
+    def test_detail_embeds_every_comment(self):
+        response = self.client.get(f"/api/tweet/{self.post.id}/")
+        self.assertEqual(len(response.data["comments"]), 45)
+
+    def test_comments_endpoint_walks_every_comment(self):
+        seen, cursor = [], ""
+        while cursor is not None:
+            response = self.client.get(
+                f"/api/tweet/{self.post.id}/comments/", {"cursor": cursor}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["comments"]), 20)
+            seen += [comment["id"] for comment in response.data["comments"]]
+            cursor = response.data["next_cursor"]
+        self.assertEqual(seen, self.newest_first)
+
+    def test_comments_of_missing_post(self):
+        response = self.client.get("/api/tweet/999/comments/")
+        self.assertEqual(response.status_code, 404)
+
+
+class ProfileSectionTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user("author")
+        self.posts = [
+            Post.objects.create(tweet=f"post {i}", poster=self.author)
+            for i in range(15)
+        ]
+        for post in self.posts:
+            post.likers.add(self.author)
+            Comment.objects.create(main_post=post, commenter=self.author, comment="c")
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def walk(self, url, key):
+        seen, cursor = [], ""
+        while cursor is not None:
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data[key]), 10)
+            seen += [item["id"] for item in response.data[key]]
+            cursor = response.data["next_cursor"]
+        return seen
+
+    def test_profile_embeds_bounded_first_pages(self):
+        response = self.client.get("/api/profile/author/")
+        self.assertEqual(response.data["user"]["username"], "author")
+        for section in ("tweets", "comments", "liked_tweets"):
+            self.assertEqual(len(response.data[section]), 10)
+            self.assertIsNotNone(response.data["next_cursors"][section])
+
+    def test_header_only(self):
+        response = self.client.get("/api/profile/author/", {"sections": ""})
+        self.assertEqual(set(response.data), {"user", "next_cursors"})
+
+    def test_sections_page_through_everything(self):
+        newest_first = [post.id for post in reversed(self.posts)]
+        self.assertEqual(
+            self.walk("/api/profile/author/tweets/", "tweets"), newest_first
+        )
+        self.assertEqual(
+            self.walk("/api/profile/author/likes/", "liked_tweets"), newest_first
+        )
+        self.assertEqual(
+            len(set(self.walk("/api/profile/author/comments/", "comments"))), 15
+        )
+
+    def test_unknown_user(self):
+        response = self.client.get("/api/profile/nobody/tweets/")
+        self.assertEqual(response.status_code, 404)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user("author")
+        self.post = Post.objects.create(tweet="hello", poster=self.author)
+        self.post.likers.add(self.author)
+        Comment.objects.create(main_post=self.post, commenter=self.author, comment="c")
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get(self, url, **params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_fields_limit_output_and_queries(self):
+        full, full_queries = self.get("/api/home/")
+        sparse, sparse_queries = self.get("/api/home/", fields="id,tweet")
+        self.assertEqual(set(sparse["recent_tweets"][0]), {"id", "tweet"})
+        # No likers, comments or is_liked lookups for any of the three lists.
+        self.assertEqual(sparse_queries, full_queries - 9)
+
+    def test_omit(self):
+        data, _ = self.get(f"/api/tweet/{self.post.id}/", omit="likers,comments")
+        self.assertNotIn("likers", data)
+        self.assertNotIn("comments", data)
+        self.assertEqual(data["tweet"], "hello")
+
+    def test_expand_poster(self):
+        data, _ = self.get(f"/api/tweet/{self.post.id}/", expand="poster")
+        self.assertEqual(data["poster"]["username"], "author")
+        self.assertNotIn("following", data["poster"])
+
+    def test_comment_fields_and_expand(self):
+        data, _ = self.get(
+            f"/api/tweet/{self.post.id}/comments/",
+            fields="id,commenter",
+            expand="commenter",
+        )
+        comment = data["comments"][0]
+        self.assertEqual(set(comment), {"id", "commenter"})
+        self.assertEqual(comment["commenter"]["username"], "author")
+
+    def test_user_serializer(self):
+        other = User.objects.create_user("other")
+        self.author.following.add(other)
+        request = APIRequestFactory().get("/", {"expand": "following", "omit": "id"})
+        data = UserSerializer(self.author, context={"request": Request(request)}).data
+        self.assertNotIn("id", data)
+        self.assertEqual(data["following"], [{"id": other.id, "username": "other"}])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.fan = User.objects.create_user("fan")
+        self.post = Post.objects.create(tweet="hello", poster=self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.fan)
+
+    def assert_revalidates(self, url, change):
+        first = self.client.get(url)
+        self.assertIn("Authorization", first["Vary"])
+        self.assertIn("no-cache", first["Cache-Control"])
+        etag = first["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached["ETag"], etag)
+        self.assertLess(len(queries), 6)
+
+        change()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+
+    def like(self):
+        self.client.post(f"/api/tweet/like-unlike/{self.post.id}/")
+
+    def test_tweet_detail(self):
+        self.assert_revalidates(f"/api/tweet/{self.post.id}/", self.like)
+
+    def test_home(self):
+        self.assert_revalidates(
+            "/api/home/",
+            lambda: Post.objects.create(tweet="new", poster=self.author),
+        )
+
+    def test_profile(self):
+        self.assert_revalidates(
+            "/api/profile/author/",
+            lambda: self.client.post("/api/profile/author/"),
+        )
+
+    def test_liking_changes_the_likers_profile(self):
+        self.assert_revalidates("/api/profile/fan/likes/", self.like)
+
+    def test_likes_and_comments_change_the_posters_profile(self):
+        self.assert_revalidates("/api/profile/author/tweets/", self.like)
+        self.assert_revalidates(
+            "/api/profile/author/tweets/",
+            lambda: self.client.post(
+                f"/api/tweet/comment/{self.post.id}/", {"comment": "hi"}
+            ),
+        )
+
+    def test_versions_do_not_aggregate(self):
+        for url in ("/api/home/", "/api/profile/author/"):
+            etag = self.client.get(url)["ETag"]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            for query in queries.captured_queries:
+                self.assertNotIn("COUNT(", query["sql"])
+                self.assertNotIn("MAX(", query["sql"])
+
+    def test_etags_expire_with_their_age_bucket(self):
+        for url in ("/api/home/?window=24h", "/api/profile/author/"):
+            with mock.patch("api.conditional.time.time", return_value=1000.0):
+                etag = self.client.get(url)["ETag"]
+                cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(cached.status_code, 304)
+            later = 1000.0 + settings.ETAG_MAX_AGE
+            with mock.patch("api.conditional.time.time", return_value=later):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+    @override_settings(ETAG_MAX_AGE=None, RESPONSE_CACHE_TIMEOUT=0)
+    def test_windows_without_an_age_bucket_are_not_conditional(self):
+        response = self.client.get("/api/home/", {"window": "24h"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assert_revalidates(
+            "/api/home/",
+            lambda: Post.objects.create(tweet="new", poster=self.author),
+        )
+
+    def test_etag_is_per_viewer(self):
+        url = f"/api/tweet/{self.post.id}/"
+        etag = self.client.get(url)["ETag"]
+        self.client.force_authenticate(self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_if_modified_since(self):
+        url = f"/api/tweet/{self.post.id}/"
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_post_is_not_conditional(self):
+        response = self.client.get("/api/tweet/999/", HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 404)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.fan = User.objects.create_user("fan")
+        self.post = Post.objects.create(tweet="hello", poster=self.author)
+        self.url = f"/api/tweet/{self.post.id}/"
+        self.client = APIClient()
+
+    def stats(self, scope):
+        return response_cache.stats()[scope]
+
+    def test_anonymous_reads_are_served_from_cache(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["tweet"], "hello")
+        self.assertEqual(self.stats("tweet"), {"hits": 1, "misses": 1})
+        # Only the ETag stamp and the poster lookup for the cache key remain.
+        self.assertEqual(len(queries), 2)
+
+    def test_is_liked_is_overlaid_per_viewer(self):
+        self.post.likers.add(self.fan)
+        self.client.force_authenticate(self.fan)
+        self.assertTrue(self.client.get(self.url).data["is_liked"])
+
+        self.client.force_authenticate(None)
+        self.assertFalse(self.client.get(self.url).data["is_liked"])
+        self.client.force_authenticate(self.fan)
+        self.assertTrue(self.client.get(self.url).data["is_liked"])
+        self.client.force_authenticate(self.author)
+        self.assertFalse(self.client.get(self.url).data["is_liked"])
+        self.assertEqual(self.stats("tweet")["hits"], 3)
+
+    def test_is_liked_without_id_is_not_cached(self):
+        self.post.likers.add(self.fan)
+        for viewer, liked in ((None, False), (self.fan, True), (self.author, False)):
+            self.client.force_authenticate(viewer)
+            for url in (self.url, "/api/home/"):
+                response = self.client.get(url, {"fields": "is_liked"})
+                self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["recent_tweets"], [{"is_liked": liked}])
+            self.assertEqual(self.client.get(self.url).data["is_liked"], liked)
+        self.assertEqual(self.stats("tweet")["hits"], 2)
+
+    def test_writes_invalidate(self):
+        self.client.get(self.url)
+        self.client.get("/api/home/")
+        self.client.force_authenticate(self.fan)
+
+        self.client.post(f"/api/tweet/like-unlike/{self.post.id}/")
+        self.assertEqual(self.client.get(self.url).data["likes_count"], 1)
+
+        self.client.post(f"/api/tweet/comment/{self.post.id}/", {"comment": "hi"})
+        self.assertEqual(self.client.get(self.url).data["comments_count"], 1)
+        home = self.client.get("/api/home/").data
+        self.assertEqual(home["recent_tweets"][0]["comments_count"], 1)
+
+        self.client.force_authenticate(self.author)
+        self.client.put(self.url, {"tweet": "edited"}, format="json")
+        self.assertEqual(self.client.get(self.url).data["tweet"], "edited")
+        self.assertEqual(self.stats("tweet")["hits"], 0)
+
+    def test_follow_invalidates_expanded_poster(self):
+        url = f"{self.url}?expand=poster"
+        self.client.get(url)
+        self.author.followers.add(self.fan)
+        User.objects.filter(id=self.author.id).update(followers_count=1)
+        self.assertEqual(self.client.get(url).data["poster"]["followers_count"], 1)
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.client.force_authenticate(self.fan)
+        self.assertEqual(self.client.get("/api/cache-stats/").status_code, 403)
+        self.client.force_authenticate(
+            User.objects.create_superuser("admin", "password")
+        )
+        self.assertIn("home", self.client.get("/api/cache-stats/").data)
+
+
+class IdempotentActionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.fan = User.objects.create_user("fan")
+        self.post = Post.objects.create(tweet="hello", poster=self.author)
+        self.url = f"/api/tweet/{self.post.id}/like/"
+        self.client = APIClient()
+        self.client.force_authenticate(self.fan)
+
+    def test_repeated_like_and_unlike(self):
+        for _ in range(2):
+            response = self.client.put(self.url)
+            self.assertEqual(response.data["liked"], True)
+            self.assertEqual(response.data["likes_count"], 1)
+        for _ in range(2):
+            response = self.client.delete(self.url)
+            self.assertEqual(response.data["liked"], False)
+            self.assertEqual(response.data["likes_count"], 0)
+        self.assertFalse(self.post.likers.exists())
+
+    def test_like_cost_does_not_grow_with_likers(self):
+        def cost():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.put(self.url)
+            self.client.delete(self.url)
+            return len(queries)
+
+        small = cost()
+        self.post.likers.add(*[User.objects.create_user(f"fan{i}") for i in range(20)])
+        self.assertEqual(cost(), small)
+
+    def test_missing_post(self):
+        self.assertEqual(self.client.put("/api/tweet/999/like/").status_code, 404)
+
+    def test_repeated_follow_and_unfollow(self):
+        for _ in range(2):
+            response = self.client.put("/api/profile/author/follow/")
+            self.assertEqual(response.data["following"], True)
+            self.assertEqual(response.data["followers_count"], 1)
+        self.fan.refresh_from_db()
+        self.assertEqual(self.fan.following_count, 1)
+        for _ in range(2):
+            response = self.client.delete("/api/profile/author/follow/")
+            self.assertEqual(response.data["followers_count"], 0)
+        self.assertFalse(self.fan.following.exists())
+
+    def test_cannot_follow_self(self):
+        response = self.client.put("/api/profile/fan/follow/")
+        self.assertEqual(response.status_code, 400)
+
+    def test_toggle_that_loses_an_insert_race(self):
+        # A concurrent toggle inserted the row between our DELETE and INSERT.
+        self.assertEqual(set_like(self.fan, self.post), (True, True))
+        with mock.patch("api.actions._delete", return_value=False):
+            self.assertEqual(set_like(self.fan, self.post), (True, False))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.likers.count(), 1)
+
+
+@override_settings(LIKE_WRITE_BEHIND=True, LIKE_FLUSH_INTERVAL=None)
+class LikeBufferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.fans = [User.objects.create_user(f"fan{i}") for i in range(3)]
+        self.post = Post.objects.create(tweet="viral", poster=self.author)
+        self.client = APIClient()
+
+    def tearDown(self):
+        like_buffer.buffer.flush()
+
+    def act(self, fan, method="put"):
+        self.client.force_authenticate(fan)
+        return getattr(self.client, method)(f"/api/tweet/{self.post.id}/like/")
+
+    def test_likes_are_visible_before_flush(self):
+        for fan in self.fans:
+            response = self.act(fan)
+        self.assertEqual(response.data["likes_count"], 3)
+        self.assertFalse(self.post.likers.exists())
+
+        detail = self.client.get(f"/api/tweet/{self.post.id}/").data
+        self.assertEqual(detail["likes_count"], 3)
+        self.assertTrue(detail["is_liked"])
+
+        self.assertEqual(like_buffer.buffer.flush(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 3)
+        self.assertEqual(self.post.likers.count(), 3)
+        self.assertEqual(self.act(self.fans[0]).data["likes_count"], 3)
+
+    def test_intents_collapse_per_user_and_post(self):
+        fan = self.fans[0]
+        self.act(fan)
+        self.act(fan, "delete")
+        self.client.post(f"/api/tweet/like-unlike/{self.post.id}/")
+        self.act(fan)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(like_buffer.buffer.flush(), 1)
+        self.assertLess(len(queries), 15)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_unlike_of_persisted_like(self):
+        self.act(self.fans[0])
+        like_buffer.buffer.flush()
+        response = self.act(self.fans[0], "delete")
+        self.assertEqual(response.data["likes_count"], 0)
+        like_buffer.buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertFalse(self.post.likers.exists())
+
+    def test_likes_of_deleted_posts_are_dropped(self):
+        other = Post.objects.create(tweet="other", poster=self.author)
+        self.act(self.fans[0])
+        set_like(self.fans[0], other, True)
+        Post.objects.filter(id=self.post.id).delete()
+
+        self.assertEqual(like_buffer.buffer.flush(), 2)
+        self.assertEqual(list(other.likers.all()), [self.fans[0]])
+        self.assertEqual(like_buffer.buffer.delta(self.post.id), 0)
+        self.assertEqual(like_buffer.buffer.flush(), 0)
+
+    def test_toggle_rereads_a_like_flushed_during_its_lookup(self):
+        fan = self.fans[0]
+        filter_likes = like_buffer.Like.objects.filter
+        raced = []
+
+        def like_and_flush_meanwhile(*args, **kwargs):
+            if set(kwargs) != {"user_id", "post_id"}:
+                return filter_likes(*args, **kwargs)  # the flush's own reads
+            exists = filter_likes(*args, **kwargs).exists()
+            if not raced:
+                raced.append(True)
+                like_buffer.buffer.enqueue(fan.id, self.post.id, True)
+                like_buffer.buffer.flush()
+            return mock.Mock(exists=lambda: exists)
+
+        with mock.patch.object(
+            like_buffer.Like.objects, "filter", like_and_flush_meanwhile
+        ):
+            self.assertEqual(
+                like_buffer.buffer.enqueue(fan.id, self.post.id), (False, True)
+            )
+        like_buffer.buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertFalse(self.post.likers.exists())
+
+    def test_sparse_fields_see_buffered_likes(self):
+        self.act(self.fans[0])
+        response = self.client.get(
+            "/api/tweets/", {"ids": self.post.id, "fields": "likes_count,is_liked"}
+        )
+        self.assertEqual(
+            response.data["tweets"], [{"is_liked": True, "likes_count": 1}]
+        )
+        response = self.client.get(
+            f"/api/tweet/{self.post.id}/", {"fields": "likes_count"}
+        )
+        self.assertEqual(response.data, {"likes_count": 1})
+        with override_settings(FAST_SERIALIZERS=False):
+            response = self.client.get(
+                "/api/tweets/", {"ids": self.post.id, "fields": "likes_count"}
+            )
+        self.assertEqual(response.data["tweets"], [{"likes_count": 1}])
+
+    @override_settings(LIKE_FLUSH_MAX_ATTEMPTS=2)
+    def test_failing_intents_do_not_hold_back_the_rest(self):
+        other = Post.objects.create(tweet="other", poster=self.author)
+        self.act(self.fans[0])
+        set_like(self.fans[0], other, True)
+        write = like_buffer.LikeBuffer._write
+
+        def fail_on_post(buffer, batch):
+            if any(post_id == self.post.id for _, post_id in batch):
+                raise DatabaseError("broken")
+            return write(buffer, batch)
+
+        with mock.patch.object(like_buffer.LikeBuffer, "_write", fail_on_post):
+            with self.assertRaises(DatabaseError):
+                like_buffer.buffer.flush()
+            self.assertEqual(list(other.likers.all()), [self.fans[0]])
+            self.assertEqual(like_buffer.buffer.delta(self.post.id), 1)
+            with self.assertRaises(DatabaseError), self.assertLogs(
+                "api.like_buffer", "ERROR"
+            ):
+                like_buffer.buffer.flush()
+        self.assertEqual(like_buffer.buffer.delta(self.post.id), 0)
+        self.assertEqual(like_buffer.buffer.flush(), 0)
+        self.assertFalse(self.post.likers.exists())
+
+
+class BulkEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.fan = User.objects.create_user("fan")
+        self.posts = [
+            Post.objects.create(tweet=f"post {i}", poster=self.author)
+            for i in range(20)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.fan)
+
+    def test_bulk_get_keeps_request_order(self):
+        ids = [self.posts[3].id, 999, self.posts[1].id, self.posts[3].id]
+        response = self.client.get("/api/tweets/", {"ids": ",".join(map(str, ids))})
+        self.assertEqual(
+            [tweet["id"] for tweet in response.data["tweets"]],
+            [self.posts[3].id, self.posts[1].id],
+        )
+        self.assertEqual(response.data["missing"], [999])
+
+    def test_bulk_get_costs_constant_queries(self):
+        def cost(posts):
+            ids = ",".join(str(post.id) for post in posts)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get("/api/tweets/", {"ids": ids})
+            return len(queries)
+
+        self.assertEqual(cost(self.posts[:2]), cost(self.posts))
+
+    def test_bulk_get_validation(self):
+        self.assertEqual(
+            self.client.get("/api/tweets/", {"ids": "1,x"}).status_code, 400
+        )
+        too_many = ",".join(str(i) for i in range(101))
+        self.assertEqual(
+            self.client.get("/api/tweets/", {"ids": too_many}).status_code, 400
+        )
+        for ids in (str(2**63), "0", "-1"):
+            response = self.client.get("/api/tweets/", {"ids": ids})
+            self.assertEqual(response.status_code, 400, ids)
+        response = self.client.get("/api/tweets/", {"ids": str(2**63 - 1)})
+        self.assertEqual(response.data["missing"], [2**63 - 1])
+
+    def test_batch_applies_every_action(self):
+        post = self.posts[0]
+        response = self.client.post(
+            "/api/batch/",
+            {
+                "actions": [
+                    {"action": "like", "tweet": post.id},
+                    {"action": "like", "tweet": post.id},
+                    {"action": "like", "tweet": 999},
+                    {"action": "follow", "username": "author"},
+                    {"action": "unfollow", "username": "fan"},
+                ]
+            },
+            format="json",
+        )
+        results = response.data["results"]
+        self.assertEqual(results[0], {"success": True, "liked": True, "likes_count": 1})
+        self.assertEqual(results[1]["likes_count"], 1)
+        self.assertFalse(results[2]["success"])
+        self.assertEqual(results[3]["followers_count"], 1)
+        self.assertFalse(results[4]["success"])
+        self.assertTrue(self.fan.following.filter(id=self.author.id).exists())
+
+    def test_batch_validation(self):
+        response = self.client.post(
+            "/api/batch/", {"actions": [{"action": "like"}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            "/api/batch/",
+            {"actions": [{"action": "like", "tweet": 2**63}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_huge_ids_in_urls(self):
+        for url in (f"/api/tweet/{2**63}/", f"/api/tweet/{2**63}/comments/"):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def search(self, q, **params):
+        return self.client.get("/api/search/", {"q": q, **params})
+
+    def texts(self, q):
+        return [tweet["tweet"] for tweet in self.search(q).data["tweets"]]
+
+    def test_matches_stems_and_prefixes_best_first(self):
+        Post.objects.create(tweet="a cat and a dog", poster=self.author)
+        Post.objects.create(tweet="cats cats cats", poster=self.author)
+        Post.objects.create(tweet="only dogs", poster=self.author)
+        self.assertEqual(self.texts("cat"), ["cats cats cats", "a cat and a dog"])
+        self.assertEqual(self.texts("ca"), ["cats cats cats", "a cat and a dog"])
+        self.assertEqual(self.texts("dog cat"), ["a cat and a dog"])
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(tweet="hello world", poster=self.author)
+        self.client.put(f"/api/tweet/{post.id}/", {"tweet": "goodbye"}, format="json")
+        self.assertEqual(self.texts("hello"), [])
+        self.assertEqual(self.texts("goodbye"), ["goodbye"])
+        post.delete()
+        self.assertEqual(self.texts("goodbye"), [])
+
+    def test_cursor_pages_cover_every_match_once(self):
+        Post.objects.bulk_create(
+            Post(tweet=f"news {'big ' * (i % 3)}item {i}", poster=self.author)
+            for i in range(25)
+        )
+        seen, cursor = [], ""
+        while cursor is not None:
+            data = self.search("news", cursor=cursor).data
+            seen += [tweet["id"] for tweet in data["tweets"]]
+            cursor = data["next_cursor"]
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_validation(self):
+        self.assertEqual(self.search("  ?! ").status_code, 400)
+        self.assertEqual(self.search("news", cursor="nope").status_code, 400)
+
+    def test_rebuild_restores_dropped_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER api_post_fts_insert")
+        Post.objects.create(tweet="missed", poster=self.author)
+        self.assertEqual(self.texts("missed"), [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.texts("missed"), ["missed"])
+        Post.objects.create(tweet="missed again", poster=self.author)
+        self.assertEqual(len(self.texts("missed")), 2)
+
+
+class TagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.bob = User.objects.create_user("bob")
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def tweet(self, text):
+        return self.client.post("/api/tweet/", {"tweet": text}, format="json")
+
+    def tagged(self, name, **params):
+        return self.client.get(f"/api/tag/{name}/", params)
+
+    def test_extracts_hashtags_and_mentions_of_real_users(self):
+        self.assertEqual(
+            tags.extract_tags("#Django rocks, ask @bob or @nobody at a@b.com #py3!"),
+            {"#django", "#py3", "@bob"},
+        )
+
+    def test_tag_timeline_follows_creates_and_edits(self):
+        first = self.tweet("hello #World @bob").data["id"]
+        second = self.tweet("again #world").data["id"]
+        ids = [t["id"] for t in self.tagged("%23World").data["tweets"]]
+        self.assertEqual(ids, [second, first])
+        self.assertEqual(self.tagged("@bob").data["tag"], "@bob")
+
+        self.client.put(f"/api/tweet/{first}/", {"tweet": "#moved"}, format="json")
+        self.assertEqual(
+            [t["id"] for t in self.tagged("world").data["tweets"]], [second]
+        )
+        self.assertEqual(self.tagged("@bob").data["tweets"], [])
+        self.assertEqual(len(self.tagged("moved").data["tweets"]), 1)
+
+    def test_tag_timeline_pages_with_cursors(self):
+        for i in range(15):
+            self.tweet(f"#busy {i}")
+        page = self.tagged("busy").data
+        rest = self.tagged("busy", cursor=page["next_cursor"]).data
+        self.assertEqual(len(page["tweets"]) + len(rest["tweets"]), 15)
+        self.assertIsNone(rest["next_cursor"])
+        self.assertEqual(self.tagged("busy", cursor="bad").status_code, 400)
+
+    def test_trending_sums_buckets_inside_the_window(self):
+        for text in ["#a", "#a #b", "#b", "#b", "#c"]:
+            self.tweet(text)
+        stale = tags.bucket_start(timezone.now() - timedelta(days=2))
+        TrendBucket.objects.create(tag="#c", bucket=stale, count=100)
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            trending = self.client.get("/api/trending/").data["trending"]
+        self.assertEqual(
+            trending,
+            [
+                {"tag": "#b", "count": 3},
+                {"tag": "#a", "count": 2},
+                {"tag": "#c", "count": 1},
+            ],
+        )
+        self.assertLessEqual(len(queries), 2)
+        self.assertFalse(TrendBucket.objects.filter(bucket=stale).exists())
+
+
+class AuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication.blacklist.reset()
+        self.user = User.objects.create_user("alice", password="secret-pass-1")
+        self.factory = RequestFactory()
+
+    def authenticate(self, user=None):
+        token = AccessToken.for_user(user or self.user)
+        request = self.factory.get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return authentication.CachedJWTAuthentication().authenticate(request)
+
+    def test_user_is_cached_until_saved(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.authenticate()[0], self.user)
+            self.authenticate()
+        self.assertEqual(len(queries), 1)
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_blacklist_filter_skips_the_table_for_live_tokens(self):
+        live = authentication.RefreshToken.for_user(self.user)
+        revoked = authentication.RefreshToken.for_user(self.user)
+        revoked.blacklist()
+        authentication.RefreshToken(str(live))  # first use loads the filter
+        with CaptureQueriesContext(connection) as queries:
+            authentication.RefreshToken(str(live))
+        self.assertEqual(len(queries), 0)
+        with self.assertRaises(TokenError):
+            authentication.RefreshToken(str(revoked))
+
+    def test_rotated_refresh_token_is_rejected(self):
+        client = APIClient()
+        refresh = client.post(
+            "/api/login/", {"username": "alice", "password": "secret-pass-1"}
+        ).data["refresh"]
+        rotated = client.post("/api/token/refresh/", {"refresh": refresh})
+        self.assertEqual(rotated.status_code, 200)
+        again = client.post("/api/token/refresh/", {"refresh": refresh})
+        self.assertEqual(again.status_code, 401)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = authentication.BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+        self.assertTrue(all(f"jti-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_last_login_writes_are_coalesced(self):
+        client = APIClient()
+        credentials = {"username": "alice", "password": "secret-pass-1"}
+        client.post("/api/login/", credentials)
+        first = User.objects.get(id=self.user.id).last_login
+        self.assertIsNotNone(first)
+        client.post("/api/login/", credentials)
+        self.assertEqual(User.objects.get(id=self.user.id).last_login, first)
+
+    def test_expired_tokens_are_pruned_once_per_interval(self):
+        token = authentication.RefreshToken.for_user(self.user)
+        token.blacklist()
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(days=1))
+        live = authentication.RefreshToken.for_user(self.user)
+
+        self.assertEqual(authentication.schedule_token_prune(), 2)
+        self.assertIsNone(authentication.schedule_token_prune())
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)),
+            [live["jti"]],
+        )
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.carol = User.objects.create_user("carol")
+        self.post = Post.objects.create(tweet="hi #intro @bob", poster=self.alice)
+        Post.objects.filter(id=self.post.id).update(
+            date_posted=timezone.now() - timedelta(days=3)
+        )
+        set_follow(self.bob, self.alice)
+        set_follow(self.alice, self.carol)
+        set_like(self.bob, self.post)
+        Comment.objects.create(main_post=self.post, commenter=self.bob, comment="yo")
+        self.client = APIClient()
+
+    def export(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get(f"/api/profile/{user.username}/export/")
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_export_streams_the_owners_archive(self):
+        lines = [json.loads(line) for line in self.export(self.alice).splitlines()]
+        self.assertEqual([line["type"] for line in lines], ["user", "post", "follow"])
+        self.assertEqual(lines[0]["username"], "alice")
+        self.assertEqual(lines[2], {"type": "follow", "from": "alice", "to": "carol"})
+
+        self.client.force_authenticate(self.bob)
+        response = self.client.get("/api/profile/alice/export/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_import_restores_exported_archives(self):
+        dumps = Path(tempfile.mkdtemp())
+        for user in (self.alice, self.bob):
+            (dumps / f"{user.username}.ndjson").write_text(self.export(user))
+        date_posted = Post.objects.get(id=self.post.id).date_posted
+        Comment.objects.all().delete()
+        User.objects.filter(username__in=["alice", "bob"]).delete()
+
+        call_command(
+            "import_data",
+            # Bob's like and comment wait for Alice's post to be imported.
+            str(dumps / "bob.ndjson"),
+            str(dumps / "alice.ndjson"),
+            stdout=StringIO(),
+        )
+
+        post = Post.objects.get(poster__username="alice")
+        self.assertEqual(post.date_posted, date_posted)
+        self.assertEqual((post.likes_count, post.comments_count), (1, 1))
+        self.assertEqual(post.comments.get().commenter.username, "bob")
+        self.assertFalse(User.objects.get(username="bob").has_usable_password())
+        self.assertEqual(
+            set(post.tags.values_list("tag", flat=True)), {"#intro", "@bob"}
+        )
+        alice = User.objects.get(username="alice")
+        self.assertEqual((alice.followers_count, alice.following_count), (1, 1))
+        self.assertFalse(drifted_users().exists())
+
+    def test_import_rejects_bad_records_atomically(self):
+        path = Path(tempfile.mkdtemp()) / "bad.ndjson"
+        path.write_text(
+            '{"type": "user", "username": "dave", "date_joined": "2024-01-01T00:00:00Z"}\n'
+            '{"type": "spam"}\n'
+        )
+        with self.assertRaises(CommandError):
+            call_command("import_data", str(path), stdout=StringIO())
+        self.assertFalse(User.objects.filter(username="dave").exists())
+
+
+class SeedingTests(TestCase):
+    def test_seed_data_is_consistent_and_skewed(self):
+        call_command("seed_data", users=60, posts=400, follows=5, stdout=StringIO())
+        users = User.objects.filter(username__startswith="seed")
+        self.assertEqual(users.count(), 60)
+        self.assertEqual(Post.objects.count(), 400)
+        self.assertFalse(drifted_posts().exists())
+        self.assertFalse(drifted_users().exists())
+
+        # Every fanned-out post reached each follower of its poster.
+        follows = User.following.through.objects.all()
+        expected = sum(
+            follows.filter(to_user_id=poster).count()
+            for poster in Post.objects.values_list("poster_id", flat=True)
+        )
+        self.assertEqual(TimelineEntry.objects.count(), expected)
+        tagged = Post.objects.filter(tweet__contains="#").count()
+        self.assertEqual(PostTag.objects.count(), tagged)
+
+        followers = sorted(users.values_list("followers_count", flat=True))
+        self.assertGreater(followers[-1], 5 * followers[len(followers) // 2])
+
+    def test_seed_data_refuses_existing_prefix(self):
+        User.objects.create_user("seed1")
+        with self.assertRaises(CommandError):
+            call_command("seed_data", users=2, posts=2, stdout=StringIO())
+
+
+class QueryPlanTests(TestCase):
+    """
+    Every SELECT issued by the endpoints must be answered from an index: no
+    full table scans and no temporary B-tree sorts. Plans are taken without
+    ANALYZE, so SQLite assumes large tables as it would in production.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user("reader")
+        authors = [User.objects.create_user(f"author{i}") for i in range(4)]
+        self.posts = [
+            Post.objects.create(tweet=f"post {i}", poster=authors[i % 4])
+            for i in range(30)
+        ]
+        for author in authors[:3]:
+            set_follow(self.reader, author, True)
+        # One followee is past the fan-out limit, so its posts are pulled.
+        Post.objects.filter(poster=authors[2]).update(fanned_out=False)
+        for i, post in enumerate(self.posts):
+            set_like(authors[i % 3], post, True)
+            Comment.objects.create(main_post=post, commenter=self.reader, comment="c")
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[3] for row in cursor.fetchall()]
+
+    def assertIndexed(self, method, url, data=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(response.status_code, 400, url)
+        for query in queries.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT"):
+                continue
+            # The legacy ?page= pagination (used without ?cursor=) counts the
+            # whole feed for its page total; every other walk of an index
+            # must stop at a LIMIT.
+            counts_pages = "cursor" not in (data or {}) and sql.startswith(
+                "SELECT COUNT(*)"
+            )
+            for step in self.plan(sql):
+                with self.subTest(url=url, data=data, sql=sql, step=step):
+                    table = step.split()[1] if step.startswith("SCAN ") else ""
+                    if table.startswith(("api_", "U")):
+                        self.assertNotEqual(step, f"SCAN {table}", "full table scan")
+                        self.assertTrue(
+                            " LIMIT " in sql or counts_pages, "unbounded index scan"
+                        )
+                    # Sliced prefetches re-sort their few rows per post, and
+                    # ranking has to score every full-text match.
+                    if "TEMP B-TREE" in step:
+                        self.assertTrue(
+                            '"qualify"' in sql or " MATCH " in sql, "temp B-tree sort"
+                        )
+        return response
+
+    def test_read_endpoints(self):
+        post = self.posts[0]
+        home = self.assertIndexed("get", "/api/home/", {"cursor": ""})
+        self.assertIndexed("get", "/api/home/", {"cursor": home.data["next_cursor"]})
+        self.assertIndexed("get", "/api/home/", {"page": 2})
+        self.assertIndexed("get", "/api/home/", {"window": "24h"})
+        feed = self.assertIndexed("get", "/api/following-feed/", {"cursor": ""})
+        self.assertIndexed(
+            "get", "/api/following-feed/", {"cursor": feed.data["next_cursor"]}
+        )
+        self.assertIndexed("get", "/api/following-feed/", {"page": 1})
+        self.assertIndexed("get", f"/api/tweet/{post.id}/")
+        self.assertIndexed("get", f"/api/tweet/{post.id}/comments/")
+        self.assertIndexed("get", "/api/tag/news/")
+        search = self.assertIndexed("get", "/api/search/", {"q": "post"})
+        self.assertIndexed(
+            "get", "/api/search/", {"q": "post", "cursor": search.data["next_cursor"]}
+        )
+        self.assertIndexed(
+            "get", "/api/tweets/", {"ids": ",".join(str(p.id) for p in self.posts)}
+        )
+        profile = self.assertIndexed("get", "/api/profile/author0/")
+        for section, path in (
+            ("tweets", "tweets"),
+            ("comments", "comments"),
+            ("liked_tweets", "likes"),
+        ):
+            self.assertIndexed(
+                "get",
+                f"/api/profile/author0/{path}/",
+                {"cursor": profile.data["next_cursors"][section] or ""},
+            )
+
+    def test_write_endpoints(self):
+        post = self.posts[0]
+        self.assertIndexed("post", f"/api/tweet/like-unlike/{post.id}/")
+        self.assertIndexed("put", f"/api/tweet/{post.id}/like/")
+        self.assertIndexed("post", f"/api/tweet/comment/{post.id}/", {"comment": "hi"})
+        self.assertIndexed("post", "/api/profile/author3/")
+        self.assertIndexed("delete", "/api/profile/author3/follow/")
+        self.assertIndexed("post", "/api/tweet/", {"tweet": "new #news @author0"})
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    def test_router_sends_reads_of_safe_requests_to_the_replica(self):
+        router = db_router.ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), "default")
+        token = db_router.reading.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Post), "replica")
+            self.assertEqual(router.db_for_write(Post), "default")
+        finally:
+            db_router.reading.reset(token)
+        self.assertFalse(router.allow_migrate("replica", "api"))
+
+    def test_middleware_marks_safe_methods(self):
+        seen = []
+        middleware = db_router.route_reads(
+            lambda request: seen.append(db_router.reading.get())
+        )
+        factory = RequestFactory()
+        middleware(factory.get("/"))
+        middleware(factory.post("/"))
+        self.assertEqual(seen, [True, False])
+        self.assertFalse(db_router.reading.get())
+
+    def test_production_options_apply_pragmas(self):
+        path = Path(tempfile.mkdtemp()) / "production.sqlite3"
+        settings_dict = {
+            **connection.settings_dict,
+            "NAME": str(path),
+            "OPTIONS": settings.SQLITE_PRODUCTION_OPTIONS,
+        }
+        wrapper = connections["default"].__class__(settings_dict, "production")
+        try:
+            with wrapper.cursor() as cursor:
+                pragmas = {
+                    name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                    for name in ("journal_mode", "synchronous", "busy_timeout")
+                }
+        finally:
+            wrapper.close()
+        self.assertEqual(
+            pragmas, {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 20000}
+        )
+        self.assertEqual(wrapper.transaction_mode, "IMMEDIATE")
+
+
+class AsyncViewTests(TransactionTestCase):
+    # The async views query from worker threads, which only see committed rows.
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.fan = User.objects.create_user("fan")
+        self.fan.following.add(self.author)
+        posts = [
+            Post.objects.create(tweet=f"post {i}", poster=self.author)
+            for i in range(12)
+        ]
+        posts[0].likers.add(self.fan)
+        for i in range(5):
+            Comment.objects.create(
+                main_post=posts[1], commenter=self.fan, comment=f"c{i}"
+            )
+        self.post = posts[1]
+        self.client = APIClient()
+        self.client.force_authenticate(self.fan)
+
+    def assertSameResponse(self, sync_url, async_url, **params):
+        cache.clear()
+        expected = self.client.get(sync_url, params)
+        actual = self.client.get(async_url, params)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.content, expected.content)
+
+    def test_matches_sync_views(self):
+        self.assertSameResponse("/api/home/", "/api/async/home/")
+        self.assertSameResponse("/api/home/", "/api/async/home/", page=2)
+        self.assertSameResponse("/api/home/", "/api/async/home/", window="1y")
+        self.assertSameResponse("/api/following-feed/", "/api/async/following-feed/")
+        self.assertSameResponse(
+            f"/api/tweet/{self.post.id}/", f"/api/async/tweet/{self.post.id}/"
+        )
+        self.assertSameResponse("/api/tweet/999/", "/api/async/tweet/999/")
+        self.assertSameResponse("/api/profile/author/", "/api/async/profile/author/")
+        self.assertSameResponse(
+            "/api/profile/fan/", "/api/async/profile/fan/", sections="comments"
+        )
+        self.assertSameResponse("/api/profile/nobody/", "/api/async/profile/nobody/")
+
+    def test_login_required(self):
+        self.client.force_authenticate(None)
+        self.assertSameResponse("/api/following-feed/", "/api/async/following-feed/")
+        self.assertSameResponse("/api/profile/author/", "/api/async/profile/author/")
+
+    async def test_served_through_asgi(self):
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.fan)))()
+        client = AsyncClient()
+        response = await client.get(
+            "/api/async/following-feed/", headers={"Authorization": f"Bearer {token}"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["tweets"]), 10)
+
+        response = await client.get(
+            "/api/async/home/", headers={"Authorization": "Bearer nonsense"}
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class EventStreamTests(TransactionTestCase):
+    # Writes are published from worker threads once committed.
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.fan = User.objects.create_user("fan")
+        self.other = User.objects.create_user("other")
+        set_follow(self.fan, self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    async def open_stream(self, user=None, **params):
+        headers = {}
+        if user is not None:
+            token = await sync_to_async(lambda: str(AccessToken.for_user(user)))()
+            headers["Authorization"] = f"Bearer {token}"
+        response = await AsyncClient().get("/api/events/", params, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        chunks = aiter(response.streaming_content)
+        self.assertTrue((await anext(chunks)).startswith(b"retry:"))
+        return chunks
+
+    async def next_event(self, chunks):
+        frame = (await asyncio.wait_for(anext(chunks), 5)).decode()
+        kind, data = frame.strip().split("\n")
+        return kind.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+    async def test_pushes_new_posts_and_counts(self):
+        chunks = await self.open_stream()
+        post = await sync_to_async(self.client.post)(
+            "/api/tweet/", {"tweet": "live"}, format="json"
+        )
+        post_id = post.data["id"]
+        kind, data = await self.next_event(chunks)
+        self.assertEqual(
+            (kind, data["id"], data["poster"]), ("post", post_id, "author")
+        )
+
+        await sync_to_async(self.client.post)(f"/api/tweet/like-unlike/{post_id}/")
+        self.assertEqual(
+            await self.next_event(chunks), ("likes", {"id": post_id, "count": 1})
+        )
+        await sync_to_async(self.client.post)(
+            f"/api/tweet/comment/{post_id}/", {"comment": "hi"}, format="json"
+        )
+        self.assertEqual(
+            await self.next_event(chunks), ("comments", {"id": post_id, "count": 1})
+        )
+
+    async def test_following_stream_skips_unfollowed_posters(self):
+        chunks = await self.open_stream(self.fan, feed="following")
+        other = APIClient()
+        other.force_authenticate(self.other)
+        await sync_to_async(other.post)("/api/tweet/", {"tweet": "x"}, format="json")
+        await sync_to_async(self.client.post)(
+            "/api/tweet/", {"tweet": "y"}, format="json"
+        )
+        kind, data = await self.next_event(chunks)
+        self.assertEqual((kind, data["poster"]), ("post", "author"))
+
+    async def test_slow_client_stream_is_ended(self):
+        subscription = events.hub.subscribe()
+        try:
+            for i in range(settings.EVENTS_QUEUE_SIZE + 1):
+                subscription.put(events.Event("likes", {"id": i, "count": 1}))
+            self.assertIsNone(await subscription.get())
+        finally:
+            events.hub.unsubscribe(subscription)
+
+    def test_needs_asgi_and_login_for_following(self):
+        response = self.client.get("/api/events/")
+        self.assertEqual(response.status_code, 501)
+        response = async_to_sync(AsyncClient().get)("/api/events/?feed=following")
+        self.assertEqual(response.status_code, 401)
+
+
+class SocketBackendTests(SimpleTestCase):
+    def test_forwards_events_to_other_workers(self):
+        directory = Path(tempfile.mkdtemp())
+        backend = events.SocketBackend(directory)
+        peer = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        peer.bind(str(directory / "peer.sock"))
+        dead = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        dead.bind(str(directory / "dead.sock"))
+        dead.close()
+        try:
+            event = events.Event("post", {"id": 1}, 7)
+            backend.publish(event)
+            self.assertEqual(events.Event.from_bytes(peer.recv(65536)), event)
+            self.assertFalse((directory / "dead.sock").exists())
+        finally:
+            peer.close()
+            backend.close()
+
+
+@override_settings(SLOW_QUERY_THRESHOLD=None)
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        override = override_settings(METRICS_DIR=str(self.directory))
+        override.enable()
+        self.addCleanup(override.disable)
+        metrics.registry.reset()
+        author = User.objects.create_user("author")
+        Post.objects.create(tweet="hello", poster=author)
+        self.client = APIClient()
+
+    def test_server_timing_breaks_down_the_request(self):
+        response = self.client.get("/api/home/")
+        timing = dict(
+            part.split(";", 1)[0:2] for part in response["Server-Timing"].split(", ")
+        )
+        self.assertEqual(set(timing), {"db", "serialize", "render", "total"})
+        self.assertRegex(timing["db"], r'dur=[\d.]+;desc="[1-9]\d* queries"')
+
+        snapshot = metrics.registry.snapshot()
+        self.assertIn(["home", "GET", "200", 1], snapshot["requests"])
+        phases = {(view, phase): s for view, phase, s in snapshot["phases"]}
+        self.assertGreater(phases["home", "serialize"], 0)
+        self.assertGreater(phases["home", "render"], 0)
+
+    def test_metrics_sum_every_process(self):
+        self.client.get("/api/home/")
+        other = metrics.Registry()
+        timings = metrics.Timings()
+        timings.add_query(0.002, False)
+        other.observe("home", "GET", 200, 0.03, timings)
+        other.write()
+
+        text = self.client.get("/metrics").content.decode()
+        self.assertIn(
+            'network_http_requests_total{view="home",method="GET",status="200"} 2',
+            text,
+        )
+        self.assertIn(
+            'network_http_request_duration_seconds_count{view="home"} 2', text
+        )
+        self.assertIn(
+            'network_http_request_queries_bucket{view="home",le="+Inf"} 2', text
+        )
+
+        response = self.client.get("/metrics", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 403)
+
+    def test_exited_processes_are_folded_into_the_totals(self):
+        timings = metrics.Timings()
+        for pid in (2**22 + 1, 2**22 + 2):  # above any pid_max, never running
+            other = metrics.Registry()
+            other.path = self.directory / f"{pid}-1.json"
+            other.observe("home", "GET", 200, 0.03, timings)
+            other.write()
+        metrics.registry.observe("home", "GET", 200, 0.03, timings)
+
+        for _ in range(2):
+            self.assertEqual(metrics.collect()["requests"]["home", "GET", "200"], 3)
+            self.assertEqual(
+                sorted(path.name for path in self.directory.glob("*.json")),
+                sorted([metrics.TOTALS, metrics.registry.path.name]),
+            )
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_slow_queries_are_logged_with_their_stack(self):
+        self.client.force_authenticate(User.objects.get(username="author"))
+        with override_settings(SLOW_QUERY_THRESHOLD=0), self.assertLogs(
+            "api.slow_queries", "WARNING"
+        ) as logs:
+            self.client.get("/api/profile/author/")
+        self.assertIn("SELECT", logs.output[0])
+        self.assertTrue(any("api/views.py" in line for line in logs.output))
+        slow = metrics.registry.snapshot()["slow_queries"]
+        self.assertEqual(slow["user_profile"], len(logs.output))
+
+
+class FastSerializerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.fan = User.objects.create_user("fän")
+        self.fan.following.add(self.author)
+        tweets = ["plain", "ünïcode 🐦 #tag", "line separator @fän", 'quote " \\']
+        self.posts = []
+        for tweet in tweets:
+            post = Post.objects.create(tweet=tweet, poster=self.author)
+            set_like(self.fan, post)
+            self.posts.append(post)
+        for text in ("first", "zweite  "):
+            comment = Comment.objects.create(
+                main_post=self.posts[1], commenter=self.fan, comment=text
+            )
+        Post.objects.filter(id=self.posts[0].id).update(edited=True)
+        tags.index_new_posts(self.posts)
+        self.comment = comment
+        self.client = APIClient()
+        self.client.force_authenticate(self.fan)
+
+    def both(self, url, **params):
+        """The response bodies (and query counts) with and without the fast path."""
+        url, _, query = url.partition("?")
+        params.update(QueryDict(query).items())
+        bodies = []
+        for fast in (True, False):
+            cache.clear()
+            with override_settings(FAST_SERIALIZERS=fast), CaptureQueriesContext(
+                connection
+            ) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            bodies.append((response.content, len(queries)))
+        return bodies
+
+    def test_endpoints_are_byte_identical(self):
+        post = self.posts[1]
+        variants = [{}, {"fields": "id,tweet,is_liked"}, {"omit": "comments"}]
+        variants += [{"expand": "poster"}, {"expand": "poster,commenter"}]
+        urls = [
+            "/api/home/",
+            "/api/following-feed/",
+            f"/api/tweet/{post.id}/",
+            f"/api/tweet/{post.id}/comments/",
+            f"/api/tweets/?ids={post.id},{self.posts[0].id}",
+            "/api/search/?q=separator",
+            "/api/tag/tag/",
+            "/api/profile/author/",
+            "/api/profile/fän/",
+            "/api/profile/fän/comments/",
+            "/api/profile/fän/likes/",
+        ]
+        for url in urls:
+            for params in variants:
+                with self.subTest(url=url, **params):
+                    fast, slow = self.both(url, **params)
+                    self.assertEqual(fast, slow)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(*self.both("/api/home/"))
+
+    def test_functions_match_serializers(self):
+        request = Request(APIRequestFactory().get("/", {"expand": "poster"}))
+        request.user = self.fan
+        posts = list(Post.objects.for_listing(all_comments=True))
+        context = {"request": request}
+        # A non-UTC zone and microseconds, which DRF keeps.
+        with timezone.override("America/Caracas"):
+            self.assertEqual(
+                fast_serializers.posts(posts, request),
+                PostSerializer(posts, many=True, context=context).data,
+            )
+            self.assertEqual(
+                fast_serializers.post(posts[0], request),
+                PostSerializer(posts[0], context=context).data,
+            )
+            comments = Comment.objects.select_related("commenter")
+            request = Request(APIRequestFactory().get("/", {"expand": "commenter"}))
+            context = {"request": request}
+            self.assertEqual(
+                fast_serializers.comments(comments, request),
+                CommentSerializer(comments, many=True, context=context).data,
+            )
+        self.assertTrue(fast_serializers.posts(posts)[0]["date_posted"].endswith("Z"))
+
+    @override_settings(LIKE_WRITE_BEHIND=True, LIKE_FLUSH_INTERVAL=None)
+    def test_buffered_likes(self):
+        self.addCleanup(like_buffer.buffer.flush)
+        set_like(self.author, self.posts[0])
+        self.client.force_authenticate(self.author)
+        fast, slow = self.both(f"/api/tweet/{self.posts[0].id}/")
+        self.assertEqual(fast, slow)
+        self.assertIn(b'"is_liked":true,', fast[0])
+
+    def test_renderer_falls_back(self):
+        renderer = fast_serializers.FastJSONRenderer()
+        stock = JSONRenderer()
+        for data in (
+            {"date": timezone.now(), "big": 2**70, "text": "a b"},
+            {1: "non-string key"},
+            [timezone.now().date(), None, True],
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(renderer.render(data), stock.render(data))
+        indented = "application/json; indent=2"
+        self.assertEqual(
+            renderer.render({"a": [1]}, indented), stock.render({"a": [1]}, indented)
+        )
+
+
+@override_settings(JOB_RETRY_DELAY=0)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.batches = []
+        for kind, function in (("echo", self.batches.append), ("boom", self.fail)):
+            jobs.handler(kind)(function)
+            self.addCleanup(jobs._handlers.pop, kind)
+
+    def fail(self, payloads):
+        if any(payload.get("bad") for payload in payloads):
+            raise ValueError("bad payload")
+        self.batches.append(payloads)
+
+    def test_same_kind_jobs_run_in_one_batch(self):
+        for i in range(3):
+            jobs.enqueue("echo", {"i": i})
+        jobs.enqueue("boom", {"i": 3})
+        self.assertEqual(jobs.work_all(), 4)
+        self.assertEqual(self.batches, [[{"i": 0}, {"i": 1}, {"i": 2}], [{"i": 3}]])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 4)
+
+    def test_idempotency_key(self):
+        first = jobs.enqueue("echo", {"i": 1}, key="one")
+        again = jobs.enqueue("echo", {"i": 2}, key="one")
+        self.assertEqual(first, again)
+        jobs.work_all()
+        self.assertEqual(jobs.enqueue("echo", key="one").status, Job.DONE)
+        self.assertEqual(self.batches, [[{"i": 1}]])
+
+    def test_failures_are_retried_then_kept(self):
+        jobs.enqueue("boom", {"i": 0})
+        bad = jobs.enqueue("boom", {"bad": True}, max_attempts=2)
+        with self.assertLogs("api.jobs", "WARNING") as logs:
+            jobs.work_all()
+        # The good job ran on its own once the batch failed.
+        self.assertEqual(self.batches, [[{"i": 0}]])
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), (Job.FAILED, 2))
+        self.assertIn("ValueError: bad payload", bad.last_error)
+        self.assertEqual(len(logs.output), 2)
+
+    @override_settings(JOB_RETRY_DELAY=60)
+    def test_retry_backs_off(self):
+        job = jobs.enqueue("boom", {"bad": True})
+        with self.assertLogs("api.jobs", "WARNING"):
+            self.assertEqual(jobs.work_all(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+
+    def test_expired_lease_is_claimed_again(self):
+        job = jobs.enqueue("echo", {"i": 0})
+        self.assertEqual(jobs.claim(), [job])
+        self.assertEqual(jobs.claim(), [])
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now())
+        jobs.work_all()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 2))
+
+    def test_depth_and_run_jobs_command(self):
+        jobs.enqueue("echo")
+        jobs.enqueue("nobody-handles-this", max_attempts=1)
+        admin = User.objects.create_superuser("admin")
+        client = APIClient()
+        client.force_authenticate(admin)
+        queues = client.get("/api/jobs/").data["queues"]
+        self.assertEqual(queues["echo"]["queued"], 1)
+
+        out = StringIO()
+        with self.assertLogs("api.jobs", "ERROR"):
+            call_command("run_jobs", "--once", stdout=out)
+        self.assertIn("Ran 2 jobs.", out.getvalue())
+        queues = client.get("/api/jobs/").data["queues"]
+        self.assertNotIn("echo", queues)
+        self.assertEqual(queues["nobody-handles-this"]["failed"], 1)
+
+
+@override_settings(DELETION_CHUNK_SIZE=2)
+class DeletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user("author")
+        self.fans = [User.objects.create_user(f"fan{i}") for i in range(3)]
+        self.other_post = Post.objects.create(tweet="other", poster=self.fans[0])
+        for fan in self.fans:
+            set_follow(fan, self.author)
+        set_follow(self.author, self.fans[0])
+        self.posts = []
+        for i in range(5):
+            post = Post.objects.create(tweet=f"#gone {i}", poster=self.author)
+            fan_out_post(post)
+            tags.index_tags(post)
+            for fan in self.fans:
+                set_like(fan, post)
+                Comment.objects.create(main_post=post, commenter=fan, comment="c")
+            self.posts.append(post)
+        set_like(self.author, self.other_post)
+        Comment.objects.create(
+            main_post=self.other_post, commenter=self.author, comment="mine"
+        )
+        repair_post_counters()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def assertNothingDrifted(self):
+        self.assertFalse(drifted_posts().exists())
+        self.assertFalse(drifted_users().exists())
+
+    def test_delete_post(self):
+        post = self.posts[0]
+        self.client.force_authenticate(self.fans[0])
+        response = self.client.delete(f"/api/tweet/{post.id}/")
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f"/api/tweet/{post.id}/")
+        self.assertEqual(response.status_code, 202)
+        again = self.client.delete(f"/api/tweet/{post.id}/")
+        self.assertEqual(again.data["job"], response.data["job"])
+        self.assertTrue(Post.objects.filter(id=post.id).exists())
+
+        self.assertEqual(jobs.work_all(), 1)
+        self.assertFalse(Post.objects.filter(id=post.id).exists())
+        self.assertFalse(Comment.objects.filter(main_post_id=post.id).exists())
+        self.assertFalse(TimelineEntry.objects.filter(post_id=post.id).exists())
+        self.assertFalse(PostTag.objects.filter(post_id=post.id).exists())
+        self.assertEqual(Comment.objects.count(), 13)
+        self.assertNothingDrifted()
+
+    def test_delete_account(self):
+        home = self.client.get("/api/home/", {"window": "all"}).data
+        self.assertIn(self.posts[-1].id, [p["id"] for p in home["most_liked_tweets"]])
+
+        self.client.force_authenticate(self.fans[0])
+        response = self.client.delete("/api/profile/author/")
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_authenticate(self.author)
+        response = self.client.delete("/api/profile/author/")
+        self.assertEqual(response.status_code, 202)
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        token = AccessToken.for_user(self.author)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(client.get("/api/following-feed/").status_code, 401)
+
+        self.assertEqual(jobs.work_all(), 1)
+        self.assertFalse(User.objects.filter(username="author").exists())
+        self.assertEqual(Post.objects.get().id, self.other_post.id)
+        self.assertEqual(Comment.objects.count(), 0)
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.other_post.likes_count, 0)
+        self.assertEqual(self.other_post.comments_count, 0)
+        for fan in User.objects.filter(id__in=[fan.id for fan in self.fans]):
+            self.assertEqual(fan.following_count, 0)
+        self.assertEqual(User.objects.get(id=self.fans[0].id).followers_count, 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertNothingDrifted()
+
+        self.client.force_authenticate(self.fans[1])
+        home = self.client.get("/api/home/").data
+        self.assertEqual(
+            [p["id"] for p in home["most_liked_tweets"]], [self.other_post.id]
+        )
@@ -0,0 +1,139 @@
+import heapq
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from .models import User, Post, TimelineEntry
+from .pagination import after_cursor, encode_cursor
+
+
+def fans_out(user):
+    """Accounts above the follower limit are merged into feeds on read."""
+    return user.followers_count <= settings.TIMELINE_FANOUT_LIMIT
+
+
+def fan_out_post(post):
+    """Copy a new post into the timeline of every follower of its poster."""
+    if not fans_out(post.poster):
+        return False
+
+    follower_ids = User.following.through.objects.filter(
+        to_user_id=post.poster_id
+    ).values_list("from_user_id", flat=True)
+    with transaction.atomic():
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    owner_id=follower_id,
+                    post=post,
+                    poster_id=post.poster_id,
+                    date_posted=post.date_posted,
+                )
+                for follower_id in follower_ids.iterator()
+            ),
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        Post.objects.filter(id=post.id).update(fanned_out=True)
+    post.fanned_out = True
+    return True
+
+
+def backfill_timeline(follower, followee):
+    """Copy the followee's recent fanned-out posts into a new follower's feed."""
+    posts = Post.objects.filter(poster=followee, fanned_out=True).order_by(
+        "-date_posted", "-id"
+    )[: settings.TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                owner=follower,
+                post_id=post_id,
+                poster=followee,
+                date_posted=date_posted,
+            )
+            for post_id, date_posted in posts.values_list("id", "date_posted")
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def trim_timeline(follower, followee):
+    TimelineEntry.objects.filter(owner=follower, poster=followee).delete()
+
+
+class TimelineFeed:
+    """
+    The posts of everyone `user` follows, newest first.
+
+    Fanned-out posts are read from the user's materialized timeline; posts
+    that were not fanned out (high-follower accounts, or posts older than the
+    timeline table) are merged in from `Post` at read time. Both sources are
+    keyset range scans, and cursors are interchangeable with the ones issued
+    by `cursor_paginate` over posts.
+    """
+
+    def __init__(self, queryset, user):
+        self.queryset = queryset
+        self.user = user
+
+    def _pulled_posters(self):
+        # Followees with any post left out of fan-out: one probe of the
+        # partial index per followee, so only the accounts merged on read
+        # are scanned below.
+        if not hasattr(self, "pulled_posters"):
+            self.pulled_posters = list(
+                User.following.through.objects.filter(from_user=self.user)
+                .filter(
+                    Exists(
+                        Post.objects.filter(
+                            poster=OuterRef("to_user"), fanned_out=False
+                        )
+                    )
+                )
+                .values_list("to_user_id", flat=True)
+            )
+        return self.pulled_posters
+
+    def _sources(self, cursor=None):
+        """The timeline entries, then one range scan per pulled poster."""
+        entries = TimelineEntry.objects.filter(owner=self.user)
+        pulled = [
+            Post.objects.filter(poster_id=poster_id, fanned_out=False)
+            for poster_id in self._pulled_posters()
+        ]
+        if cursor:
+            entries = after_cursor(entries, cursor, tiebreak="post_id")
+            pulled = [after_cursor(posts, cursor) for posts in pulled]
+        return [
+            entries.order_by("-date_posted", "-post_id").values_list(
+                "date_posted", "post_id"
+            ),
+            *(
+                posts.order_by("-date_posted", "-id").values_list("date_posted", "id")
+                for posts in pulled
+            ),
+        ]
+
+    def _keys(self, limit, cursor=None):
+        merged = heapq.merge(
+            *(source[:limit] for source in self._sources(cursor)), reverse=True
+        )
+        return [key for _, key in zip(range(limit), merged)]
+
+    def _hydrate(self, keys):
+        posts = self.queryset.order_by().in_bulk([post_id for _, post_id in keys])
+        return [posts[post_id] for _, post_id in keys if post_id in posts]
+
+    def count(self):
+        return sum(source.count() for source in self._sources())
+
+    def __getitem__(self, page):
+        return self._hydrate(self._keys(page.stop)[page])
+
+    def cursor_page(self, cursor, page_size):
+        keys = self._keys(page_size + 1, cursor)
+        next_cursor = None
+        if len(keys) > page_size:
+            keys = keys[:page_size]
+            next_cursor = encode_cursor(*keys[-1])
+        return self._hydrate(keys), next_cursor
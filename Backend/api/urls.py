@@ -9,19 +9,62 @@ from .views import (
     CommentView,
     UserProfileView,
     FollowingFeedView,
+    ExportView,
+    ProfileSectionView,
+    ResponseCacheStatsView,
+    JobQueueView,
+    LikeView,
+    FollowView,
+    BulkTweetView,
+    BatchView,
+    SearchView,
+    TagView,
+    TrendingView,
 )
+from . import async_views
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
+    path(
+        "profile/<str:username>/tweets/",
+        ProfileSectionView.as_view(section="tweets"),
+        name="profile_tweets",
+    ),
+    path(
+        "profile/<str:username>/comments/",
+        ProfileSectionView.as_view(section="comments"),
+        name="profile_comments",
+    ),
+    path(
+        "profile/<str:username>/likes/",
+        ProfileSectionView.as_view(section="liked_tweets"),
+        name="profile_likes",
+    ),
+    path("profile/<str:username>/export/", ExportView.as_view(), name="export"),
+    path("profile/<str:username>/follow/", FollowView.as_view(), name="follow"),
     path("profile/<str:username>/", UserProfileView.as_view(), name="user_profile"),
     path("tweet/comment/<int:post_id>/", CommentView.as_view(), name="comment"),
+    path("tweet/<int:post_id>/comments/", CommentView.as_view(), name="tweet_comments"),
     path(
         "tweet/like-unlike/<int:post_id>/", ToggleLikeView.as_view(), name="like-unlike"
     ),
+    path("tweet/<int:post_id>/like/", LikeView.as_view(), name="like"),
     path("following-feed/", FollowingFeedView.as_view(), name="following-feed"),
     path("tweet/<int:post_id>/", TweetView.as_view(), name="tweet_update"),
     path("tweet/", TweetView.as_view(), name="tweet"),
+    path("tweets/", BulkTweetView.as_view(), name="tweets"),
+    path("batch/", BatchView.as_view(), name="batch"),
+    path("search/", SearchView.as_view(), name="search"),
+    path("tag/<str:name>/", TagView.as_view(), name="tag"),
+    path("trending/", TrendingView.as_view(), name="trending"),
     path("home/", HomePageView.as_view(), name="home"),
+    path("async/home/", async_views.home, name="async_home"),
+    path("async/following-feed/", async_views.following, name="async_following"),
+    path("async/tweet/<int:post_id>/", async_views.tweet, name="async_tweet"),
+    path("async/profile/<str:username>/", async_views.profile, name="async_profile"),
+    path("events/", async_views.stream, name="events"),
+    path("cache-stats/", ResponseCacheStatsView.as_view(), name="cache_stats"),
+    path("jobs/", JobQueueView.as_view(), name="jobs"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("logout/", LogoutView.as_view(), name="logout"),
     path("login/", LoginView.as_view(), name="login"),
@@ -1,70 +1,108 @@
+import hmac
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Count
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.utils import timezone
+from django.db import transaction
+from django.db.models import F
 from .serializers import (
     UserRegisterSerializer,
     LoginSerializer,
     LogoutSerializer,
     PostSerializer,
     CommentSerializer,
+    BatchSerializer,
+    MAX_ID,
 )
-from .models import Post, Comment
+from .models import Post, Comment, PostTag
+from . import events, fast_serializers, jobs, leaderboards, metrics
+from .archive import export_user
+from .fast_serializers import FastJSONRenderer
+from .authentication import RefreshToken
+from .conditional import conditional, home_version, profile_version, tweet_version
+from .response_cache import (
+    cached_response,
+    home_generations,
+    home_posts,
+    tweet_generations,
+    tweet_posts,
+)
+from . import response_cache
+from .pagination import PAGE_SIZE, InvalidCursor, cursor_paginate, paginate_posts
+from .search import InvalidQuery, PostSearch
+from .tags import index_tags, normalize, trending
+from .timeline import TimelineFeed, fan_out_post
+from .actions import set_follow, set_like
 from django.contrib.auth import get_user_model
 
 
 User = get_user_model()
 
+# Views whose bodies are feeds of serialized posts and comments, no floats.
+FEED_RENDERERS = [FastJSONRenderer, BrowsableAPIRenderer]
 
-class HomePageView(APIView):
-    permission_classes = [AllowAny]
 
-    def get(self, request):
-        serialize = PostSerializer
+def post_listing(request, **kwargs):
+    """Posts loaded for just the `PostSerializer` fields the request asks for."""
+    fields = PostSerializer.requested_fields(request)
+    return Post.objects.for_listing(fields=fields, **kwargs)
 
-        posts = Post.objects.all()
-        most_liked_posts = posts.annotate(like_count=Count("likers")).order_by(
-            "-like_count", "-date_posted"
-        )[:10]
 
-        most_commented_posts = posts.annotate(comment_count=Count("comments")).order_by(
-            "-comment_count", "-date_posted"
-        )[:10]
+def home_leaderboard(request, metric):
+    window = request.query_params.get("window", "all")
+    posts = leaderboards.top_posts(post_listing(request), metric, window)
+    return fast_serializers.posts(posts, request)
 
-        # Get recent posts for pagination
-        recent_posts = posts.order_by("-date_posted")
 
-        page_number = request.query_params.get("page", 1)
-        paginator = Paginator(recent_posts, 10)
+def home_recent(request):
+    paginated_posts, page_meta = paginate_posts(request, post_listing(request))
+    tweets = fast_serializers.posts(paginated_posts, request)
+    return {"recent_tweets": tweets, **page_meta}
+
+
+def following_feed(request):
+    posts = TimelineFeed(post_listing(request), request.user)
+    paginated_posts, page_meta = paginate_posts(request, posts)
+    tweets = fast_serializers.posts(paginated_posts, request)
+    return {"tweets": tweets, **page_meta}
+
+
+def tweet_detail(request, post_id):
+    tweet = post_listing(request, all_comments=True).get(id=post_id)
+    return fast_serializers.post(tweet, request)
+
+
+class HomePageView(APIView):
+    permission_classes = [AllowAny]
+    renderer_classes = FEED_RENDERERS
+
+    @conditional(home_version)
+    @cached_response("home", home_generations, home_posts)
+    def get(self, request):
+        try:
+            most_liked_tweets = home_leaderboard(request, "most_liked")
+            most_commented_tweets = home_leaderboard(request, "most_commented")
+        except leaderboards.UnknownWindow as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Get recent posts for pagination
         try:
-            paginated_posts = paginator.page(page_number)
-        except PageNotAnInteger:
-            paginated_posts = paginator.page(1)
-        except EmptyPage:
-            paginated_posts = paginator.page(paginator.num_pages)
-
-        # Serialize the data
-        tweets = serialize(paginated_posts, many=True, context={"request": request})
-        most_liked_tweets = serialize(
-            most_liked_posts, many=True, context={"request": request}
-        )
-        most_commented_tweets = serialize(
-            most_commented_posts, many=True, context={"request": request}
-        )
+            recent = home_recent(request)
+        except InvalidCursor:
+            return Response(
+                {"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST
+            )
 
         response_data = {
-            "recent_tweets": tweets.data,
-            "total_tweets": paginator.count,
-            "total_pages": paginator.num_pages,
-            "current_page": paginated_posts.number,
-            "most_liked_tweets": most_liked_tweets.data,
-            "most_commented_tweets": most_commented_tweets.data,
+            **recent,
+            "most_liked_tweets": most_liked_tweets,
+            "most_commented_tweets": most_commented_tweets,
         }
 
         return Response(response_data)
@@ -72,44 +110,22 @@ class HomePageView(APIView):
 
 class FollowingFeedView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = FEED_RENDERERS
 
     def get(self, request):
-        following_users = request.user.following.all()
-
-        posts = (
-            Post.objects.filter(poster__in=following_users)
-            .annotate(likes_count=Count("likers"), comments_count=Count("comments"))
-            .order_by("-date_posted")
-        )
-
-        # Pagination
-        page_number = request.query_params.get("page", 1)
-        paginator = Paginator(posts, 10)
-
         try:
-            paginated_posts = paginator.page(page_number)
-        except PageNotAnInteger:
-            paginated_posts = paginator.page(1)
-        except EmptyPage:
-            paginated_posts = paginator.page(paginator.num_pages)
-
-        # Serialize the posts
-        tweets = PostSerializer(
-            paginated_posts, many=True, context={"request": request}
-        )
-
-        response_data = {
-            "tweets": tweets.data,
-            "total_tweets": paginator.count,
-            "total_pages": paginator.num_pages,
-            "current_page": paginated_posts.number,
-        }
+            response_data = following_feed(request)
+        except InvalidCursor:
+            return Response(
+                {"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST
+            )
 
         return Response(response_data)
 
 
 class TweetView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = FEED_RENDERERS
     serializer_class = PostSerializer
 
     def get_permissions(self):
@@ -118,11 +134,11 @@ class TweetView(APIView):
         return super().get_permissions()
 
     # details
+    @conditional(tweet_version)
+    @cached_response("tweet", tweet_generations, tweet_posts)
     def get(self, request, post_id):
         try:
-            tweet = Post.objects.get(id=post_id)
-            tweet_data = self.serializer_class(tweet, context={"request": request}).data
-            return Response(tweet_data)
+            return Response(tweet_detail(request, post_id))
         except Post.DoesNotExist:
             return Response(
                 {"error": "Post not found."}, status=status.HTTP_404_NOT_FOUND
@@ -133,6 +149,10 @@ class TweetView(APIView):
         post = self.serializer_class(data=request.data)
         if post.is_valid():
             tweet = post.save(poster=request.user)
+            index_tags(tweet)
+            fan_out_post(tweet)
+            leaderboards.post_created(tweet)
+            events.post_created(tweet)
             return Response(
                 self.serializer_class(tweet).data, status=status.HTTP_201_CREATED
             )
@@ -155,14 +175,155 @@ class TweetView(APIView):
 
         tweet_update = self.serializer_class(tweet, data=request.data, partial=True)
         if tweet_update.is_valid():
-            tweet_update.save(edited=True)
+            tweet = tweet_update.save(edited=True)
+            index_tags(tweet)
             return Response(tweet_update.data)
         return Response(tweet_update.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    # Delete Post, with its comments, likes and timeline entries in a job #
+    def delete(self, request, post_id):
+        try:
+            tweet = Post.objects.get(id=post_id)
+        except Post.DoesNotExist:
+            return Response(
+                {"error": "Post not found."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        if tweet.poster_id != request.user.id and not request.user.is_staff:
+            return Response(
+                {"error": "You cannot delete this post."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        job = jobs.enqueue("delete_post", {"post_id": tweet.id}, key=str(tweet.id))
+        return Response(
+            {"success": True, "job": job.id}, status=status.HTTP_202_ACCEPTED
+        )
+
+
+# Many Posts by id #
+class BulkTweetView(APIView):
+    permission_classes = [AllowAny]
+    renderer_classes = FEED_RENDERERS
+
+    def get(self, request):
+        try:
+            ids = [int(i) for i in request.query_params.get("ids", "").split(",") if i]
+            if not all(1 <= post_id <= MAX_ID for post_id in ids):
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"error": "ids must be a comma separated list of post ids."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(ids) > settings.BULK_TWEETS_LIMIT:
+            return Response(
+                {"error": f"At most {settings.BULK_TWEETS_LIMIT} ids per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        posts = post_listing(request).order_by().in_bulk(ids)
+        found = [posts[post_id] for post_id in dict.fromkeys(ids) if post_id in posts]
+        return Response(
+            {
+                "tweets": fast_serializers.posts(found, request),
+                "missing": [post_id for post_id in ids if post_id not in posts],
+            }
+        )
+
+
+# Full-text Search #
+class SearchView(APIView):
+    permission_classes = [AllowAny]
+    renderer_classes = FEED_RENDERERS
+
+    def get(self, request):
+        try:
+            results = PostSearch(
+                post_listing(request), request.query_params.get("q", "")
+            )
+            posts, next_cursor = results.cursor_page(
+                request.query_params.get("cursor", ""), PAGE_SIZE
+            )
+        except InvalidQuery as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        except InvalidCursor:
+            return Response(
+                {"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        tweets = fast_serializers.posts(posts, request)
+        return Response({"tweets": tweets, "next_cursor": next_cursor})
+
+
+# Posts with a #hashtag or @mention, newest first #
+class TagView(APIView):
+    permission_classes = [AllowAny]
+    renderer_classes = FEED_RENDERERS
+
+    def get(self, request, name):
+        tag = normalize(name)
+        try:
+            rows, next_cursor = cursor_paginate(
+                PostTag.objects.filter(tag=tag),
+                request.query_params.get("cursor"),
+            )
+        except InvalidCursor:
+            return Response(
+                {"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        posts = post_listing(request).order_by().in_bulk([row.post_id for row in rows])
+        tagged = [posts[row.post_id] for row in rows if row.post_id in posts]
+        tweets = fast_serializers.posts(tagged, request)
+        return Response({"tag": tag, "tweets": tweets, "next_cursor": next_cursor})
+
+
+class TrendingView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response({"trending": trending()})
+
 
 # Comment on a Post #
 class CommentView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = FEED_RENDERERS
+
+    def get_permissions(self):
+        if self.request.method == "GET":
+            return [AllowAny()]
+        return super().get_permissions()
+
+    # Comments of a Post, newest first #
+    def get(self, request, post_id):
+        if not Post.objects.filter(id=post_id).exists():
+            return Response(
+                {"error": "Post not found."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        comments = Comment.objects.select_related("commenter").filter(
+            main_post_id=post_id
+        )
+        try:
+            page, next_cursor = cursor_paginate(
+                comments,
+                request.query_params.get("cursor"),
+                settings.COMMENT_PAGE_SIZE,
+                field="commented",
+            )
+        except InvalidCursor:
+            return Response(
+                {"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {
+                "comments": fast_serializers.comments(page, request),
+                "next_cursor": next_cursor,
+            }
+        )
 
     def post(self, request, post_id):
         try:
@@ -173,9 +334,19 @@ class CommentView(APIView):
             )
 
         # Create a new comment instance
-        comment = Comment.objects.create(
-            main_post=post, commenter=request.user, comment=request.data.get("comment")
-        )
+        with transaction.atomic():
+            comment = Comment.objects.create(
+                main_post=post,
+                commenter=request.user,
+                comment=request.data.get("comment"),
+            )
+            Post.objects.filter(id=post.id).update(
+                comments_count=F("comments_count") + 1, updated_at=timezone.now()
+            )
+            User.objects.filter(id=request.user.id).update(updated_at=timezone.now())
+        post.refresh_from_db(fields=["comments_count"])
+        leaderboards.record(post, "most_commented", post.comments_count)
+        events.comments_changed(post)
 
         # Serialize the created comment
         serializer = CommentSerializer(comment)
@@ -194,62 +365,133 @@ class ToggleLikeView(APIView):
                 {"error": "Post not found."}, status=status.HTTP_404_NOT_FOUND
             )
         # Toggle Like Status
-        if request.user in tweet.likers.all():
-            tweet.likers.remove(request.user)
-            liked = False
-        else:
-            tweet.likers.add(request.user)
-            liked = True
-
-        # Get updated tweet data
-        tweet.refresh_from_db()
-        likes_count = tweet.likers.count()
+        liked, _ = set_like(request.user, tweet)
 
-        return Response({"success": True, "liked": liked, "likes_count": likes_count})
+        return Response(
+            {"success": True, "liked": liked, "likes_count": tweet.likes_count}
+        )
 
 
-class UserProfileView(APIView):
+# Like (PUT) / Unlike (DELETE), safe to repeat #
+class LikeView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, username):
-        user = get_object_or_404(User, username=username)
-        is_following = request.user in user.followers.all()
+    def put(self, request, post_id):
+        return self.set_like(request, post_id, True)
+
+    def delete(self, request, post_id):
+        return self.set_like(request, post_id, False)
+
+    def set_like(self, request, post_id, liked):
+        try:
+            tweet = Post.objects.get(id=post_id)
+        except Post.DoesNotExist:
+            return Response(
+                {"error": "Post not found."}, status=status.HTTP_404_NOT_FOUND
+            )
 
-        followers_count = user.followers.count()
-        following_count = user.following.count()
+        liked, _ = set_like(request.user, tweet, liked)
+        return Response(
+            {"success": True, "liked": liked, "likes_count": tweet.likes_count}
+        )
 
-        posts = Post.objects.filter(poster=user).order_by("-date_posted")
-        tweets = PostSerializer(
-            posts, many=True, context={"request": request}
-        ).data  # Added context here
 
-        comments = Comment.objects.filter(commenter=user).order_by("-commented")
-        user_comments = CommentSerializer(comments, many=True).data
+def profile_tweets(request, user, cursor):
+    posts, next_cursor = cursor_paginate(
+        post_listing(request).filter(poster=user),
+        cursor,
+        settings.PROFILE_PAGE_SIZE,
+    )
+    return fast_serializers.posts(posts, request), next_cursor
+
+
+def profile_comments(request, user, cursor):
+    comments, next_cursor = cursor_paginate(
+        Comment.objects.select_related("commenter").filter(commenter=user),
+        cursor,
+        settings.PROFILE_PAGE_SIZE,
+        field="commented",
+    )
+    return fast_serializers.comments(comments, request), next_cursor
+
+
+def profile_liked_tweets(request, user, cursor):
+    # Most recently liked first, paged over the user's rows in the likes table.
+    likes, next_cursor = cursor_paginate(
+        Post.likers.through.objects.filter(user=user),
+        cursor,
+        settings.PROFILE_PAGE_SIZE,
+        field=None,
+    )
+    posts = post_listing(request).order_by().in_bulk([like.post_id for like in likes])
+    liked_posts = [posts[like.post_id] for like in likes if like.post_id in posts]
+    return fast_serializers.posts(liked_posts, request), next_cursor
+
+
+PROFILE_SECTIONS = {
+    "tweets": profile_tweets,
+    "comments": profile_comments,
+    "liked_tweets": profile_liked_tweets,
+}
+
+
+def profile_header(request, user, is_following):
+    return {
+        "id": user.id,
+        "username": user.username,
+        "date_joined": user.date_joined,
+        "followers_count": user.followers_count,
+        "following_count": user.following_count,
+        "is_self_profile": request.user == user,
+        "is_following": is_following,
+    }
+
+
+def profile_section_names(request):
+    # First page of each requested section; `?sections=` gives the header only.
+    sections = request.query_params.get("sections")
+    if sections is None:
+        return list(PROFILE_SECTIONS)
+    return [name for name in sections.split(",") if name in PROFILE_SECTIONS]
 
-        liked_posts = Post.objects.filter(likers=user).order_by("-date_posted")
-        liked_tweets = PostSerializer(
-            liked_posts, many=True, context={"request": request}
-        ).data  # Added context here
 
-        is_self_profile = request.user == user
+class UserProfileView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FEED_RENDERERS
 
+    @conditional(profile_version)
+    def get(self, request, username):
+        user = get_object_or_404(User, username=username)
+        is_following = user.followers.filter(pk=request.user.pk).exists()
         response_data = {
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "date_joined": user.date_joined,
-                "followers_count": followers_count,
-                "following_count": following_count,
-                "is_self_profile": is_self_profile,
-                "is_following": is_following,
-            },
-            "tweets": tweets,
-            "comments": user_comments,
-            "liked_tweets": liked_tweets,
+            "user": profile_header(request, user, is_following),
+            "next_cursors": {},
         }
 
+        for name in profile_section_names(request):
+            data, next_cursor = PROFILE_SECTIONS[name](request, user, None)
+            response_data[name] = data
+            response_data["next_cursors"][name] = next_cursor
+
         return Response(response_data)
 
+    # Delete Account: deactivated now, its rows are deleted by a job #
+    def delete(self, request, username):
+        user = get_object_or_404(User, username=username)
+        if user != request.user and not request.user.is_staff:
+            return Response(
+                {"error": "You cannot delete this account."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        with transaction.atomic():
+            user.is_active = False
+            user.save(update_fields=["is_active"])
+            job = jobs.enqueue("delete_user", {"user_id": user.id}, key=str(user.id))
+        return Response(
+            {"success": True, "job": job.id}, status=status.HTTP_202_ACCEPTED
+        )
+
     # Follow/Unfollow
     def post(self, request, username):
         toggle_follow = get_object_or_404(User, username=username)
@@ -261,20 +503,165 @@ class UserProfileView(APIView):
             )
 
         # Toggle Follow/Unfollow
-        if request.user in toggle_follow.followers.all():
-            toggle_follow.followers.remove(request.user)
+        following, _ = set_follow(request.user, toggle_follow)
+
+        if not following:
             return Response(
                 {"success": True, "message": "You have unfollowed this user."},
                 status=status.HTTP_200_OK,
             )
         else:
-            toggle_follow.followers.add(request.user)
             return Response(
                 {"success": True, "message": "You are now following this user."},
                 status=status.HTTP_201_CREATED,
             )
 
 
+# Follow (PUT) / Unfollow (DELETE), safe to repeat #
+class FollowView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, username):
+        return self.set_follow(request, username, True)
+
+    def delete(self, request, username):
+        return self.set_follow(request, username, False)
+
+    def set_follow(self, request, username, following):
+        followee = get_object_or_404(User, username=username)
+
+        if request.user == followee:
+            return Response(
+                {"error": "You cannot Follow/Unfollow yourself."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        following, _ = set_follow(request.user, followee, following)
+        return Response(
+            {
+                "success": True,
+                "following": following,
+                "followers_count": followee.followers_count,
+            }
+        )
+
+
+# Profile tweets/comments/liked tweets, one page at a time #
+class ProfileSectionView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FEED_RENDERERS
+    section = None
+
+    @conditional(profile_version)
+    def get(self, request, username):
+        user = get_object_or_404(User, username=username)
+        try:
+            data, next_cursor = PROFILE_SECTIONS[self.section](
+                request, user, request.query_params.get("cursor")
+            )
+        except InvalidCursor:
+            return Response(
+                {"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({self.section: data, "next_cursor": next_cursor})
+
+
+# Archive of a user's account as NDJSON, streamed #
+class ExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, username):
+        user = get_object_or_404(User, username=username)
+        if request.user != user and not request.user.is_staff:
+            return Response(
+                {"error": "You can only export your own account."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        response = StreamingHttpResponse(
+            export_user(user, settings.EXPORT_CHUNK_SIZE),
+            content_type="application/x-ndjson",
+        )
+        response["Content-Disposition"] = f'attachment; filename="{username}.ndjson"'
+        return response
+
+
+# Like/Unlike/Follow/Unfollow many at once #
+class BatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        actions = serializer.validated_data["actions"]
+
+        posts = Post.objects.in_bulk([a["tweet"] for a in actions if "tweet" in a])
+        users = User.objects.in_bulk(
+            [a["username"] for a in actions if "username" in a],
+            field_name="username",
+        )
+
+        results = []
+        with transaction.atomic():
+            for action in actions:
+                if action["action"] in ("like", "unlike"):
+                    results.append(self.like(request, posts, action))
+                else:
+                    results.append(self.follow(request, users, action))
+
+        return Response({"results": results})
+
+    def like(self, request, posts, action):
+        tweet = posts.get(action["tweet"])
+        if tweet is None:
+            return {"success": False, "error": "Post not found."}
+        liked, _ = set_like(request.user, tweet, action["action"] == "like")
+        return {"success": True, "liked": liked, "likes_count": tweet.likes_count}
+
+    def follow(self, request, users, action):
+        followee = users.get(action["username"])
+        if followee is None:
+            return {"success": False, "error": "User not found."}
+        if followee == request.user:
+            return {"success": False, "error": "You cannot Follow/Unfollow yourself."}
+        following, _ = set_follow(request.user, followee, action["action"] == "follow")
+        return {
+            "success": True,
+            "following": following,
+            "followers_count": followee.followers_count,
+        }
+
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache.stats())
+
+
+# Depth of the background job queue, per kind #
+class JobQueueView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"queues": jobs.depth()})
+
+
+# Prometheus metrics of every worker process, for internal scrapers only #
+def prometheus_metrics(request):
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}".encode()
+        given = request.headers.get("Authorization", "").encode()
+        allowed = hmac.compare_digest(given, expected)
+    else:
+        allowed = request.META.get("REMOTE_ADDR") in settings.INTERNAL_IPS
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.prometheus_text(), content_type="text/plain; version=0.0.4"
+    )
+
+
 class LoginView(TokenObtainPairView):
     serializer_class = LoginSerializer
 